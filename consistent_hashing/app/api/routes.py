@@ -1,36 +1,157 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+import json
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 from app.services.hashing_service import hashing_service
-from app.core.logger_config import setup_logger
+from app.core.logger_config import setup_logger, should_sample
 from app.core.config import settings
 
 logger = setup_logger('api_router', log_file=settings.LOG_FILE_API)
 
 router = APIRouter()
 
+# Every response carries the ring epoch it was computed from, so clients can
+# detect topology changes without polling the node list.
+EPOCH_HEADER = "X-Ring-Epoch"
+
 
 @router.get("/get-node/{key}", response_model=str, tags=["Hashing"])
-def get_node_for_key(key: str):
+def get_node_for_key(key: str, response: Response):
     """
     Given a key, returns the node it is mapped to in the consistent hashing ring.
     This is the primary endpoint for determining data placement.
+    The ring epoch used for the lookup is returned in the X-Ring-Epoch header.
     """
     if not key:
         logger.warning("API call to /get-node/ received an empty key.")
         raise HTTPException(status_code=400, detail="Key cannot be empty.")
 
-    node = hashing_service.get_node(key)
+    node, epoch = hashing_service.route(key)
+    response.headers[EPOCH_HEADER] = str(epoch)
 
     if node is None:
         logger.error(f"No available nodes in the hash ring for key: '{key}'")
         raise HTTPException(status_code=503, detail="The hash ring is empty; no nodes available.")
 
-    logger.info(f"Request for key '{key}' was successfully routed to node '{node}'.")
+    if should_sample(settings.REQUEST_LOG_SAMPLE_RATE):
+        logger.info("Request for key '%s' was successfully routed to node '%s'.", key, node)
     return node
 
 
+async def _read_batch_keys(request: Request) -> List[str]:
+    """
+    Reads the keys of a batch request: either a JSON array of strings, or an
+    NDJSON body (``application/x-ndjson``) with one JSON string per line that
+    is parsed as it streams in.
+    """
+    keys: List[str] = []
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            pending = b""
+            async for chunk in request.stream():
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                keys.extend(json.loads(line) for line in lines if line.strip())
+                if len(keys) > settings.MAX_BATCH_KEYS:
+                    break
+            if pending.strip():
+                keys.append(json.loads(pending))
+        else:
+            keys = json.loads(await request.body())
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed batch body: {e}")
+
+    if not isinstance(keys, list) or not all(isinstance(key, str) and key for key in keys):
+        raise HTTPException(status_code=400, detail="The batch must be a list of non-empty string keys.")
+    if len(keys) > settings.MAX_BATCH_KEYS:
+        raise HTTPException(status_code=413, detail=f"A batch may hold at most {settings.MAX_BATCH_KEYS} keys.")
+    return keys
+
+
+@router.post("/get-nodes", tags=["Hashing"])
+async def get_nodes_for_keys(
+    request: Request,
+    response: Response,
+    group_by_node: bool = Query(False, description="Return keys grouped by node instead of a key to node map."),
+):
+    """
+    Routes a whole batch of keys in one request using the vectorized lookup path.
+    The body is a JSON array of keys, or NDJSON (one JSON string per line) sent
+    with ``Content-Type: application/x-ndjson``.
+    """
+    keys = await _read_batch_keys(request)
+
+    snapshot = hashing_service.snapshot()
+    if not snapshot.nodes:
+        logger.error(f"No available nodes in the hash ring for a batch of {len(keys)} keys.")
+        raise HTTPException(status_code=503, detail="The hash ring is empty; no nodes available.")
+
+    # Resolve off the event loop: hashing a large batch is CPU work.
+    nodes = await run_in_threadpool(snapshot.get_nodes, keys)
+    response.headers[EPOCH_HEADER] = str(snapshot.epoch)
+    if should_sample(settings.REQUEST_LOG_SAMPLE_RATE):
+        logger.info("Routed a batch of %d keys across %d node(s).", len(keys), len(set(nodes)))
+
+    if group_by_node:
+        groups = {node: [] for node in snapshot.nodes}
+        for key, node in zip(keys, nodes):
+            groups[node].append(key)
+        return {"epoch": snapshot.epoch, "groups": {node: grouped for node, grouped in groups.items() if grouped}}
+    return {"epoch": snapshot.epoch, "nodes": dict(zip(keys, nodes))}
+
+
+def _ring_snapshot_for_replicas():
+    if not hashing_service.uses_ring_engine():
+        raise HTTPException(status_code=400, detail="Replica sets are only available for the ring engine.")
+    snapshot = hashing_service.snapshot()
+    if not snapshot.nodes:
+        logger.error("No available nodes in the hash ring for a replica lookup.")
+        raise HTTPException(status_code=503, detail="The hash ring is empty; no nodes available.")
+    return snapshot
+
+
+@router.get("/get-replicas/{key}", response_model=List[str], tags=["Hashing"])
+def get_replicas_for_key(
+    key: str,
+    response: Response,
+    n: int = Query(3, ge=1, description="Number of distinct physical nodes to return."),
+    distinct_zones: bool = Query(False, description="Prefer nodes in different zones."),
+):
+    """
+    Returns the ``n`` distinct physical nodes responsible for a replicated key,
+    primary owner first, found in a single clockwise walk of the ring.
+    """
+    snapshot = _ring_snapshot_for_replicas()
+    response.headers[EPOCH_HEADER] = str(snapshot.epoch)
+    return snapshot.get_nodes_for_key(key, n, distinct_zones)
+
+
+@router.post("/get-replicas", tags=["Hashing"])
+async def get_replicas_for_keys(
+    request: Request,
+    response: Response,
+    n: int = Query(3, ge=1, description="Number of distinct physical nodes per key."),
+    distinct_zones: bool = Query(False, description="Prefer nodes in different zones."),
+):
+    """
+    Batch version of ``/get-replicas/{key}``; accepts the same bodies as ``/get-nodes``.
+    """
+    keys = await _read_batch_keys(request)
+    snapshot = _ring_snapshot_for_replicas()
+    replica_sets = await run_in_threadpool(snapshot.get_replica_sets, keys, n, distinct_zones)
+    response.headers[EPOCH_HEADER] = str(snapshot.epoch)
+    if should_sample(settings.REQUEST_LOG_SAMPLE_RATE):
+        logger.info("Resolved replica sets of size %d for a batch of %d keys.", n, len(keys))
+    return {"epoch": snapshot.epoch, "replicas": dict(zip(keys, replica_sets))}
+
+
 @router.post("/nodes/{node_name}", status_code=201, tags=["Cluster Management"])
-def add_new_node(node_name: str):
+def add_new_node(
+    node_name: str,
+    response: Response,
+    weight: float = Query(1.0, gt=0, description="Relative capacity; a weight of 2 takes twice the keys."),
+    zone: Optional[str] = Query(None, description="Failure domain (rack, availability zone) of the node."),
+):
     """
     Dynamically adds a new node to the consistent hashing ring.
     This simulates scaling up the cluster.
@@ -39,36 +160,142 @@ def add_new_node(node_name: str):
         logger.warning("API call to add a node received an empty node name.")
         raise HTTPException(status_code=400, detail="Node name cannot be empty.")
 
-    if node_name in hashing_service.get_all_nodes():
+    try:
+        added = hashing_service.add_node(node_name, weight, zone)
+    except ValueError as e:
+        logger.warning(f"Rejected adding node '{node_name}' with weight {weight}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    if not added:
         logger.warning(f"Attempted to add node '{node_name}' which already exists.")
         raise HTTPException(status_code=409, detail=f"Node '{node_name}' already exists in the ring.")
+    logger.info(f"Node '{node_name}' was added to the ring with weight {weight:g} via API request.")
 
-    hashing_service.add_node(node_name)
-    logger.info(f"Node '{node_name}' was added to the ring via API request.")
-
-    return {"message": f"Node '{node_name}' added successfully.", "current_nodes": hashing_service.get_all_nodes()}
+    snapshot = hashing_service.snapshot()
+    response.headers[EPOCH_HEADER] = str(snapshot.epoch)
+    return {
+        "message": f"Node '{node_name}' added successfully.",
+        "current_nodes": list(snapshot.nodes),
+        "epoch": snapshot.epoch,
+    }
 
 
 @router.delete("/nodes/{node_name}", tags=["Cluster Management"])
-def remove_existing_node(node_name: str):
+def remove_existing_node(node_name: str, response: Response):
     """
     Dynamically removes an existing node from the consistent hashing ring.
     This simulates a server failure or scaling down the cluster.
     """
-    if node_name not in hashing_service.get_all_nodes():
+    if not hashing_service.remove_node(node_name):
         logger.warning(f"Attempted to remove non-existent node '{node_name}' via API.")
         raise HTTPException(status_code=404, detail=f"Node '{node_name}' not found in the ring.")
-
-    hashing_service.remove_node(node_name)
     logger.info(f"Node '{node_name}' was removed from the ring via API request.")
 
-    return {"message": f"Node '{node_name}' removed successfully.", "current_nodes": hashing_service.get_all_nodes()}
+    snapshot = hashing_service.snapshot()
+    response.headers[EPOCH_HEADER] = str(snapshot.epoch)
+    return {
+        "message": f"Node '{node_name}' removed successfully.",
+        "current_nodes": list(snapshot.nodes),
+        "epoch": snapshot.epoch,
+    }
+
+
+def _require_bounded_load():
+    if not hashing_service.bounded_load_enabled():
+        raise HTTPException(status_code=400, detail="Bounded-load mode is off (BOUNDED_LOAD_EPSILON is unset).")
+
+
+@router.post("/placements/{key}", response_model=str, tags=["Hashing"])
+def place_key(key: str, response: Response):
+    """
+    In bounded-load mode, places a key on a node whose load stays within the
+    bound and returns it. The key counts as one unit of load there and keeps
+    that node until it is released, even if it is placed again.
+    """
+    _require_bounded_load()
+    node, epoch = hashing_service.place(key)
+    response.headers[EPOCH_HEADER] = str(epoch)
+
+    if node is None:
+        logger.error("No available nodes in the hash ring to place key: '%s'", key)
+        raise HTTPException(status_code=503, detail="The hash ring is empty; no nodes available.")
+
+    if should_sample(settings.REQUEST_LOG_SAMPLE_RATE):
+        logger.info("Key '%s' was placed on node '%s'.", key, node)
+    return node
+
+
+@router.delete("/placements/{key}", tags=["Hashing"])
+def release_key(key: str):
+    """
+    In bounded-load mode, releases a key placed with ``POST /placements/{key}``
+    and the unit of load it held on its node.
+    """
+    _require_bounded_load()
+    node = hashing_service.release(key)
+    if node is None:
+        logger.warning("Attempted to release key '%s', which is not placed.", key)
+        raise HTTPException(status_code=404, detail=f"Key '{key}' is not placed.")
+    return {"message": f"Released key '{key}' from node '{node}'.", "node": node}
 
 
 @router.get("/nodes", response_model=List[str], tags=["Cluster Management"])
-def get_all_nodes():
+def get_all_nodes(response: Response):
     """
     Returns a list of all physical nodes currently in the consistent hashing ring.
     """
     logger.info("API request to list all current nodes in the ring.")
-    return hashing_service.get_all_nodes()
+    snapshot = hashing_service.snapshot()
+    response.headers[EPOCH_HEADER] = str(snapshot.epoch)
+    return list(snapshot.nodes)
+
+
+@router.get("/nodes/ownership", tags=["Cluster Management"])
+def get_node_ownership(response: Response):
+    """
+    Reports each node's weight and the actual fraction of the hash space it owns,
+    which is the share of keys it should expect to receive.
+    """
+    logger.info("API request for the hash space ownership of each node.")
+    snapshot = hashing_service.snapshot()
+    response.headers[EPOCH_HEADER] = str(snapshot.epoch)
+    shares = snapshot.ownership()
+    return {
+        "epoch": snapshot.epoch,
+        "nodes": {
+            node: {"weight": weight, "zone": zone, "share": shares.get(node, 0.0)}
+            for node, weight, zone in zip(snapshot.nodes, snapshot.weights, snapshot.zones)
+        },
+    }
+
+
+@router.get("/cache/stats", tags=["Hashing"])
+def get_cache_stats():
+    """
+    Reports the size and hit/miss/eviction counters of the key lookup cache,
+    to help tune ``LOOKUP_CACHE_SIZE``.
+    """
+    return hashing_service.get_cache_stats()
+
+
+@router.get("/rebalance/last", tags=["Cluster Management"])
+def get_last_rebalance_plan():
+    """
+    Returns the hash ranges whose owner changed in the most recent node addition
+    or removal, as half-open ``[start, end)`` 64-bit hash intervals. Only keys
+    hashing into these ranges need to migrate.
+    """
+    if not hashing_service.uses_ring_engine():
+        raise HTTPException(status_code=400, detail="Rebalance planning is only available for the ring engine.")
+
+    plan = hashing_service.get_last_rebalance_plan()
+    if plan is None:
+        raise HTTPException(status_code=404, detail="No topology change has happened yet.")
+
+    before, after, ranges = plan
+    logger.info(f"Rebalance plan for epoch {before.epoch} -> {after.epoch}: {len(ranges)} moved range(s).")
+    return {
+        "from_epoch": before.epoch,
+        "to_epoch": after.epoch,
+        "moved_fraction": sum(moved.end - moved.start for moved in ranges) / 2 ** 64,
+        "ranges": [moved._asdict() for moved in ranges],
+    }
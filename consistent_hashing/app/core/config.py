@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 class Settings:
     """
@@ -7,5 +7,17 @@ class Settings:
     INITIAL_NODES: List[str] = ["cache-node-1", "cache-node-2", "cache-node-3"]
     LOG_FILE_API: str = "api.log"
     LOG_FILE_HASHING: str = "hashing.log"
+    LOG_USE_QUEUE: bool = True  # Hand records to a background thread instead of writing them inline
+    REQUEST_LOG_SAMPLE_RATE: float = 1.0  # Fraction of per-request INFO lines to log, e.g. 0.01 under load
+    HASH_FUNCTION: str = "md5"  # One of: md5, blake2b, murmur64
+    HASHING_ENGINE: str = "ring"  # One of: ring, jump, rendezvous, maglev
+    REPLICAS: int = 100  # Virtual nodes per physical node for the ring engine
+    MAGLEV_TABLE_SIZE: int = 65537  # Must be prime and larger than the node count
+    RING_SNAPSHOT_PATH: Optional[str] = None  # Binary ring snapshot, loaded at startup and saved on change
+    TOPOLOGY_LOG_PATH: Optional[str] = None  # SQLite change log shared by worker processes
+    TOPOLOGY_SYNC_INTERVAL: float = 0.1  # Seconds between polls of the topology log
+    LOOKUP_CACHE_SIZE: int = 0  # Entries in the key -> node LRU cache; 0 disables it
+    MAX_BATCH_KEYS: int = 100_000  # Upper bound on keys per POST /api/get-nodes request
+    BOUNDED_LOAD_EPSILON: Optional[float] = None  # e.g. 0.25 caps ring nodes at 1.25x average load
 
 settings = Settings()
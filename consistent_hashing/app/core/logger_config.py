@@ -1,25 +1,37 @@
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 import sys
+from typing import Dict, List, Optional
+
+from app.core.config import settings
 
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
-def setup_logger(name: str, level=logging.INFO, log_file: str = None) -> logging.Logger:
+# One queue and listener thread per log file, shared by every logger writing to it.
+_queue_handlers: Dict[Optional[str], QueueHandler] = {}
+
+
+class _DeferredQueueHandler(QueueHandler):
     """
-    This function configures a logger to output messages to the console and,
-    optionally, to a time-rotating file.
+    Enqueues records unformatted, so that ``%`` formatting of the message runs
+    on the listener thread instead of the thread that logged it. The stock
+    ``prepare`` formats eagerly to make records safe to pickle to another
+    process, which an in-process queue does not need.
     """
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
 
-    formatter = logging.Formatter(LOG_FORMAT)
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
-    if logger.hasHandlers():
-        logger.handlers.clear()
+
+def _build_handlers(log_file: Optional[str]) -> List[logging.Handler]:
+    formatter = logging.Formatter(LOG_FORMAT)
 
     stream_handler = logging.StreamHandler(sys.stdout)
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    handlers: List[logging.Handler] = [stream_handler]
 
     if log_file:
         file_handler = TimedRotatingFileHandler(
@@ -29,9 +41,51 @@ def setup_logger(name: str, level=logging.INFO, log_file: str = None) -> logging
             encoding='utf-8'
         )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    return handlers
+
+
+def _queue_handler(log_file: Optional[str]) -> QueueHandler:
+    """Returns the shared queue handler for ``log_file``, starting its listener on first use."""
+    handler = _queue_handlers.get(log_file)
+    if handler is None:
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *_build_handlers(log_file), respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)  # Drains the queue before the process exits
+        handler = _queue_handlers[log_file] = _DeferredQueueHandler(log_queue)
+    return handler
+
+
+def setup_logger(name: str, level=logging.INFO, log_file: str = None, use_queue: Optional[bool] = None) -> logging.Logger:
+    """
+    This function configures a logger to output messages to the console and,
+    optionally, to a time-rotating file.
+
+    With ``use_queue`` (default: ``settings.LOG_USE_QUEUE``) the logger only
+    puts records on an in-memory queue, and a background listener thread does
+    the formatting and the console/file I/O, so logging never blocks the caller.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+
+    if logger.hasHandlers():
+        logger.handlers.clear()
+
+    if settings.LOG_USE_QUEUE if use_queue is None else use_queue:
+        logger.addHandler(_queue_handler(log_file))
+    else:
+        for handler in _build_handlers(log_file):
+            logger.addHandler(handler)
 
     logger.propagate = False
 
     return logger
 
+
+def should_sample(rate: float) -> bool:
+    """
+    Returns True for roughly ``rate`` of calls. Per-request log lines are
+    guarded with it, so unsampled requests do not even build a log record.
+    """
+    return rate >= 1.0 or random.random() < rate
@@ -0,0 +1,148 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.core.logger_config import setup_logger
+from app.core.config import settings
+from app.hashing.hash_functions import get_hash_function
+
+logger = setup_logger(__name__, log_file=settings.LOG_FILE_HASHING)
+
+
+class EngineSnapshot:
+    """
+    An immutable placement table at one point in time.
+
+    Snapshots are never mutated once built, so any number of threads can read
+    one without locking. ``weights`` and ``zones`` (the failure domain, e.g.
+    rack or availability zone, of each node; None when unknown) are aligned
+    with ``nodes``, and ``epoch`` increases by one with every topology change.
+    """
+    __slots__ = ('nodes', 'weights', 'zones', 'epoch')
+
+    def __init__(self, nodes: Sequence[str], weights: Sequence[float], epoch: int,
+                 zones: Optional[Sequence[Optional[str]]] = None):
+        self.nodes = tuple(nodes)
+        self.weights = tuple(weights)
+        self.zones = tuple(zones) if zones is not None else (None,) * len(self.nodes)
+        self.epoch = epoch
+
+    def weight_of(self, node: str) -> float:
+        return self.weights[self.nodes.index(node)]
+
+    def ownership(self) -> Dict[str, float]:
+        """Returns the fraction of the key space owned by each node."""
+        raise NotImplementedError
+
+    def get_node(self, key: str) -> Optional[str]:
+        """Finds the node responsible for a given key."""
+        raise NotImplementedError
+
+    def get_nodes(self, keys: Iterable[str]) -> List[Optional[str]]:
+        """Finds the responsible node for every key of a batch, aligned with ``keys``."""
+        raise NotImplementedError
+
+
+class HashingEngine:
+    """
+    Base class for the key placement engines.
+
+    Placement state is published as copy-on-write ``EngineSnapshot`` objects.
+    Writers serialize on a lock, build the next snapshot next to the current
+    one and swap it in with a single attribute assignment; readers just grab
+    the current snapshot and never see a half-applied change.
+
+    Subclasses implement ``_empty_snapshot``, ``_with_nodes_added`` and
+    ``_with_node_removed``; node zones are carried over by the base class.
+    """
+
+    def __init__(self, hash_function: str = "md5"):
+        self.hash_function = hash_function
+        self._hash = get_hash_function(hash_function)
+        self._write_lock = threading.Lock()
+        self._snapshot = self._empty_snapshot()
+
+    def _empty_snapshot(self) -> EngineSnapshot:
+        raise NotImplementedError
+
+    def _with_nodes_added(self, current: EngineSnapshot, new_nodes: List[str],
+                          new_weights: List[float]) -> EngineSnapshot:
+        raise NotImplementedError
+
+    def _with_node_removed(self, current: EngineSnapshot, node: str) -> EngineSnapshot:
+        raise NotImplementedError
+
+    def snapshot(self) -> EngineSnapshot:
+        """Returns the current immutable snapshot."""
+        return self._snapshot
+
+    @property
+    def epoch(self) -> int:
+        return self._snapshot.epoch
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._snapshot.nodes)
+
+    def _check_weight(self, weight: float):
+        """Rejects weights the engine cannot honour; raises ``ValueError``."""
+        if not weight > 0:
+            raise ValueError(f"Node weight must be positive, got {weight}.")
+
+    def _publish(self, snapshot: EngineSnapshot, zone_of: Dict[str, Optional[str]]):
+        """Fills in the zones of a freshly built snapshot, then swaps it in."""
+        snapshot.zones = tuple(zone_of.get(node) for node in snapshot.nodes)
+        self._snapshot = snapshot
+
+    def add_node(self, node: str, weight: float = 1.0, zone: Optional[str] = None):
+        """Adds a physical node to the engine. ``weight`` scales its share of the keys."""
+        self.add_nodes([node], [weight], [zone])
+
+    def add_nodes(self, nodes: Iterable[str], weights: Optional[Iterable[float]] = None,
+                  zones: Optional[Iterable[Optional[str]]] = None):
+        """Adds several physical nodes with a single snapshot rebuild."""
+        nodes = list(nodes)
+        weights = [1.0] * len(nodes) if weights is None else [float(w) for w in weights]
+        zones = [None] * len(nodes) if zones is None else list(zones)
+        for weight in weights:
+            self._check_weight(weight)
+
+        with self._write_lock:
+            current = self._snapshot
+            new_nodes, new_weights, zone_of = [], [], dict(zip(current.nodes, current.zones))
+            for node, weight, zone in zip(nodes, weights, zones):
+                if node in current.nodes or node in new_nodes:
+                    logger.warning("Node '%s' already exists in the ring.", node)
+                    continue
+                logger.info("Adding node '%s' with weight %g to the %s ring.", node, weight, type(self).__name__)
+                new_nodes.append(node)
+                new_weights.append(weight)
+                zone_of[node] = zone
+            if not new_nodes:
+                return
+            self._publish(self._with_nodes_added(current, new_nodes, new_weights), zone_of)
+
+    def remove_node(self, node: str):
+        """Removes a physical node from the engine."""
+        with self._write_lock:
+            current = self._snapshot
+            if node not in current.nodes:
+                logger.warning("Attempted to remove node '%s', which does not exist.", node)
+                return
+            logger.info("Removing node '%s' from the %s ring.", node, type(self).__name__)
+            self._publish(self._with_node_removed(current, node), dict(zip(current.nodes, current.zones)))
+
+    def ownership(self) -> Dict[str, float]:
+        """Returns the fraction of the key space owned by each node in the current snapshot."""
+        return self._snapshot.ownership()
+
+    def get_node(self, key: str) -> Optional[str]:
+        """Finds the node responsible for a given key in the current snapshot."""
+        return self._snapshot.get_node(key)
+
+    def get_nodes(self, keys: Iterable[str]) -> List[Optional[str]]:
+        """Resolves a batch of keys against one consistent snapshot."""
+        return self._snapshot.get_nodes(keys)
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the placement tables in the current snapshot."""
+        raise NotImplementedError
@@ -0,0 +1,42 @@
+import math
+from typing import Dict, Optional
+
+
+class LoadTracker:
+    """
+    Tracks the current load of each node for bounded-load placement.
+
+    Any object exposing ``load(node)`` and ``total`` can be passed to
+    ``ConsistentHashing.get_node`` instead; this one keeps a plain counter per
+    node so both lookups are O(1).
+    """
+    __slots__ = ('_loads', 'total')
+
+    def __init__(self):
+        self._loads: Dict[str, float] = {}
+        self.total: float = 0.0
+
+    def load(self, node: str) -> float:
+        return self._loads.get(node, 0.0)
+
+    def add(self, node: str, amount: float = 1.0):
+        self._loads[node] = self._loads.get(node, 0.0) + amount
+        self.total += amount
+
+    def remove(self, node: str, amount: float = 1.0):
+        self.add(node, -amount)
+
+    def reset(self, node: Optional[str] = None):
+        """Forgets the load of one node, or of every node when ``node`` is None."""
+        if node is None:
+            self._loads.clear()
+            self.total = 0.0
+        else:
+            self.total -= self._loads.pop(node, 0.0)
+
+
+def load_capacity(total_load: float, weight: float, total_weight: float, epsilon: float) -> float:
+    """The bounded-load cap ``ceil((1 + epsilon) * average)``, where the average
+    counts the item being placed and is scaled by the node's share of the weight.
+    """
+    return math.ceil((1 + epsilon) * (total_load + 1) * weight / total_weight)
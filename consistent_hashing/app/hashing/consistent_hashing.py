@@ -1,78 +1,340 @@
-import hashlib
 import bisect
-from typing import List, Dict, Optional
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
 from app.core.logger_config import setup_logger
 from app.core.config import settings
+from app.hashing.base import EngineSnapshot, HashingEngine
+from app.hashing.bounded_load import load_capacity
 
 logger = setup_logger(__name__, log_file=settings.LOG_FILE_HASHING)
 
-class ConsistentHashing:
-    """
-    A class to implement a consistent hashing ring for distributed systems.
-    ...
+
+class RingSnapshot(EngineSnapshot):
     """
+    An immutable view of the hash ring at one point in time.
 
-    def __init__(self, nodes: Optional[List[str]] = None, replicas: int = 100):
-        self.replicas = replicas
-        self.ring: Dict[int, str] = {}
-        self.sorted_keys: List[int] = []
-        self.nodes: List[str] = []
+    Ring positions are unsigned 64-bit points kept in a compact ``array('Q')``
+    buffer, with a parallel ``array('I')`` of indexes into ``nodes`` telling
+    which physical node owns each point. A snapshot loaded from disk holds
+    ``memoryview`` casts of a memory-mapped file instead (see ``ring_store``).
+    """
+    __slots__ = ('points', 'owners', '_hash', '_next_distinct')
 
-        if nodes:
-            for node in nodes:
-                self.add_node(node)
+    def __init__(self, points: Sequence[int], owners: Sequence[int], nodes: Sequence[str],
+                 weights: Sequence[float], epoch: int, hash_fn: Callable[[str], int],
+                 zones: Optional[Sequence[Optional[str]]] = None):
+        super().__init__(nodes, weights, epoch, zones)
+        self.points = points
+        self.owners = owners
+        self._hash = hash_fn
+        self._next_distinct = None
 
-    def _hash(self, key: str) -> int:
-        """Generates an integer hash for a given key using MD5.
-            MD5 algorithm produces 128-bit hash and converts this hash into larger integer
-            which represents a point on hash ring
-        """
-        return int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16)
-
-    def add_node(self, node: str):
-        """Adds a physical node to the hash ring, including its replicas to ensure uniform distribution"""
-        if node in self.nodes:
-            logger.warning(f"Node '{node}' already exists in the ring.")
-            return
-
-        logger.info(f"Adding node '{node}' with {self.replicas} replicas to the ring.")
-        self.nodes.append(node)
-        for i in range(self.replicas):
-            replica_key = f"{node}:{i}"
-            hash_key = self._hash(replica_key)
-            self.ring[hash_key] = node
-            bisect.insort(self.sorted_keys, hash_key)
-        logger.debug(f"Ring size is now {len(self.sorted_keys)} after adding '{node}'.")
-
-    def remove_node(self, node: str):
-        """Removes a physical node and all its replicas from the hash ring."""
-        if node not in self.nodes:
-            logger.warning(f"Attempted to remove node '{node}', which does not exist.")
-            return
-
-        logger.info(f"Removing node '{node}' from the ring.")
-        self.nodes.remove(node)
-        keys_to_remove = []
-        for i in range(self.replicas):
-            replica_key = f"{node}:{i}"
-            hash_key = self._hash(replica_key)
-            keys_to_remove.append(hash_key)
-            if hash_key in self.ring:
-                del self.ring[hash_key]
-        self.sorted_keys = [k for k in self.sorted_keys if k not in keys_to_remove]
-        logger.debug(f"Ring size is now {len(self.sorted_keys)} after removing '{node}'.")
+    def ownership(self) -> Dict[str, float]:
+        """Sums the arc lengths owned by each node; every point owns the arc ending at it."""
+        if not self.points:
+            return {}
+        points = np.frombuffer(self.points, dtype=np.uint64)
+        arcs = np.empty(len(points), dtype=np.float64)
+        arcs[1:] = np.diff(points).astype(np.float64)
+        # The first point also owns the arc that wraps around past 2**64.
+        arcs[0] = float(2 ** 64 - int(points[-1]) + int(points[0]))
+        shares = np.bincount(
+            np.frombuffer(self.owners, dtype=np.uint32), weights=arcs, minlength=len(self.nodes)
+        ) / float(2 ** 64)
+        return dict(zip(self.nodes, shares.tolist()))
 
     def get_node(self, key: str) -> Optional[str]:
-        """Finds the node responsible for a given key in the hash ring."""
-        if not self.ring:
+        """Finds the node responsible for a given key by bisecting the point buffer."""
+        if not self.points:
             logger.error("The hash ring is empty. Cannot find a node for the key.")
             return None
 
         hash_key = self._hash(key)
-        idx = bisect.bisect_right(self.sorted_keys, hash_key)
-        if idx == len(self.sorted_keys):
+        idx = bisect.bisect_right(self.points, hash_key)
+        if idx == len(self.points):
             idx = 0
-        responsible_node = self.ring[self.sorted_keys[idx]]
-        logger.debug(f"Key '{key}' (hash: {hash_key}) is mapped to node '{responsible_node}'.")
+        responsible_node = self.nodes[self.owners[idx]]
+        logger.debug("Key '%s' (hash: %d) is mapped to node '%s'.", key, hash_key, responsible_node)
         return responsible_node
 
+    def get_node_bounded(self, key: str, loads, epsilon: float) -> Optional[str]:
+        """Consistent hashing with bounded loads (Mirrokni et al.).
+
+        Starts at the key's usual point and walks clockwise until it reaches a
+        node whose current load, as reported by ``loads.load(node)``, is below
+        ``ceil((1 + epsilon) * average)``. ``loads.total`` is the load of the
+        whole cluster; the caller records the placement in ``loads`` itself.
+        """
+        if not self.points:
+            logger.error("The hash ring is empty. Cannot find a node for the key.")
+            return None
+
+        points, owners, nodes, weights = self.points, self.owners, self.nodes, self.weights
+        total_weight = sum(weights)
+        total_load = loads.total
+        start = bisect.bisect_right(points, self._hash(key))
+        checked = set()
+        for step in range(len(points)):
+            owner = owners[(start + step) % len(points)]
+            if owner in checked:
+                continue
+            checked.add(owner)
+            node = nodes[owner]
+            if loads.load(node) < load_capacity(total_load, weights[owner], total_weight, epsilon):
+                if step:
+                    logger.debug("Key '%s' skipped %d overloaded node(s) to '%s'.", key, len(checked) - 1, node)
+                return node
+            if len(checked) == len(nodes):
+                break
+        # Every node is at capacity (only possible with inconsistent loads); fall back to the owner.
+        return nodes[owners[start % len(points)]]
+
+    def next_distinct(self) -> array:
+        """For each point, the index of the next point (clockwise) owned by a different node.
+
+        Built once per snapshot in a vectorized pass, it lets replica walks hop
+        over a whole run of one node's adjacent virtual points in a single step.
+        """
+        if self._next_distinct is None:
+            owners = np.frombuffer(self.owners, dtype=np.uint32)
+            run_starts = np.flatnonzero(owners != np.roll(owners, 1))
+            if len(run_starts) == 0:
+                # A single owner: every walk ends where it started.
+                following = np.arange(len(owners))
+            else:
+                after = np.searchsorted(run_starts, np.arange(len(owners)), side='right')
+                following = run_starts[after % len(run_starts)]
+            self._next_distinct = array('I', following.astype(np.uint32).tobytes())
+        return self._next_distinct
+
+    def _walk_replicas(self, start: int, n: int, distinct_zones: bool) -> List[str]:
+        """Collects up to ``n`` distinct nodes clockwise from point index ``start``."""
+        owners, nodes, zones = self.owners, self.nodes, self.zones
+        following = self.next_distinct()
+        wanted = min(n, len(nodes))
+        if wanted <= 0:
+            return []
+        chosen: List[int] = []
+        deferred: List[int] = []
+        seen, used_zones = set(), set()
+
+        idx = start
+        for _ in range(len(owners)):
+            owner = owners[idx]
+            if owner not in seen:
+                seen.add(owner)
+                zone = zones[owner]
+                if distinct_zones and zone is not None and zone in used_zones:
+                    deferred.append(owner)
+                else:
+                    chosen.append(owner)
+                    used_zones.add(zone)
+                    if len(chosen) == wanted:
+                        break
+                if len(seen) == len(nodes):
+                    break
+            idx = following[idx]
+            if idx == start:
+                break
+
+        # Not enough zones to go around: fill up with the skipped nodes in ring order.
+        chosen.extend(deferred[:wanted - len(chosen)])
+        return [nodes[owner] for owner in chosen]
+
+    def get_nodes_for_key(self, key: str, n: int, distinct_zones: bool = False) -> List[str]:
+        """Returns the ``n`` distinct physical nodes that follow ``key`` clockwise.
+
+        The first entry is the key's primary owner. With ``distinct_zones`` the
+        walk prefers nodes in zones not used yet, and only repeats a zone when
+        there are fewer zones than replicas.
+        """
+        if not self.points:
+            logger.error("The hash ring is empty. Cannot find replicas for the key.")
+            return []
+        idx = bisect.bisect_right(self.points, self._hash(key))
+        return self._walk_replicas(idx % len(self.points), n, distinct_zones)
+
+    def get_replica_sets(self, keys: Iterable[str], n: int, distinct_zones: bool = False) -> List[List[str]]:
+        """Batch ``get_nodes_for_key``: the starting points of all keys come from one ``searchsorted``."""
+        keys = list(keys)
+        if not self.points:
+            logger.error("The hash ring is empty. Cannot find replicas for the batch.")
+            return [[] for _ in keys]
+
+        _hash = self._hash
+        hashes = np.fromiter((_hash(key) for key in keys), dtype=np.uint64, count=len(keys))
+        starts = np.searchsorted(np.frombuffer(self.points, dtype=np.uint64), hashes, side='right') % len(self.points)
+        return [self._walk_replicas(start, n, distinct_zones) for start in starts.tolist()]
+
+    def get_nodes(self, keys: Iterable[str]) -> List[Optional[str]]:
+        """Finds the responsible node for every key of a batch in one vectorized lookup.
+
+        Returns a list aligned with ``keys``; it gives the same answer as calling
+        ``get_node`` for each key.
+        """
+        keys = list(keys)
+        if not self.points:
+            logger.error("The hash ring is empty. Cannot find nodes for the batch.")
+            return [None] * len(keys)
+
+        _hash = self._hash
+        hashes = np.fromiter((_hash(key) for key in keys), dtype=np.uint64, count=len(keys))
+        points = np.frombuffer(self.points, dtype=np.uint64)
+        idx = np.searchsorted(points, hashes, side='right')
+        idx[idx == len(points)] = 0
+        owners = np.frombuffer(self.owners, dtype=np.uint32)[idx]
+        nodes = self.nodes
+        logger.debug("Resolved a batch of %d keys.", len(keys))
+        return [nodes[i] for i in owners.tolist()]
+
+
+class ConsistentHashing(HashingEngine):
+    """
+    A class to implement a consistent hashing ring for distributed systems.
+
+    The scalar path bisects the snapshot's point buffer, while the batch path
+    views it as a NumPy array and resolves every key of a batch with a single
+    ``searchsorted``.
+
+    Membership changes never rebuild the ring: a node's virtual points are
+    hashed and sorted on their own, then merged into (or masked out of) the
+    existing sorted buffer in a single vectorized pass.
+
+    With ``load_epsilon`` set the ring runs in bounded-load mode: ``get_node``
+    accepts a load-tracking hook and never places a key on a node already past
+    ``(1 + load_epsilon)`` times its fair share of the load.
+
+    A node of weight ``w`` gets ``round(replicas * w)`` virtual points (at
+    least one), so bigger boxes own proportionally more of the ring.
+
+    Points come from a pluggable 64-bit hash strategy (see ``hash_functions``),
+    ``md5`` by default.
+    """
+
+    def __init__(self, nodes: Optional[List[str]] = None, replicas: int = 100, hash_function: str = "md5",
+                 load_epsilon: Optional[float] = None):
+        if load_epsilon is not None and load_epsilon <= 0:
+            raise ValueError(f"load_epsilon must be positive, got {load_epsilon}.")
+        self.replicas = replicas
+        self.load_epsilon = load_epsilon
+        super().__init__(hash_function)
+
+        if nodes:
+            self.add_nodes(nodes)
+
+    def get_node(self, key: str, loads=None) -> Optional[str]:
+        """Finds the node responsible for a key.
+
+        In bounded-load mode, pass ``loads`` (e.g. a ``LoadTracker``) to skip
+        nodes that are over capacity; without it the plain owner is returned.
+        """
+        snapshot = self._snapshot
+        if loads is not None and self.load_epsilon is not None:
+            return snapshot.get_node_bounded(key, loads, self.load_epsilon)
+        return snapshot.get_node(key)
+
+    def load_snapshot(self, snapshot: RingSnapshot):
+        """Replaces the ring with a previously saved snapshot, keeping its epoch.
+
+        The snapshot must have been built with this ring's replicas and hash function.
+        """
+        with self._write_lock:
+            self._snapshot = snapshot
+
+    def get_nodes_for_key(self, key: str, n: int, distinct_zones: bool = False) -> List[str]:
+        """Returns ``n`` distinct physical nodes for replicated placement of ``key``."""
+        return self._snapshot.get_nodes_for_key(key, n, distinct_zones)
+
+    def get_replica_sets(self, keys: Iterable[str], n: int, distinct_zones: bool = False) -> List[List[str]]:
+        """Returns the replica set of every key of a batch, from one consistent snapshot."""
+        return self._snapshot.get_replica_sets(keys, n, distinct_zones)
+
+    @property
+    def sorted_keys(self) -> array:
+        return self._snapshot.points
+
+    def memory_bytes(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.points.itemsize * len(snapshot.points) + snapshot.owners.itemsize * len(snapshot.owners)
+
+    def _empty_snapshot(self) -> RingSnapshot:
+        return RingSnapshot(array('Q'), array('I'), (), (), 0, self._hash)
+
+    def virtual_nodes(self, weight: float) -> int:
+        """Number of virtual points given to a node of the given weight."""
+        return max(1, round(self.replicas * weight))
+
+    def node_points(self, node: str, weight: float = 1.0) -> np.ndarray:
+        """Hashes all virtual points of a node and returns them sorted and de-duplicated."""
+        _hash = self._hash
+        count = self.virtual_nodes(weight)
+        points = np.fromiter((_hash(f"{node}:{i}") for i in range(count)), dtype=np.uint64, count=count)
+        return np.unique(points)
+
+    def _next_snapshot(self, current: RingSnapshot, points: np.ndarray, owners: np.ndarray,
+                       nodes: Sequence[str], weights: Sequence[float]) -> RingSnapshot:
+        """Builds the next snapshot from freshly computed buffers."""
+        return RingSnapshot(
+            array('Q', points.tobytes()),
+            array('I', owners.astype(np.uint32, copy=False).tobytes()),
+            nodes,
+            weights,
+            current.epoch + 1,
+            self._hash,
+        )
+
+    def _with_nodes_added(self, current: RingSnapshot, new_nodes: List[str],
+                          new_weights: List[float]) -> RingSnapshot:
+        """Sorts the new nodes' virtual points once and merges them into the ring."""
+        points_per_node = [self.node_points(node, weight) for node, weight in zip(new_nodes, new_weights)]
+        new_points = np.concatenate(points_per_node)
+        new_owners = np.repeat(
+            np.arange(len(current.nodes), len(current.nodes) + len(new_nodes), dtype=np.uint32),
+            [len(p) for p in points_per_node],
+        )
+        order = np.argsort(new_points, kind='stable')
+        new_points, new_owners = new_points[order], new_owners[order]
+
+        # A point already on the ring, or claimed by an earlier node of this
+        # batch, keeps its current owner.
+        points = np.frombuffer(current.points, dtype=np.uint64)
+        owners = np.frombuffer(current.owners, dtype=np.uint32)
+        positions = np.searchsorted(points, new_points)
+        fresh = np.ones(len(new_points), dtype=bool)
+        fresh[1:] = new_points[1:] != new_points[:-1]
+        if len(points):
+            fresh &= points[np.minimum(positions, len(points) - 1)] != new_points
+
+        snapshot = self._next_snapshot(
+            current,
+            np.insert(points, positions[fresh], new_points[fresh]),
+            np.insert(owners, positions[fresh], new_owners[fresh]),
+            current.nodes + tuple(new_nodes),
+            current.weights + tuple(new_weights),
+        )
+        logger.debug("Ring size is now %d after adding %d node(s).", len(snapshot.points), len(new_nodes))
+        return snapshot
+
+    def _with_node_removed(self, current: RingSnapshot, node: str) -> RingSnapshot:
+        """Masks a node's virtual points out of the ring."""
+        node_idx = current.nodes.index(node)
+        points = np.frombuffer(current.points, dtype=np.uint64)
+        owners = np.frombuffer(current.owners, dtype=np.uint32)
+
+        keep = owners != node_idx
+        owners = owners[keep]
+        # Owner indexes above the removed slot shift down with the node list.
+        owners = owners - (owners > node_idx)
+
+        snapshot = self._next_snapshot(
+            current,
+            points[keep],
+            owners,
+            current.nodes[:node_idx] + current.nodes[node_idx + 1:],
+            current.weights[:node_idx] + current.weights[node_idx + 1:],
+        )
+        logger.debug("Ring size is now %d after removing '%s'.", len(snapshot.points), node)
+        return snapshot
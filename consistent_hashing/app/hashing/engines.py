@@ -0,0 +1,35 @@
+from typing import Dict, List, Optional, Type
+
+from app.hashing.base import HashingEngine
+from app.hashing.consistent_hashing import ConsistentHashing
+from app.hashing.jump_hashing import JumpHashing
+from app.hashing.maglev_hashing import MaglevHashing
+from app.hashing.rendezvous_hashing import RendezvousHashing
+
+ENGINES: Dict[str, Type[HashingEngine]] = {
+    "ring": ConsistentHashing,
+    "jump": JumpHashing,
+    "rendezvous": RendezvousHashing,
+    "maglev": MaglevHashing,
+}
+
+
+def create_engine(name: str, nodes: Optional[List[str]] = None, hash_function: str = "md5",
+                  replicas: int = 100, maglev_table_size: int = 65537,
+                  load_epsilon: Optional[float] = None) -> HashingEngine:
+    """
+    Builds the placement engine registered under ``name``. Raises
+    ``ValueError`` for an unknown engine, or for ``load_epsilon`` with an
+    engine other than the ring, which is the only one with bounded loads.
+    """
+    if load_epsilon is not None and name != "ring":
+        raise ValueError(f"Bounded loads (load_epsilon) are only supported by the ring engine, not '{name}'.")
+    if name == "ring":
+        return ConsistentHashing(
+            nodes=nodes, replicas=replicas, hash_function=hash_function, load_epsilon=load_epsilon
+        )
+    if name == "maglev":
+        return MaglevHashing(nodes=nodes, hash_function=hash_function, table_size=maglev_table_size)
+    if name in ENGINES:
+        return ENGINES[name](nodes=nodes, hash_function=hash_function)
+    raise ValueError(f"Unknown hashing engine '{name}'. Choose one of: {', '.join(ENGINES)}.")
@@ -0,0 +1,65 @@
+import hashlib
+import struct
+from typing import Callable, Dict
+
+MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+_MURMUR_M = 0xC6A4A7935BD1E995
+_MURMUR_R = 47
+_MURMUR_SEED = 0x9747B28C
+
+
+def md5_64(key: str) -> int:
+    """Truncated MD5: the first 8 bytes of the digest as a 64-bit ring point.
+        Kept for compatibility, it orders keys exactly like the full 128-bit MD5 ring
+    """
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def blake2b_64(key: str) -> int:
+    """BLAKE2b with an 8-byte digest, so no digest bytes are computed only to be thrown away."""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def murmur64(key: str) -> int:
+    """Pure-Python MurmurHash64A, a non-cryptographic 64-bit hash.
+        It consumes the key in 8-byte words, so it needs no third-party package
+    """
+    data = key.encode('utf-8')
+    length = len(data)
+    h = (_MURMUR_SEED ^ (length * _MURMUR_M)) & MASK_64
+
+    n_blocks = length // 8
+    for k in struct.unpack_from(f'<{n_blocks}Q', data):
+        k = (k * _MURMUR_M) & MASK_64
+        k ^= k >> _MURMUR_R
+        k = (k * _MURMUR_M) & MASK_64
+        h ^= k
+        h = (h * _MURMUR_M) & MASK_64
+
+    tail = data[n_blocks * 8:]
+    if tail:
+        h ^= int.from_bytes(tail, 'little')
+        h = (h * _MURMUR_M) & MASK_64
+
+    h ^= h >> _MURMUR_R
+    h = (h * _MURMUR_M) & MASK_64
+    h ^= h >> _MURMUR_R
+    return h
+
+
+HASH_FUNCTIONS: Dict[str, Callable[[str], int]] = {
+    "md5": md5_64,
+    "blake2b": blake2b_64,
+    "murmur64": murmur64,
+}
+
+
+def get_hash_function(name: str) -> Callable[[str], int]:
+    """Returns the 64-bit hash strategy registered under ``name``."""
+    try:
+        return HASH_FUNCTIONS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown hash function '{name}'. Choose one of: {', '.join(HASH_FUNCTIONS)}."
+        ) from None
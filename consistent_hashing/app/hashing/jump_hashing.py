@@ -0,0 +1,106 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.logger_config import setup_logger
+from app.core.config import settings
+from app.hashing.base import EngineSnapshot, HashingEngine
+from app.hashing.hash_functions import MASK_64
+
+logger = setup_logger(__name__, log_file=settings.LOG_FILE_HASHING)
+
+_JUMP_MULTIPLIER = 2862933555777941757
+
+
+def jump_hash(key: int, num_buckets: int) -> int:
+    """Google's jump consistent hash (Lamping & Veach): maps a 64-bit key to a bucket in O(log n)."""
+    b, j = -1, 0
+    while j < num_buckets:
+        b = j
+        key = (key * _JUMP_MULTIPLIER + 1) & MASK_64
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+
+def jump_hash_many(keys: np.ndarray, num_buckets: int) -> np.ndarray:
+    """Vectorized ``jump_hash`` over an array of 64-bit keys; gives identical buckets."""
+    keys = keys.astype(np.uint64, copy=True)
+    buckets = np.full(len(keys), -1, dtype=np.int64)
+    jumps = np.zeros(len(keys), dtype=np.int64)
+    active = np.arange(len(keys))
+    multiplier = np.uint64(_JUMP_MULTIPLIER)
+    while len(active):
+        buckets[active] = jumps[active]
+        # uint64 arithmetic wraps modulo 2**64, like the masked scalar version.
+        keys[active] = keys[active] * multiplier + np.uint64(1)
+        divisor = ((keys[active] >> np.uint64(33)) + np.uint64(1)).astype(np.float64)
+        jumps[active] = ((buckets[active] + 1) * (float(1 << 31) / divisor)).astype(np.int64)
+        active = active[jumps[active] < num_buckets]
+    return buckets
+
+
+class JumpSnapshot(EngineSnapshot):
+    """A node list indexed by jump hash bucket number."""
+    __slots__ = ('_hash',)
+
+    def __init__(self, nodes: Sequence[str], epoch: int, hash_fn: Callable[[str], int]):
+        super().__init__(nodes, [1.0] * len(nodes), epoch)
+        self._hash = hash_fn
+
+    def ownership(self) -> Dict[str, float]:
+        """Jump hash splits the key space evenly across its buckets."""
+        return {node: 1 / len(self.nodes) for node in self.nodes}
+
+    def get_node(self, key: str) -> Optional[str]:
+        if not self.nodes:
+            logger.error("No nodes are registered. Cannot find a node for the key.")
+            return None
+        return self.nodes[jump_hash(self._hash(key), len(self.nodes))]
+
+    def get_nodes(self, keys: Iterable[str]) -> List[Optional[str]]:
+        keys = list(keys)
+        if not self.nodes:
+            logger.error("No nodes are registered. Cannot find nodes for the batch.")
+            return [None] * len(keys)
+        _hash = self._hash
+        hashes = np.fromiter((_hash(key) for key in keys), dtype=np.uint64, count=len(keys))
+        nodes = self.nodes
+        return [nodes[i] for i in jump_hash_many(hashes, len(nodes)).tolist()]
+
+
+class JumpHashing(HashingEngine):
+    """
+    Jump consistent hashing: O(1) memory beyond the node list and O(log n) lookups.
+
+    Jump hash assigns keys to numbered buckets, so it only moves the minimum
+    number of keys when the last bucket is added or removed. Removing any other
+    node moves the last node into the freed bucket, which relocates that node's
+    keys as well (about twice the minimum). Buckets are all the same size, so
+    node weights other than 1 are rejected.
+    """
+
+    def __init__(self, nodes: Optional[List[str]] = None, hash_function: str = "md5"):
+        super().__init__(hash_function)
+        if nodes:
+            self.add_nodes(nodes)
+
+    def memory_bytes(self) -> int:
+        return 8 * len(self._snapshot.nodes)
+
+    def _check_weight(self, weight: float):
+        if weight != 1.0:
+            raise ValueError("The jump engine does not support node weights.")
+
+    def _empty_snapshot(self) -> JumpSnapshot:
+        return JumpSnapshot((), 0, self._hash)
+
+    def _with_nodes_added(self, current: JumpSnapshot, new_nodes: List[str],
+                          new_weights: List[float]) -> JumpSnapshot:
+        return JumpSnapshot(current.nodes + tuple(new_nodes), current.epoch + 1, self._hash)
+
+    def _with_node_removed(self, current: JumpSnapshot, node: str) -> JumpSnapshot:
+        nodes = list(current.nodes)
+        last = nodes.pop()
+        if last != node:
+            nodes[nodes.index(node)] = last
+        return JumpSnapshot(nodes, current.epoch + 1, self._hash)
@@ -0,0 +1,146 @@
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.logger_config import setup_logger
+from app.core.config import settings
+from app.hashing.base import EngineSnapshot, HashingEngine
+
+logger = setup_logger(__name__, log_file=settings.LOG_FILE_HASHING)
+
+
+def _is_prime(n: int) -> bool:
+    if n < 2:
+        return False
+    divisor = 2
+    while divisor * divisor <= n:
+        if n % divisor == 0:
+            return False
+        divisor += 1
+    return True
+
+
+class MaglevSnapshot(EngineSnapshot):
+    """A fixed-size Maglev lookup table of node indexes."""
+    __slots__ = ('table', '_hash')
+
+    def __init__(self, table: array, nodes: Sequence[str], weights: Sequence[float], epoch: int,
+                 hash_fn: Callable[[str], int]):
+        super().__init__(nodes, weights, epoch)
+        self.table = table
+        self._hash = hash_fn
+
+    def ownership(self) -> Dict[str, float]:
+        """Counts the lookup table slots claimed by each node."""
+        if not self.nodes:
+            return {}
+        slots = np.bincount(np.frombuffer(self.table, dtype=np.uint32), minlength=len(self.nodes))
+        return dict(zip(self.nodes, (slots / len(self.table)).tolist()))
+
+    def get_node(self, key: str) -> Optional[str]:
+        if not self.nodes:
+            logger.error("No nodes are registered. Cannot find a node for the key.")
+            return None
+        return self.nodes[self.table[self._hash(key) % len(self.table)]]
+
+    def get_nodes(self, keys: Iterable[str]) -> List[Optional[str]]:
+        keys = list(keys)
+        if not self.nodes:
+            logger.error("No nodes are registered. Cannot find nodes for the batch.")
+            return [None] * len(keys)
+        _hash = self._hash
+        hashes = np.fromiter((_hash(key) for key in keys), dtype=np.uint64, count=len(keys))
+        table = np.frombuffer(self.table, dtype=np.uint32)
+        owners = table[hashes % np.uint64(len(table))]
+        nodes = self.nodes
+        return [nodes[i] for i in owners.tolist()]
+
+
+class MaglevHashing(HashingEngine):
+    """
+    Maglev hashing (Eisenbud et al., NSDI '16).
+
+    Each node walks its own pseudo-random permutation of a prime-sized lookup
+    table and the nodes take turns claiming their next free slot, so every
+    node owns an almost equal share of the table. Lookups are a single modulo
+    and array index. The table is repopulated on every membership change,
+    which moves slightly more than the minimum number of keys.
+
+    Weighted nodes earn turns in proportion to their weight: each round a node
+    gains ``weight / max_weight`` credit and claims one slot per whole credit.
+
+    ``table_size`` must be a prime larger than the number of nodes; otherwise a
+    node's skip may share a factor with it and its permutation never reaches
+    a free slot. Raises ``ValueError`` if it is not.
+    """
+
+    def __init__(self, nodes: Optional[List[str]] = None, hash_function: str = "md5", table_size: int = 65537):
+        if not _is_prime(table_size):
+            raise ValueError(f"Maglev table size must be prime, got {table_size}.")
+        self.table_size = table_size
+        super().__init__(hash_function)
+        if nodes:
+            self.add_nodes(nodes)
+
+    def memory_bytes(self) -> int:
+        table = self._snapshot.table
+        return table.itemsize * len(table)
+
+    def _populate(self, nodes: Sequence[str], weights: Sequence[float]) -> array:
+        """Builds the lookup table by letting nodes claim slots in weighted round-robin order."""
+        size = self.table_size
+        table = array('I', [0]) * size
+        if not nodes:
+            return table
+
+        offsets = [self._hash(f"{node}:offset") % size for node in nodes]
+        skips = [self._hash(f"{node}:skip") % (size - 1) + 1 for node in nodes]
+        max_weight = max(weights)
+        turns = [weight / max_weight for weight in weights]
+        credits = [0.0] * len(nodes)
+        next_index = [0] * len(nodes)
+        claimed = bytearray(size)
+        filled = 0
+        while True:
+            for i in range(len(nodes)):
+                credits[i] += turns[i]
+                if credits[i] < 1.0:
+                    continue
+                credits[i] -= 1.0
+                offset, skip, j = offsets[i], skips[i], next_index[i]
+                slot = (offset + j * skip) % size
+                while claimed[slot]:
+                    j += 1
+                    slot = (offset + j * skip) % size
+                claimed[slot] = 1
+                table[slot] = i
+                next_index[i] = j + 1
+                filled += 1
+                if filled == size:
+                    return table
+
+    def _snapshot_for(self, nodes: Sequence[str], weights: Sequence[float], epoch: int) -> MaglevSnapshot:
+        return MaglevSnapshot(self._populate(nodes, weights), nodes, weights, epoch, self._hash)
+
+    def _empty_snapshot(self) -> MaglevSnapshot:
+        return self._snapshot_for((), (), 0)
+
+    def _with_nodes_added(self, current: MaglevSnapshot, new_nodes: List[str],
+                          new_weights: List[float]) -> MaglevSnapshot:
+        if len(current.nodes) + len(new_nodes) >= self.table_size:
+            raise ValueError(
+                f"Maglev table size {self.table_size} must be larger than the number of nodes "
+                f"({len(current.nodes) + len(new_nodes)})."
+            )
+        return self._snapshot_for(
+            current.nodes + tuple(new_nodes), current.weights + tuple(new_weights), current.epoch + 1
+        )
+
+    def _with_node_removed(self, current: MaglevSnapshot, node: str) -> MaglevSnapshot:
+        idx = current.nodes.index(node)
+        return self._snapshot_for(
+            current.nodes[:idx] + current.nodes[idx + 1:],
+            current.weights[:idx] + current.weights[idx + 1:],
+            current.epoch + 1,
+        )
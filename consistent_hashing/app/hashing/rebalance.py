@@ -0,0 +1,129 @@
+import bisect
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.hashing.consistent_hashing import RingSnapshot
+
+RING_SIZE = 2 ** 64
+
+
+class MovedRange(NamedTuple):
+    """A half-open range ``[start, end)`` of 64-bit hashes whose owner changed."""
+    start: int
+    end: int
+    from_node: Optional[str]
+    to_node: Optional[str]
+
+
+def _owner_at_or_after(snapshot: RingSnapshot, point: int) -> Optional[str]:
+    """Owner of the first ring point >= ``point``, wrapping around the ring."""
+    if not snapshot.points:
+        return None
+    idx = bisect.bisect_left(snapshot.points, point)
+    return snapshot.nodes[snapshot.owners[idx % len(snapshot.points)]]
+
+
+def _predecessor(snapshot: RingSnapshot, point: int) -> Optional[int]:
+    """The largest ring point < ``point``, wrapping around; None for an empty ring."""
+    if not snapshot.points:
+        return None
+    idx = bisect.bisect_left(snapshot.points, point)
+    return snapshot.points[idx - 1]  # idx == 0 wraps to the last point
+
+
+def _changed_points(old: RingSnapshot, new: RingSnapshot,
+                    node_points: Callable[[str, float], np.ndarray]) -> List[int]:
+    """Virtual points of every node that was added, removed or re-weighted."""
+    old_members = dict(zip(old.nodes, old.weights))
+    new_members = dict(zip(new.nodes, new.weights))
+    candidates = set()
+    for node in old_members.keys() | new_members.keys():
+        old_weight, new_weight = old_members.get(node), new_members.get(node)
+        if old_weight == new_weight:
+            continue
+        for weight in (old_weight, new_weight):
+            if weight is not None:
+                candidates.update(node_points(node, weight).tolist())
+    return sorted(candidates)
+
+
+def plan_rebalance(old: RingSnapshot, new: RingSnapshot,
+                   node_points: Callable[[str, float], np.ndarray]) -> List[MovedRange]:
+    """
+    Diffs two ring snapshots and returns the hash ranges whose owner changed.
+
+    A key hashing to ``h`` belongs to the first point strictly greater than
+    ``h``, so every point owns ``[predecessor, point)``. Only ranges ending at
+    a virtual point of a changed node can change hands, so the plan is built
+    from those points alone, with a few bisects each: the cost grows with the
+    number of changed virtual nodes, not the ring size. ``node_points(node,
+    weight)`` must return a node's virtual points, as the ring computes them.
+    Ranges are sorted, and adjacent ranges with the same owners are merged.
+    """
+    if not old.points and not new.points:
+        return []
+
+    ranges: List[MovedRange] = []
+    for point in _changed_points(old, new, node_points):
+        from_node = _owner_at_or_after(old, point)
+        to_node = _owner_at_or_after(new, point)
+        if from_node == to_node:
+            continue
+        # The range ends at the nearest point below ``point`` on either ring;
+        # no point of either ring falls strictly inside it.
+        predecessors = [p for p in (_predecessor(old, point), _predecessor(new, point)) if p is not None]
+        below = [p for p in predecessors if p < point]
+        if below:
+            ranges.append(MovedRange(max(below), point, from_node, to_node))
+        else:
+            # Nothing precedes the point without wrapping past 2**64.
+            start = max(predecessors)
+            if start > point:
+                ranges.append(MovedRange(start, RING_SIZE, from_node, to_node))
+                ranges.append(MovedRange(0, point, from_node, to_node))
+            else:
+                # The point is alone on both rings, so its range is the whole ring.
+                ranges.append(MovedRange(0, RING_SIZE, from_node, to_node))
+
+    ranges.sort()
+    merged: List[MovedRange] = []
+    for moved in ranges:
+        last = merged[-1] if merged else None
+        if last and last.end == moved.start and (last.from_node, last.to_node) == (moved.from_node, moved.to_node):
+            merged[-1] = last._replace(end=moved.end)
+        else:
+            merged.append(moved)
+    return merged
+
+
+def classify_keys(keys: Iterable[str], plan: List[MovedRange], hash_fn: Callable[[str], int],
+                  chunk_size: int = 10_000) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Streams ``keys`` against a rebalance plan and yields ``(key, from_node, to_node)``
+    for the keys that move; keys outside the plan are skipped. Keys are hashed
+    and matched against the sorted ranges a chunk at a time, so arbitrarily
+    large key iterators run in constant memory.
+    """
+    if not plan:
+        return
+    starts = np.array([moved.start for moved in plan], dtype=np.uint64)
+    ends = np.array([moved.end for moved in plan], dtype=object)
+
+    chunk: List[str] = []
+    for key in keys:
+        chunk.append(key)
+        if len(chunk) == chunk_size:
+            yield from _classify_chunk(chunk, plan, starts, ends, hash_fn)
+            chunk = []
+    if chunk:
+        yield from _classify_chunk(chunk, plan, starts, ends, hash_fn)
+
+
+def _classify_chunk(chunk, plan, starts, ends, hash_fn):
+    hashes = np.fromiter((hash_fn(key) for key in chunk), dtype=np.uint64, count=len(chunk))
+    candidates = np.searchsorted(starts, hashes, side='right') - 1
+    for key, h, idx in zip(chunk, hashes.tolist(), candidates.tolist()):
+        if idx >= 0 and h < ends[idx]:
+            moved = plan[idx]
+            yield key, moved.from_node, moved.to_node
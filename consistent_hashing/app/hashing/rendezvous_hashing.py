@@ -0,0 +1,103 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.logger_config import setup_logger
+from app.core.config import settings
+from app.hashing.base import EngineSnapshot, HashingEngine
+
+logger = setup_logger(__name__, log_file=settings.LOG_FILE_HASHING)
+
+# Rows scored per NumPy pass, which bounds the keys x nodes score matrix.
+_BATCH_ROWS = 4096
+
+
+def _fmix64(h: np.ndarray) -> np.ndarray:
+    """MurmurHash3's 64-bit finalizer; uint64 arithmetic wraps modulo 2**64."""
+    h = h ^ (h >> np.uint64(33))
+    h = h * np.uint64(0xFF51AFD7ED558CCD)
+    h = h ^ (h >> np.uint64(33))
+    h = h * np.uint64(0xC4CEB9FE1A85EC53)
+    return h ^ (h >> np.uint64(33))
+
+
+class RendezvousSnapshot(EngineSnapshot):
+    """Node seeds and weights for highest-random-weight placement."""
+    __slots__ = ('seeds', '_weights', '_hash')
+
+    def __init__(self, nodes: Sequence[str], weights: Sequence[float], epoch: int, hash_fn: Callable[[str], int]):
+        super().__init__(nodes, weights, epoch)
+        self.seeds = np.array([hash_fn(node) for node in self.nodes], dtype=np.uint64)
+        self._weights = np.array(self.weights, dtype=np.float64)
+        self._hash = hash_fn
+
+    def ownership(self) -> Dict[str, float]:
+        """With ``w / -ln(u)`` scoring each node wins exactly its weight's share of keys in expectation."""
+        total = sum(self.weights)
+        return {node: weight / total for node, weight in zip(self.nodes, self.weights)}
+
+    def _winners(self, hashes: np.ndarray) -> np.ndarray:
+        """Returns, for each key hash, the index of the node with the highest weighted score."""
+        mixed = _fmix64(hashes[:, None] ^ self.seeds[None, :])
+        # Map the top 53 bits to a uniform float in (0, 1); the weighted score
+        # w / -ln(u) makes each node win in proportion to its weight.
+        uniform = ((mixed >> np.uint64(11)).astype(np.float64) + 0.5) / float(1 << 53)
+        return np.argmax(self._weights / -np.log(uniform), axis=1)
+
+    def get_node(self, key: str) -> Optional[str]:
+        if not self.nodes:
+            logger.error("No nodes are registered. Cannot find a node for the key.")
+            return None
+        hashes = np.array([self._hash(key)], dtype=np.uint64)
+        return self.nodes[int(self._winners(hashes)[0])]
+
+    def get_nodes(self, keys: Iterable[str]) -> List[Optional[str]]:
+        keys = list(keys)
+        if not self.nodes:
+            logger.error("No nodes are registered. Cannot find nodes for the batch.")
+            return [None] * len(keys)
+        _hash = self._hash
+        hashes = np.fromiter((_hash(key) for key in keys), dtype=np.uint64, count=len(keys))
+        winners = np.concatenate(
+            [self._winners(hashes[i:i + _BATCH_ROWS]) for i in range(0, len(hashes), _BATCH_ROWS)]
+        ) if len(hashes) else np.empty(0, dtype=np.int64)
+        nodes = self.nodes
+        return [nodes[i] for i in winners.tolist()]
+
+
+class RendezvousHashing(HashingEngine):
+    """
+    Weighted rendezvous (highest random weight) hashing.
+
+    Every node scores every key and the highest score wins, so only the keys
+    owned by a departing node move and a new node only takes keys it wins.
+    Memory is one seed and one weight per node; lookups are O(n) in the number
+    of nodes but vectorized across nodes and across a batch of keys.
+    """
+
+    def __init__(self, nodes: Optional[List[str]] = None, hash_function: str = "md5"):
+        super().__init__(hash_function)
+        if nodes:
+            self.add_nodes(nodes)
+
+    def memory_bytes(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.seeds.nbytes + snapshot._weights.nbytes
+
+    def _empty_snapshot(self) -> RendezvousSnapshot:
+        return RendezvousSnapshot((), (), 0, self._hash)
+
+    def _with_nodes_added(self, current: RendezvousSnapshot, new_nodes: List[str],
+                          new_weights: List[float]) -> RendezvousSnapshot:
+        return RendezvousSnapshot(
+            current.nodes + tuple(new_nodes), current.weights + tuple(new_weights), current.epoch + 1, self._hash
+        )
+
+    def _with_node_removed(self, current: RendezvousSnapshot, node: str) -> RendezvousSnapshot:
+        idx = current.nodes.index(node)
+        return RendezvousSnapshot(
+            current.nodes[:idx] + current.nodes[idx + 1:],
+            current.weights[:idx] + current.weights[idx + 1:],
+            current.epoch + 1,
+            self._hash,
+        )
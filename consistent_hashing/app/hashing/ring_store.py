@@ -0,0 +1,106 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.logger_config import setup_logger
+from app.core.config import settings
+from app.hashing.consistent_hashing import RingSnapshot
+from app.hashing.hash_functions import get_hash_function
+
+logger = setup_logger(__name__, log_file=settings.LOG_FILE_HASHING)
+
+# File layout, all little-endian:
+#   header  magic, epoch, number of points, length of the node table
+#   node table (JSON): nodes, weights, zones, replicas, hash function
+#   points  uint64 x n, 8-byte aligned
+#   owners  uint32 x n, indexes into the node table
+MAGIC = b"CHRING01"
+HEADER = struct.Struct("<8sQQI4x")
+
+
+def _aligned(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def save_ring(snapshot: RingSnapshot, path: str, replicas: int, hash_function: str,
+              extra: Optional[Dict[str, Any]] = None):
+    """
+    Writes a ring snapshot to ``path`` in the binary snapshot format.
+
+    The file is written next to the target and renamed over it, so readers
+    (including other processes that have the old file mapped) never see a
+    partially written ring. ``extra`` entries are stored in the node table and
+    come back in the metadata returned by ``load_ring``.
+    """
+    table = json.dumps({
+        "nodes": list(snapshot.nodes),
+        "weights": list(snapshot.weights),
+        "zones": list(snapshot.zones),
+        "replicas": replicas,
+        "hash_function": hash_function,
+        **(extra or {}),
+    }).encode("utf-8")
+    points = np.frombuffer(snapshot.points, dtype=np.uint64).astype("<u8", copy=False)
+    owners = np.frombuffer(snapshot.owners, dtype=np.uint32).astype("<u4", copy=False)
+
+    points_offset = _aligned(HEADER.size + len(table))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, snapshot.epoch, len(points), len(table)))
+        f.write(table)
+        f.write(b"\0" * (points_offset - HEADER.size - len(table)))
+        f.write(points.tobytes())
+        f.write(owners.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    logger.info(f"Saved ring snapshot at epoch {snapshot.epoch} ({len(points)} points) to '{path}'.")
+
+
+def load_ring(path: str) -> Tuple[RingSnapshot, Dict[str, Any]]:
+    """
+    Memory-maps a ring snapshot written by ``save_ring``.
+
+    The point and owner buffers are zero-copy views of the mapping, so loading
+    does no per-point work and processes that map the same file share its
+    pages. Returns the snapshot and the node table metadata. Raises
+    ``ValueError`` if the file is not a valid ring snapshot.
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapping) < HEADER.size:
+        raise ValueError(f"'{path}' is too small to be a ring snapshot.")
+    magic, epoch, num_points, table_len = HEADER.unpack_from(mapping, 0)
+    if magic != MAGIC:
+        raise ValueError(f"'{path}' is not a ring snapshot (bad magic {magic!r}).")
+
+    meta = json.loads(mapping[HEADER.size:HEADER.size + table_len])
+    points_offset = _aligned(HEADER.size + table_len)
+    owners_offset = points_offset + 8 * num_points
+    if len(mapping) < owners_offset + 4 * num_points:
+        raise ValueError(f"'{path}' is truncated.")
+
+    view = memoryview(mapping)
+    points = view[points_offset:owners_offset].cast("Q")
+    owners = view[owners_offset:owners_offset + 4 * num_points].cast("I")
+    if sys.byteorder != "little":
+        points, owners = array("Q", points), array("I", owners)
+        points.byteswap()
+        owners.byteswap()
+
+    if num_points and int(np.frombuffer(owners, dtype=np.uint32).max()) >= len(meta["nodes"]):
+        raise ValueError(f"'{path}' has owner indexes outside its node table.")
+
+    snapshot = RingSnapshot(
+        points, owners, meta["nodes"], meta["weights"], epoch, get_hash_function(meta["hash_function"]),
+        zones=meta["zones"],
+    )
+    logger.info(f"Loaded ring snapshot at epoch {epoch} ({num_points} points) from '{path}'.")
+    return snapshot, meta
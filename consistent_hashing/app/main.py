@@ -12,7 +12,9 @@ logger = setup_logger('main_app', log_file=settings.LOG_FILE_API)
 async def lifespan(app: FastAPI):
     logger.info("Service is starting up.")
     logger.info(f"Initial nodes: {hashing_service.get_all_nodes()}")
+    hashing_service.start_topology_sync()
     yield
+    hashing_service.stop_topology_sync()
     logger.info("Service is shutting down.")
 
 app = FastAPI(
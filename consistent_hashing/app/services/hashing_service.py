@@ -1,29 +1,242 @@
-from typing import List
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from app.hashing.base import EngineSnapshot, HashingEngine
+from app.hashing.bounded_load import LoadTracker
 from app.hashing.consistent_hashing import ConsistentHashing
+from app.hashing.engines import create_engine
+from app.hashing.rebalance import MovedRange, plan_rebalance
+from app.hashing.ring_store import load_ring, save_ring
+from app.services.lookup_cache import LookupCache
+from app.services.topology_sync import ADD, REMOVE, TopologyLog, TopologySync
+from app.core.logger_config import setup_logger
 from app.core.config import settings
 
+logger = setup_logger(__name__, log_file=settings.LOG_FILE_HASHING)
+
 class HashingService:
     """
     A service to manage the consistent hashing ring as a singleton.
+    The placement engine (ring, jump, rendezvous or maglev) is chosen by
+    ``settings.HASHING_ENGINE``; all of them expose the same interface.
+    Reads go through the ring's current immutable snapshot, so they need no
+    locking even while another thread is adding or removing a node.
+    With ``settings.LOOKUP_CACHE_SIZE`` > 0, single-key lookups are served from
+    an LRU cache whose entries are invalidated by the ring epoch.
+    With ``settings.RING_SNAPSHOT_PATH`` set (ring engine only), the ring is
+    memory-mapped from that file at startup and rewritten on every topology
+    change, so restarts and sibling worker processes skip rebuilding it.
+    With ``settings.TOPOLOGY_LOG_PATH`` set, node additions and removals go
+    through a SQLite change log shared by all worker processes; each worker
+    replays new entries incrementally, so every worker routes with the same
+    ring and the same epoch.
+    With ``settings.BOUNDED_LOAD_EPSILON`` set (ring engine only), keys can also
+    be placed with bounded loads through ``place``: each placed key counts as a
+    unit of load on its node and stays there until ``release``, and no node
+    takes more than ``(1 + epsilon)`` times its share of the placed keys.
+    Lookups are unaffected. Placements and loads are per worker process.
     """
     _instance = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(HashingService, cls).__new__(cls)
-            cls._instance.hash_ring = ConsistentHashing(nodes=settings.INITIAL_NODES)
+            cls._instance.snapshot_path = (
+                settings.RING_SNAPSHOT_PATH if settings.HASHING_ENGINE == "ring" else None
+            )
+            cls._instance._persist_lock = threading.Lock()
+            cls._instance._persisted_epoch = -1
+            cls._instance.last_change = None
+            hash_ring, log_version = cls._instance._create_hash_ring()
+            cls._instance.hash_ring = hash_ring
+            cls._instance.topology_sync = None
+            if settings.TOPOLOGY_LOG_PATH:
+                cls._instance.topology_sync = TopologySync(
+                    TopologyLog(settings.TOPOLOGY_LOG_PATH), hash_ring, log_version,
+                    on_change=cls._instance._on_topology_change
+                )
+                cls._instance.topology_sync.pull()
+            cls._instance.load_tracker = LoadTracker() if settings.BOUNDED_LOAD_EPSILON is not None else None
+            cls._instance._load_lock = threading.Lock()
+            cls._instance._placements = {}
+            cls._instance.lookup_cache = (
+                LookupCache(settings.LOOKUP_CACHE_SIZE) if settings.LOOKUP_CACHE_SIZE > 0 else None
+            )
         return cls._instance
 
+    def _create_hash_ring(self) -> Tuple[HashingEngine, int]:
+        """
+        Builds the engine, restoring the ring from a compatible saved snapshot
+        when there is one. Returns it with the topology log version it reflects.
+        """
+        options = dict(
+            hash_function=settings.HASH_FUNCTION,
+            replicas=settings.REPLICAS,
+            maglev_table_size=settings.MAGLEV_TABLE_SIZE,
+            load_epsilon=settings.BOUNDED_LOAD_EPSILON
+        )
+        path = self.snapshot_path
+        if path and os.path.exists(path):
+            try:
+                snapshot, meta = load_ring(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable ring snapshot '{path}': {e}")
+            else:
+                if meta["replicas"] == settings.REPLICAS and meta["hash_function"] == settings.HASH_FUNCTION:
+                    hash_ring = create_engine("ring", **options)
+                    hash_ring.load_snapshot(snapshot)
+                    self._persisted_epoch = snapshot.epoch
+                    return hash_ring, meta.get("log_version", 0)
+                logger.warning(f"Ring snapshot '{path}' was built with other replicas/hash settings; rebuilding.")
+
+        hash_ring = create_engine(settings.HASHING_ENGINE, nodes=settings.INITIAL_NODES, **options)
+        self._persist(hash_ring.snapshot(), 0)
+        return hash_ring, 0
+
+    def _persist(self, snapshot: EngineSnapshot, log_version: int):
+        """Writes the ring snapshot to ``snapshot_path`` unless a newer one is already there."""
+        if not self.snapshot_path:
+            return
+        with self._persist_lock:
+            if snapshot.epoch <= self._persisted_epoch:
+                return
+            try:
+                save_ring(snapshot, self.snapshot_path, settings.REPLICAS, settings.HASH_FUNCTION,
+                          extra={"log_version": log_version})
+            except OSError as e:
+                logger.error(f"Could not save the ring snapshot to '{self.snapshot_path}': {e}")
+                return
+            self._persisted_epoch = snapshot.epoch
+
+    def snapshot(self) -> EngineSnapshot:
+        return self.hash_ring.snapshot()
+
+    def get_epoch(self) -> int:
+        return self.hash_ring.epoch
+
+    def route(self, key: str) -> Tuple[Optional[str], int]:
+        """Returns the node for ``key`` together with the epoch it was resolved under."""
+        snapshot = self.hash_ring.snapshot()
+        cache = self.lookup_cache
+        if cache is None:
+            return snapshot.get_node(key), snapshot.epoch
+
+        node = cache.get(key, snapshot.epoch)
+        if node is None:
+            node = snapshot.get_node(key)
+            if node is not None:
+                cache.put(key, snapshot.epoch, node)
+        return node, snapshot.epoch
+
+    def place(self, key: str) -> Tuple[Optional[str], int]:
+        """
+        Places ``key`` on a node with room under the load bound and records one
+        unit of load there, or returns the node it is already placed on.
+        Returns the node with the epoch it was resolved under.
+        """
+        snapshot = self.hash_ring.snapshot()
+        if not snapshot.nodes:
+            return None, snapshot.epoch
+        with self._load_lock:
+            node = self._placements.get(key)
+            if node is None:
+                node = snapshot.get_node_bounded(key, self.load_tracker, settings.BOUNDED_LOAD_EPSILON)
+                self._placements[key] = node
+                self.load_tracker.add(node)
+        return node, snapshot.epoch
+
+    def release(self, key: str) -> Optional[str]:
+        """Releases the placement of ``key`` and its unit of load; returns its node, or None if it had none."""
+        with self._load_lock:
+            node = self._placements.pop(key, None)
+            if node is not None:
+                self.load_tracker.remove(node)
+        return node
+
+    def bounded_load_enabled(self) -> bool:
+        return self.load_tracker is not None
+
     def get_node(self, key: str) -> str:
-        return self.hash_ring.get_node(key)
+        return self.route(key)[0]
 
-    def add_node(self, node: str):
-        self.hash_ring.add_node(node)
+    def get_nodes(self, keys: List[str]) -> List[str]:
+        return self.hash_ring.get_nodes(keys)
 
-    def remove_node(self, node: str):
+    def get_replicas(self, keys: List[str], n: int, distinct_zones: bool = False) -> List[List[str]]:
+        return self.hash_ring.get_replica_sets(keys, n, distinct_zones)
+
+    def add_node(self, node: str, weight: float = 1.0, zone: Optional[str] = None) -> bool:
+        """Adds a node; returns False if it was already in the ring."""
+        if self.topology_sync is not None:
+            return self.topology_sync.submit(ADD, node, weight, zone)
+        before = self.hash_ring.snapshot()
+        self.hash_ring.add_node(node, weight, zone)
+        return self._record_change(before)
+
+    def remove_node(self, node: str) -> bool:
+        """Removes a node; returns False if it was not in the ring."""
+        if self.topology_sync is not None:
+            return self.topology_sync.submit(REMOVE, node)
+        before = self.hash_ring.snapshot()
         self.hash_ring.remove_node(node)
+        return self._record_change(before)
+
+    def _record_change(self, before: EngineSnapshot) -> bool:
+        after = self.hash_ring.snapshot()
+        if after.epoch == before.epoch:
+            return False
+        self._on_topology_change(before, after, True)
+        return True
+
+    def _on_topology_change(self, before: EngineSnapshot, after: EngineSnapshot, local: bool):
+        """
+        Keeps the snapshots on both sides of the latest topology change for
+        rebalance planning. Only the process that made a change saves the ring
+        snapshot, so N workers do not rewrite the same file N times.
+        """
+        self.last_change = (before, after)
+        if self.load_tracker is not None:
+            removed = set(before.nodes) - set(after.nodes)
+            with self._load_lock:
+                for node in removed:
+                    self.load_tracker.reset(node)
+                # Keys placed on a removed node are placed afresh on their next ``place``.
+                self._placements = {key: node for key, node in self._placements.items() if node not in removed}
+        if local:
+            if self.topology_sync is not None:
+                after, log_version = self.topology_sync.state()
+            else:
+                log_version = 0
+            self._persist(after, log_version)
+
+    def start_topology_sync(self):
+        if self.topology_sync is not None:
+            self.topology_sync.start(settings.TOPOLOGY_SYNC_INTERVAL)
+
+    def stop_topology_sync(self):
+        if self.topology_sync is not None:
+            self.topology_sync.stop()
+
+    def uses_ring_engine(self) -> bool:
+        """Replica sets and rebalance plans are only available on the virtual-node ring."""
+        return isinstance(self.hash_ring, ConsistentHashing)
+
+    def get_last_rebalance_plan(self) -> Optional[Tuple[EngineSnapshot, EngineSnapshot, List[MovedRange]]]:
+        """Returns the hash ranges that changed owner in the latest topology change, if any."""
+        if self.last_change is None:
+            return None
+        before, after = self.last_change
+        return before, after, plan_rebalance(before, after, self.hash_ring.node_points)
 
     def get_all_nodes(self) -> List[str]:
         return self.hash_ring.nodes
 
+    def get_ownership(self) -> Dict[str, float]:
+        return self.hash_ring.ownership()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        if self.lookup_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.lookup_cache.stats()}
+
 hashing_service = HashingService()
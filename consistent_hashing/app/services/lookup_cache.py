@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class LookupCache:
+    """
+    A bounded LRU cache of key -> node lookups.
+
+    Every entry is tagged with the ring epoch it was resolved against. A lookup
+    under a newer epoch treats the entry as a miss, so a topology change
+    invalidates the whole cache in O(1) without touching any entry; stale
+    entries are overwritten or age out through normal LRU eviction.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, epoch: int) -> Optional[str]:
+        """Returns the cached node for ``key`` if it was resolved under ``epoch``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != epoch:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, epoch: int, node: str):
+        with self._lock:
+            self._entries[key] = (epoch, node)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "capacity": self.capacity,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,188 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.core.logger_config import setup_logger
+from app.core.config import settings
+from app.hashing.base import EngineSnapshot, HashingEngine
+
+logger = setup_logger(__name__, log_file=settings.LOG_FILE_HASHING)
+
+ADD, REMOVE = "add", "remove"
+
+
+class TopologyChange(NamedTuple):
+    """One entry of the topology log. ``version`` is its position in the log."""
+    version: int
+    op: str
+    node: str
+    weight: float
+    zone: Optional[str]
+
+
+class TopologyLog:
+    """
+    An append-only, versioned log of node additions and removals in SQLite.
+
+    Every worker process opens the same database file. Appends happen inside
+    an ``IMMEDIATE`` transaction, which holds the database write lock, so the
+    log has one total order that all processes agree on. The database runs in
+    WAL mode, so readers polling for new entries never block a writer.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS topology_changes ("
+                " version INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " op TEXT NOT NULL CHECK (op IN ('add', 'remove')),"
+                " node TEXT NOT NULL,"
+                " weight REAL NOT NULL DEFAULT 1.0,"
+                " zone TEXT)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """SQLite connections cannot be shared between threads, so each thread gets its own."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Holds the database write lock for the block; commits on success, rolls back on error."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def append(self, conn: sqlite3.Connection, op: str, node: str, weight: float = 1.0,
+               zone: Optional[str] = None) -> int:
+        """Appends a change inside an open ``transaction`` and returns its version."""
+        cursor = conn.execute(
+            "INSERT INTO topology_changes (op, node, weight, zone) VALUES (?, ?, ?, ?)",
+            (op, node, weight, zone),
+        )
+        return cursor.lastrowid
+
+    def changes_since(self, version: int, conn: Optional[sqlite3.Connection] = None) -> List[TopologyChange]:
+        """Returns the changes after ``version``, oldest first."""
+        rows = (conn or self._connection()).execute(
+            "SELECT version, op, node, weight, zone FROM topology_changes WHERE version > ? ORDER BY version",
+            (version,),
+        ).fetchall()
+        return [TopologyChange(*row) for row in rows]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# Called with the snapshots before and after a batch of applied changes, and
+# whether the change was made by this process.
+ChangeListener = Callable[[EngineSnapshot, EngineSnapshot, bool], None]
+
+
+class TopologySync:
+    """
+    Keeps one process's placement engine in step with a shared ``TopologyLog``.
+
+    ``version`` is the last log entry applied to the engine. ``pull`` replays
+    newer entries as incremental ``add_node``/``remove_node`` calls, and
+    ``submit`` first catches up, then appends and applies a local change while
+    holding the log's write lock. Every process therefore applies the same
+    changes in the same order, ending up with identical snapshots and epochs.
+    A background thread started with ``start`` pulls every ``interval`` seconds.
+    """
+
+    def __init__(self, log: TopologyLog, engine: HashingEngine, version: int = 0,
+                 on_change: Optional[ChangeListener] = None):
+        self.log = log
+        self.engine = engine
+        self.version = version
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _apply(self, change: TopologyChange):
+        if change.op == ADD:
+            self.engine.add_node(change.node, change.weight, change.zone)
+        else:
+            self.engine.remove_node(change.node)
+        self.version = change.version
+
+    def _catch_up(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        changes = self.log.changes_since(self.version, conn)
+        if not changes:
+            return 0
+        before = self.engine.snapshot()
+        for change in changes:
+            self._apply(change)
+        logger.info(f"Applied {len(changes)} topology change(s) from the log, now at version {self.version}.")
+        if self.on_change is not None:
+            self.on_change(before, self.engine.snapshot(), False)
+        return len(changes)
+
+    def pull(self) -> int:
+        """Applies the log entries this process has not seen yet; returns how many there were."""
+        with self._lock:
+            return self._catch_up()
+
+    def submit(self, op: str, node: str, weight: float = 1.0, zone: Optional[str] = None) -> bool:
+        """
+        Records a local topology change in the log and applies it. Returns False,
+        without logging anything, if it would not change the topology (adding a
+        node that exists or removing one that does not). Engine errors such as
+        ``ValueError`` for an invalid weight roll the log entry back.
+        """
+        with self._lock, self.log.transaction() as conn:
+            self._catch_up(conn)
+            before = self.engine.snapshot()
+            if (op == ADD) == (node in before.nodes):
+                return False
+            version = self.log.append(conn, op, node, weight, zone)
+            self._apply(TopologyChange(version, op, node, weight, zone))
+        if self.on_change is not None:
+            self.on_change(before, self.engine.snapshot(), True)
+        return True
+
+    def state(self) -> Tuple[EngineSnapshot, int]:
+        """Returns the current snapshot together with the log version it reflects."""
+        with self._lock:
+            return self.engine.snapshot(), self.version
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.pull()
+            except sqlite3.Error as e:
+                logger.error(f"Topology sync failed, retrying in {interval}s: {e}")
+
+    def start(self, interval: float):
+        """Starts pulling new log entries every ``interval`` seconds in a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="topology-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,43 @@
+"""
+Micro-benchmark comparing scalar ``get_node`` lookups against the vectorized
+``get_nodes`` batch path.
+
+Run from the ``consistent_hashing`` directory:
+
+    python -m benchmarks.bench_batch_lookup --nodes 50 --keys 100000
+"""
+import argparse
+import logging
+import time
+
+from app.hashing.consistent_hashing import ConsistentHashing
+
+
+def run(num_nodes: int, num_keys: int, replicas: int):
+    ch = ConsistentHashing(nodes=[f"node-{i}" for i in range(num_nodes)], replicas=replicas)
+    keys = [f"user:{i}" for i in range(num_keys)]
+
+    start = time.perf_counter()
+    scalar = [ch.get_node(key) for key in keys]
+    scalar_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = ch.get_nodes(keys)
+    batch_elapsed = time.perf_counter() - start
+
+    assert scalar == batch, "Batch lookups disagree with the scalar path."
+
+    print(f"nodes={num_nodes} replicas={replicas} keys={num_keys}")
+    print(f"  scalar get_node : {scalar_elapsed:.3f}s ({num_keys / scalar_elapsed:,.0f} lookups/sec)")
+    print(f"  batch get_nodes : {batch_elapsed:.3f}s ({num_keys / batch_elapsed:,.0f} lookups/sec)")
+    print(f"  speedup         : {scalar_elapsed / batch_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--replicas", type=int, default=100)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.nodes, args.keys, args.replicas)
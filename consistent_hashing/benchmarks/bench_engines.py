@@ -0,0 +1,68 @@
+"""
+Comparison of the placement engines: ring, jump, rendezvous and maglev.
+
+For each engine it reports scalar and batch lookup throughput, the size of the
+placement tables, load skew (max / mean keys per node) and the fraction of
+keys that move when a node is added or removed, next to the ideal fraction.
+Run from the ``consistent_hashing`` directory:
+
+    python -m benchmarks.bench_engines --nodes 50 --keys 100000
+"""
+import argparse
+import logging
+import time
+from collections import Counter
+
+from app.hashing.engines import ENGINES, create_engine
+
+
+def _moved(before, after) -> float:
+    return sum(old != new for old, new in zip(before, after)) / len(before)
+
+
+def run(num_nodes: int, num_keys: int, replicas: int):
+    nodes = [f"node-{i}" for i in range(num_nodes)]
+    keys = [f"user:{i}" for i in range(num_keys)]
+    scalar_keys = keys[:20_000]
+
+    print(f"nodes={num_nodes} keys={num_keys} ring replicas={replicas}")
+    print(f"  ideal moved on add={1 / (num_nodes + 1):.3%} on remove={1 / num_nodes:.3%}")
+    print(
+        f"  {'engine':<11} {'scalar/sec':>11} {'batch/sec':>11} {'memory':>10} "
+        f"{'max/mean':>9} {'moved+':>8} {'moved-':>8}"
+    )
+    for name in ENGINES:
+        engine = create_engine(name, nodes=nodes, replicas=replicas)
+
+        start = time.perf_counter()
+        for key in scalar_keys:
+            engine.get_node(key)
+        scalar_rate = len(scalar_keys) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        placements = engine.get_nodes(keys)
+        batch_rate = num_keys / (time.perf_counter() - start)
+
+        counts = Counter(placements)
+        skew = max(counts.values()) / (num_keys / num_nodes)
+
+        engine.add_node("node-extra")
+        moved_on_add = _moved(placements, engine.get_nodes(keys))
+        engine.remove_node("node-extra")
+        engine.remove_node(nodes[num_nodes // 2])
+        moved_on_remove = _moved(placements, engine.get_nodes(keys))
+
+        print(
+            f"  {name:<11} {scalar_rate:>11,.0f} {batch_rate:>11,.0f} {engine.memory_bytes() / 1024:>8.1f}KB "
+            f"{skew:>9.3f} {moved_on_add:>8.3%} {moved_on_remove:>8.3%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--replicas", type=int, default=100)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.nodes, args.keys, args.replicas)
@@ -0,0 +1,47 @@
+"""
+Benchmark of the ring's pluggable hash strategies.
+
+For each strategy it reports scalar lookups/sec and how evenly a key set is
+spread across the nodes (variance and coefficient of variation of the per-node
+key counts). Run from the ``consistent_hashing`` directory:
+
+    python -m benchmarks.bench_hash_functions --nodes 10 --keys 100000
+"""
+import argparse
+import logging
+import statistics
+import time
+from collections import Counter
+
+from app.hashing.consistent_hashing import ConsistentHashing
+from app.hashing.hash_functions import HASH_FUNCTIONS
+
+
+def run(num_nodes: int, num_keys: int, replicas: int):
+    nodes = [f"node-{i}" for i in range(num_nodes)]
+    keys = [f"user:{i}" for i in range(num_keys)]
+
+    print(f"nodes={num_nodes} replicas={replicas} keys={num_keys}")
+    print(f"  {'strategy':<10} {'lookups/sec':>12} {'variance':>12} {'cv':>8}")
+    for name in HASH_FUNCTIONS:
+        ch = ConsistentHashing(nodes=nodes, replicas=replicas, hash_function=name)
+
+        start = time.perf_counter()
+        placements = [ch.get_node(key) for key in keys]
+        elapsed = time.perf_counter() - start
+
+        per_node = Counter(placements)
+        counts = [per_node[node] for node in nodes]
+        variance = statistics.pvariance(counts)
+        cv = statistics.pstdev(counts) / statistics.mean(counts)
+        print(f"  {name:<10} {num_keys / elapsed:>12,.0f} {variance:>12,.1f} {cv:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--replicas", type=int, default=100)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.nodes, args.keys, args.replicas)
@@ -0,0 +1,77 @@
+"""
+Logging overhead benchmark for the request hot path.
+
+Times how long the calling thread spends per log call with the inline
+console/file handlers versus the queue handler (formatting and I/O on a
+listener thread), for f-string and lazy ``%`` messages, for DEBUG calls that
+are filtered out, and for per-request lines sampled at ``--sample-rate``.
+Console output goes to /dev/null. Run from the ``consistent_hashing`` directory:
+
+    python -m benchmarks.bench_logging --calls 100000
+"""
+import argparse
+import contextlib
+import logging
+import os
+import tempfile
+import time
+
+from app.core.logger_config import setup_logger, should_sample
+
+
+def _per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls
+
+
+def _drain(logger: logging.Logger) -> float:
+    """Waits until a queue-backed logger's listener has written everything; returns the wait."""
+    start = time.perf_counter()
+    for handler in logger.handlers:
+        log_queue = getattr(handler, "queue", None)
+        while log_queue is not None and not log_queue.empty():
+            time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def run(calls: int, sample_rate: float):
+    key, node = "user:12345", "cache-node-2"
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull):
+        inline = setup_logger("bench.inline", log_file=os.path.join(tmp, "inline.log"), use_queue=False)
+        queued = setup_logger("bench.queued", log_file=os.path.join(tmp, "queued.log"), use_queue=True)
+
+        cases = [
+            ("inline, f-string", inline,
+             lambda i: inline.info(f"Request for key '{key}-{i}' was successfully routed to node '{node}'.")),
+            ("inline, lazy %", inline,
+             lambda i: inline.info("Request for key '%s-%d' was successfully routed to node '%s'.", key, i, node)),
+            ("queue, lazy %", queued,
+             lambda i: queued.info("Request for key '%s-%d' was successfully routed to node '%s'.", key, i, node)),
+            (f"queue, lazy %, sampled {sample_rate:g}", queued,
+             lambda i: should_sample(sample_rate) and queued.info(
+                 "Request for key '%s-%d' was successfully routed to node '%s'.", key, i, node)),
+            ("DEBUG off, f-string", inline,
+             lambda i: inline.debug(f"Key '{key}-{i}' (hash: {i}) is mapped to node '{node}'.")),
+            ("DEBUG off, lazy %", inline,
+             lambda i: inline.debug("Key '%s-%d' (hash: %d) is mapped to node '%s'.", key, i, i, node)),
+        ]
+        results = []
+        for label, logger, fn in cases:
+            per_call = _per_call(fn, calls)
+            results.append((label, per_call, _drain(logger)))
+
+    print(f"calls={calls:,}")
+    print(f"  {'case':<32} {'caller/call':>12} {'calls/s':>12} {'drain':>9}")
+    for label, per_call, drain in results:
+        print(f"  {label:<32} {per_call * 1e6:>10.2f}us {1 / per_call:>12,.0f} {drain * 1e3:>7.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    run(args.calls, args.sample_rate)
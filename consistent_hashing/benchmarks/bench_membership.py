@@ -0,0 +1,49 @@
+"""
+Scaling benchmark for ring membership changes.
+
+For each cluster size it builds a ring, then times adding one extra node and
+removing it again. Run from the
+``consistent_hashing`` directory:
+
+    python -m benchmarks.bench_membership --replicas 200 --sizes 50 100 250 500 1000
+"""
+import argparse
+import logging
+import time
+
+from app.hashing.consistent_hashing import ConsistentHashing
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(sizes, replicas: int, repeat: int):
+    print(f"replicas={replicas} (best of {repeat})")
+    print(f"  {'nodes':>6} {'ring points':>12} {'build':>10} {'add_node':>10} {'remove_node':>12}")
+    for size in sizes:
+        nodes = [f"node-{i}" for i in range(size)]
+        build = _timed(lambda: ConsistentHashing(nodes=nodes, replicas=replicas))
+        ch = ConsistentHashing(nodes=nodes, replicas=replicas)
+
+        add, remove = float("inf"), float("inf")
+        for _ in range(repeat):
+            add = min(add, _timed(lambda: ch.add_node("node-extra")))
+            remove = min(remove, _timed(lambda: ch.remove_node("node-extra")))
+
+        print(
+            f"  {size:>6} {len(ch.sorted_keys):>12,} {build * 1e3:>8.1f}ms "
+            f"{add * 1e3:>8.2f}ms {remove * 1e3:>10.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 250, 500, 1000])
+    parser.add_argument("--replicas", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.sizes, args.replicas, args.repeat)
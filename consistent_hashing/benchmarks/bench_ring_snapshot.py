@@ -0,0 +1,51 @@
+"""
+Cold-start benchmark: rebuilding the ring vs memory-mapping a saved snapshot.
+
+For each replica count it times building the ring from scratch (hashing every
+virtual node) against loading the same ring with ``load_ring``, and reports
+the snapshot size on disk. Run from the ``consistent_hashing`` directory:
+
+    python -m benchmarks.bench_ring_snapshot --nodes 500 --replicas 100 500 1000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from app.hashing.consistent_hashing import ConsistentHashing
+from app.hashing.ring_store import load_ring, save_ring
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(node_count: int, replica_counts, repeat: int):
+    nodes = [f"node-{i}" for i in range(node_count)]
+    print(f"nodes={node_count} (best of {repeat})")
+    print(f"  {'replicas':>8} {'ring points':>12} {'file':>9} {'build':>10} {'load':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ring.bin")
+        for replicas in replica_counts:
+            ch = ConsistentHashing(nodes=nodes, replicas=replicas)
+            save_ring(ch.snapshot(), path, replicas, ch.hash_function)
+
+            build = min(_timed(lambda: ConsistentHashing(nodes=nodes, replicas=replicas)) for _ in range(repeat))
+            load = min(_timed(lambda: load_ring(path)) for _ in range(repeat))
+            print(
+                f"  {replicas:>8} {len(ch.sorted_keys):>12,} {os.path.getsize(path) / 2**20:>7.1f}MB "
+                f"{build * 1e3:>8.1f}ms {load * 1e3:>8.2f}ms {build / load:>7.0f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=500)
+    parser.add_argument("--replicas", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.nodes, args.replicas, args.repeat)
@@ -0,0 +1,58 @@
+"""
+Load test comparing per-key routing (GET /api/get-node/{key}) with batch
+routing (POST /api/get-nodes).
+
+By default the app runs in-process through FastAPI's TestClient; pass --url to
+hit a running server instead. Run from the ``consistent_hashing`` directory:
+
+    python -m benchmarks.load_test_batch_api --keys 5000 --batch-size 1000
+    python -m benchmarks.load_test_batch_api --url http://localhost:8000
+"""
+import argparse
+import logging
+import time
+
+import httpx
+
+
+def _client(url: str):
+    if url:
+        return httpx.Client(base_url=url, timeout=30)
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
+
+
+def run(url: str, num_keys: int, batch_size: int):
+    keys = [f"user:{i}" for i in range(num_keys)]
+    with _client(url) as client:
+        start = time.perf_counter()
+        per_key = {key: client.get(f"/api/get-node/{key}").json() for key in keys}
+        per_key_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = {}
+        for i in range(0, num_keys, batch_size):
+            response = client.post("/api/get-nodes", json=keys[i:i + batch_size])
+            batched.update(response.json()["nodes"])
+        batch_elapsed = time.perf_counter() - start
+
+    assert per_key == batched, "Batch routing disagrees with per-key routing."
+
+    requests = -(-num_keys // batch_size)
+    print(f"target={url or 'in-process'} keys={num_keys} batch_size={batch_size}")
+    print(f"  per-key GET : {num_keys} requests, {per_key_elapsed:.2f}s ({num_keys / per_key_elapsed:,.0f} keys/sec)")
+    print(f"  batch POST  : {requests} requests, {batch_elapsed:.2f}s ({num_keys / batch_elapsed:,.0f} keys/sec)")
+    print(f"  speedup     : {per_key_elapsed / batch_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="", help="Base URL of a running service; in-process when omitted.")
+    parser.add_argument("--keys", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--verbose", action="store_true", help="Keep the per-request INFO logs.")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    run(args.url, args.keys, args.batch_size)
@@ -0,0 +1,58 @@
+"""
+Simulation of consistent hashing with bounded loads under a Zipfian key stream.
+
+Every request in the stream is placed on a node and counted as one unit of
+load on it. The harness replays the same stream with the plain ring and with
+the bounded-load ring for each epsilon, and reports the max / mean load ratio.
+Run from the ``consistent_hashing`` directory:
+
+    python -m benchmarks.simulate_bounded_load --nodes 20 --requests 200000 --zipf 1.1
+"""
+import argparse
+import logging
+
+import numpy as np
+
+from app.hashing.bounded_load import LoadTracker
+from app.hashing.consistent_hashing import ConsistentHashing
+
+
+def zipf_stream(num_requests: int, universe: int, exponent: float, seed: int):
+    """Draws request keys from ``universe`` distinct keys with P(rank r) proportional to 1 / r**exponent."""
+    rng = np.random.default_rng(seed)
+    probabilities = 1.0 / np.arange(1, universe + 1) ** exponent
+    probabilities /= probabilities.sum()
+    return [f"key:{rank}" for rank in rng.choice(universe, size=num_requests, p=probabilities).tolist()]
+
+
+def replay(ch: ConsistentHashing, stream, bounded: bool) -> float:
+    tracker = LoadTracker()
+    for key in stream:
+        tracker.add(ch.get_node(key, loads=tracker if bounded else None))
+    loads = [tracker.load(node) for node in ch.nodes]
+    return max(loads) / (tracker.total / len(ch.nodes))
+
+
+def run(num_nodes: int, num_requests: int, universe: int, exponent: float, epsilons, seed: int):
+    nodes = [f"node-{i}" for i in range(num_nodes)]
+    stream = zipf_stream(num_requests, universe, exponent, seed)
+
+    print(f"nodes={num_nodes} requests={num_requests} universe={universe} zipf={exponent}")
+    print(f"  {'mode':<16} {'max/mean load':>14}")
+    print(f"  {'unbounded':<16} {replay(ConsistentHashing(nodes=nodes), stream, bounded=False):>14.3f}")
+    for epsilon in epsilons:
+        ch = ConsistentHashing(nodes=nodes, load_epsilon=epsilon)
+        print(f"  {f'epsilon={epsilon:g}':<16} {replay(ch, stream, bounded=True):>14.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--universe", type=int, default=100_000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--epsilons", type=float, nargs="+", default=[0.1, 0.25, 0.5, 1.0])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.nodes, args.requests, args.universe, args.zipf, args.epsilons, args.seed)
@@ -0,0 +1,195 @@
+"""
+Benchmark suite for the ring, with machine-readable JSON output.
+
+Runs every case against ``ConsistentHashing`` and emits one JSON document:
+
+  * lookup      scalar and batch lookups/sec
+  * membership  add_node / remove_node latency for each ring size
+  * memory      table bytes and traced bytes per virtual node
+  * balance     standard deviation and max/mean of keys per node vs replicas
+  * movement    fraction of keys moved on a node add and remove, vs ideal
+
+Every metric has a name, a value, a unit and whether higher or lower is
+better. With ``--baseline`` the run is compared against an earlier JSON output,
+and the script exits with status 1 if a metric got worse by more than
+``--tolerance``. Run from the ``consistent_hashing`` directory:
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline results.json --tolerance 0.15
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List
+
+from app.hashing.consistent_hashing import ConsistentHashing
+
+HIGHER, LOWER = "higher", "lower"
+
+
+def _metric(name: str, value: float, unit: str, better: str, **params) -> Dict[str, Any]:
+    return {"name": name, "value": value, "unit": unit, "better": better, "params": params}
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_lookup(nodes: List[str], keys: List[str], replicas: int, repeat: int) -> List[Dict[str, Any]]:
+    ch = ConsistentHashing(nodes=nodes, replicas=replicas)
+    scalar_keys = keys[:20_000]
+    scalar = _best_of(repeat, lambda: [ch.get_node(key) for key in scalar_keys])
+    batch = _best_of(repeat, lambda: ch.get_nodes(keys))
+    params = dict(nodes=len(nodes), replicas=replicas)
+    return [
+        _metric("lookup.single", len(scalar_keys) / scalar, "keys/s", HIGHER, **params),
+        _metric("lookup.batch", len(keys) / batch, "keys/s", HIGHER, **params, batch=len(keys)),
+    ]
+
+
+def bench_membership(sizes: List[int], replicas: int, repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        ch = ConsistentHashing(nodes=[f"node-{i}" for i in range(size)], replicas=replicas)
+        add = remove = float("inf")
+        for _ in range(repeat):
+            add = min(add, _best_of(1, lambda: ch.add_node("node-extra")))
+            remove = min(remove, _best_of(1, lambda: ch.remove_node("node-extra")))
+        results.append(_metric(f"membership.add.{size}", add * 1e3, "ms", LOWER, nodes=size, replicas=replicas))
+        results.append(_metric(f"membership.remove.{size}", remove * 1e3, "ms", LOWER, nodes=size, replicas=replicas))
+    return results
+
+
+def bench_memory(nodes: List[str], replicas: int) -> List[Dict[str, Any]]:
+    tracemalloc.start()
+    ch = ConsistentHashing(nodes=nodes, replicas=replicas)
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    vnodes = len(ch.sorted_keys)
+    params = dict(nodes=len(nodes), replicas=replicas)
+    return [
+        _metric("memory.table_per_vnode", ch.memory_bytes() / vnodes, "bytes", LOWER, **params),
+        _metric("memory.traced_per_vnode", traced / vnodes, "bytes", LOWER, **params),
+    ]
+
+
+def bench_balance(nodes: List[str], keys: List[str], replica_counts: List[int]) -> List[Dict[str, Any]]:
+    results = []
+    mean = len(keys) / len(nodes)
+    for replicas in replica_counts:
+        per_node = Counter(ConsistentHashing(nodes=nodes, replicas=replicas).get_nodes(keys))
+        counts = [per_node[node] for node in nodes]
+        params = dict(nodes=len(nodes), replicas=replicas, keys=len(keys))
+        results.append(_metric(f"balance.stddev.{replicas}", statistics.pstdev(counts), "keys", LOWER, **params))
+        results.append(_metric(f"balance.max_over_mean.{replicas}", max(counts) / mean, "ratio", LOWER, **params))
+    return results
+
+
+def bench_movement(nodes: List[str], keys: List[str], replicas: int) -> List[Dict[str, Any]]:
+    ch = ConsistentHashing(nodes=nodes, replicas=replicas)
+    before = ch.get_nodes(keys)
+
+    def moved_fraction() -> float:
+        return sum(old != new for old, new in zip(before, ch.get_nodes(keys))) / len(keys)
+
+    ch.add_node("node-extra")
+    moved_on_add = moved_fraction()
+    ch.remove_node("node-extra")
+    ch.remove_node(nodes[len(nodes) // 2])
+    moved_on_remove = moved_fraction()
+
+    params = dict(nodes=len(nodes), replicas=replicas, keys=len(keys))
+    return [
+        # Relative to the ideal 1/(n+1) and 1/n, so 1.0 means minimal disruption.
+        _metric("movement.add_over_ideal", moved_on_add * (len(nodes) + 1), "ratio", LOWER, **params),
+        _metric("movement.remove_over_ideal", moved_on_remove * len(nodes), "ratio", LOWER, **params),
+    ]
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> Dict[str, Any]:
+    nodes = [f"node-{i}" for i in range(args.nodes)]
+    keys = [f"user:{i}" for i in range(args.keys)]
+    metrics = (
+        bench_lookup(nodes, keys, args.replicas, args.repeat)
+        + bench_membership(args.sizes, args.replicas, args.repeat)
+        + bench_memory(nodes, args.replicas)
+        + bench_balance(nodes, keys, args.replica_counts)
+        + bench_movement(nodes, keys, args.replicas)
+    )
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Returns a description of every metric that got worse than the baseline by more than ``tolerance``."""
+    previous = {metric["name"]: metric for metric in baseline["metrics"]}
+    regressions = []
+    for metric in current["metrics"]:
+        old = previous.get(metric["name"])
+        if old is None or not old["value"]:
+            continue
+        change = (metric["value"] - old["value"]) / old["value"]
+        worse = -change if metric["better"] == HIGHER else change
+        if worse > tolerance:
+            regressions.append(
+                f"{metric['name']}: {old['value']:.4g} -> {metric['value']:.4g} {metric['unit']} ({worse:.1%} worse)"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--replicas", type=int, default=100)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 500, 1000])
+    parser.add_argument("--replica-counts", type=int, nargs="+", default=[10, 50, 100, 200, 500])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    parser.add_argument("--baseline", help="Earlier JSON results to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
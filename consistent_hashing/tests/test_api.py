@@ -1,5 +1,10 @@
+import math
+
 from fastapi.testclient import TestClient
+from app.api import routes
+from app.core.config import settings
 from app.main import app
+from app.services.hashing_service import HashingService
 
 client = TestClient(app)
 
@@ -18,3 +23,105 @@ def test_add_remove_node_api():
     remove_response = client.delete("/api/nodes/new-test-node")
     assert remove_response.status_code == 200
     assert "new-test-node" not in remove_response.json()["current_nodes"]
+
+def test_epoch_advances_on_topology_change():
+    before = int(client.get("/api/get-node/my-test-key").headers["X-Ring-Epoch"])
+
+    add_response = client.post("/api/nodes/epoch-test-node")
+    assert add_response.json()["epoch"] == before + 1
+
+    remove_response = client.delete("/api/nodes/epoch-test-node")
+    assert remove_response.json()["epoch"] == before + 2
+    assert client.get("/api/nodes").headers["X-Ring-Epoch"] == str(before + 2)
+
+def test_weighted_node_owns_larger_share():
+    add_response = client.post("/api/nodes/big-test-node", params={"weight": 4})
+    assert add_response.status_code == 201
+
+    ownership = client.get("/api/nodes/ownership").json()["nodes"]
+    assert ownership["big-test-node"]["weight"] == 4
+    assert abs(sum(node["share"] for node in ownership.values()) - 1.0) < 1e-9
+    assert ownership["big-test-node"]["share"] > max(
+        node["share"] for name, node in ownership.items() if name != "big-test-node"
+    )
+
+    client.delete("/api/nodes/big-test-node")
+    assert client.post("/api/nodes/bad-weight-node", params={"weight": 0}).status_code == 422
+
+def test_batch_routing_matches_single_lookups():
+    keys = [f"batch-key-{i}" for i in range(50)]
+    response = client.post("/api/get-nodes", json=keys)
+    assert response.status_code == 200
+    mapping = response.json()["nodes"]
+    assert mapping == {key: client.get(f"/api/get-node/{key}").json() for key in keys}
+
+    grouped = client.post("/api/get-nodes", params={"group_by_node": True}, json=keys).json()["groups"]
+    assert sorted(key for group in grouped.values() for key in group) == sorted(keys)
+
+    ndjson = "\n".join(f'"{key}"' for key in keys) + "\n"
+    streamed = client.post("/api/get-nodes", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert streamed.json()["nodes"] == mapping
+
+    assert client.post("/api/get-nodes", json={"key": "value"}).status_code == 400
+
+def test_cache_stats_endpoint():
+    response = client.get("/api/cache/stats")
+    assert response.status_code == 200
+    assert "enabled" in response.json()
+
+def test_rebalance_plan_after_adding_node():
+    client.post("/api/nodes/rebalance-test-node")
+    plan = client.get("/api/rebalance/last").json()
+    client.delete("/api/nodes/rebalance-test-node")
+
+    assert plan["to_epoch"] == plan["from_epoch"] + 1
+    assert plan["ranges"] and all(r["to_node"] == "rebalance-test-node" for r in plan["ranges"])
+    assert 0 < plan["moved_fraction"] < 1
+
+def test_replica_routes():
+    replicas = client.get("/api/get-replicas/my-test-key", params={"n": 2}).json()
+    assert len(replicas) == 2 and len(set(replicas)) == 2
+    assert replicas[0] == client.get("/api/get-node/my-test-key").json()
+
+    batch = client.post("/api/get-replicas", params={"n": 2}, json=["my-test-key"]).json()
+    assert batch["replicas"]["my-test-key"] == replicas
+
+def test_placements_require_bounded_load_mode():
+    assert client.post("/api/placements/my-test-key").status_code == 400
+    assert client.delete("/api/placements/my-test-key").status_code == 400
+
+def test_bounded_placements_are_sticky_until_released(monkeypatch):
+    monkeypatch.setattr(settings, "BOUNDED_LOAD_EPSILON", 0.25)
+    monkeypatch.setattr(HashingService, "_instance", None)
+    service = HashingService()
+    monkeypatch.setattr(routes, "hashing_service", service)
+
+    keys = [f"key-{i}" for i in range(300)]
+    placed = {key: client.post(f"/api/placements/{key}").json() for key in keys}
+    loads = {node: service.load_tracker.load(node) for node in settings.INITIAL_NODES}
+    assert sum(loads.values()) == 300
+    assert max(loads.values()) <= math.ceil(1.25 * 300 / 3)
+
+    # Placing a key again keeps its node and adds no load; lookups ignore loads.
+    assert client.post("/api/placements/key-0").json() == placed["key-0"]
+    assert service.load_tracker.total == 300
+    lookups = [client.get("/api/get-node/key-0").json() for _ in range(2)]
+    assert lookups[0] == lookups[1] == service.snapshot().get_node("key-0")
+
+    released = client.delete("/api/placements/key-0")
+    assert released.json()["node"] == placed["key-0"]
+    assert service.load_tracker.load(placed["key-0"]) == loads[placed["key-0"]] - 1
+    assert client.delete("/api/placements/key-0").status_code == 404
+
+    # Keys on a removed node lose their placement and are placed elsewhere next time.
+    node = placed["key-1"]
+    service.remove_node(node)
+    assert service.load_tracker.load(node) == 0
+    assert client.delete("/api/placements/key-1").status_code == 404
+    assert client.post("/api/placements/key-1").json() != node
+
+def test_same_key_routes_the_same_way_twice():
+    first = client.get("/api/get-node/repeated-key")
+    second = client.get("/api/get-node/repeated-key")
+    assert first.json() == second.json()
+    assert first.headers["X-Ring-Epoch"] == second.headers["X-Ring-Epoch"]
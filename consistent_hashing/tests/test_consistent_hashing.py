@@ -1,4 +1,7 @@
+import pytest
+
 from app.hashing.consistent_hashing import ConsistentHashing
+from app.hashing.hash_functions import HASH_FUNCTIONS
 
 
 def test_add_and_get_node():
@@ -28,4 +31,90 @@ def test_distribution_change_on_add():
 
     assert keys_on_node2 > 0
     assert moved_keys == keys_on_node2
-    assert moved_keys < len(keys_to_test)
\ No newline at end of file
+    assert moved_keys < len(keys_to_test)
+
+def test_batch_lookup_matches_scalar():
+    ch = ConsistentHashing(nodes=['node1', 'node2', 'node3'])
+    keys = [f"key-{i}" for i in range(1000)]
+
+    assert ch.get_nodes(keys) == [ch.get_node(key) for key in keys]
+    assert ConsistentHashing().get_nodes(keys[:3]) == [None, None, None]
+
+
+@pytest.mark.parametrize("hash_function", sorted(HASH_FUNCTIONS))
+def test_hash_functions_are_64_bit_and_consistent(hash_function):
+    ch = ConsistentHashing(nodes=['node1', 'node2', 'node3'], hash_function=hash_function)
+    keys = [f"key-{i}" for i in range(200)]
+
+    assert all(0 <= point < 2 ** 64 for point in ch.sorted_keys)
+    assert ch.get_nodes(keys) == [ch.get_node(key) for key in keys]
+    assert len(set(ch.get_nodes(keys))) == 3
+
+
+def test_unknown_hash_function_is_rejected():
+    with pytest.raises(ValueError):
+        ConsistentHashing(hash_function='sha1')
+
+
+def test_remove_node_restores_previous_ring():
+    ch = ConsistentHashing(nodes=['node1', 'node2', 'node3'])
+    points, owners = list(ch.sorted_keys), [ch.nodes[i] for i in ch.snapshot().owners]
+
+    ch.add_node('node4')
+    ch.remove_node('node2')
+    ch.add_node('node2')
+    ch.remove_node('node4')
+
+    assert list(ch.sorted_keys) == points
+    assert sorted(zip(ch.sorted_keys, (ch.nodes[i] for i in ch.snapshot().owners))) == sorted(zip(points, owners))
+    assert list(ch.sorted_keys) == sorted(ch.sorted_keys)
+
+
+def test_snapshots_are_immutable_across_changes():
+    ch = ConsistentHashing(nodes=['node1', 'node2'])
+    snapshot = ch.snapshot()
+    keys = [f"key-{i}" for i in range(100)]
+    before = snapshot.get_nodes(keys)
+
+    ch.add_node('node3')
+    ch.remove_node('node1')
+
+    assert ch.epoch == snapshot.epoch + 2
+    assert snapshot.nodes == ('node1', 'node2')
+    assert snapshot.get_nodes(keys) == before
+
+
+def test_bounded_load_caps_hot_node():
+    from app.hashing.bounded_load import LoadTracker
+
+    ch = ConsistentHashing(nodes=['node1', 'node2', 'node3', 'node4'], load_epsilon=0.25)
+    tracker = LoadTracker()
+    hot_owner = ch.get_node('hot-key')
+
+    for _ in range(400):
+        node = ch.get_node('hot-key', loads=tracker)
+        tracker.add(node)
+
+    assert max(tracker.load(node) for node in ch.nodes) <= 1.25 * 400 / 4 + 1
+    assert tracker.load(hot_owner) > 0
+    # Without a hook the plain owner is returned.
+    assert ch.get_node('hot-key') == hot_owner
+
+
+def test_replica_sets_are_distinct_and_zone_aware():
+    ch = ConsistentHashing()
+    ch.add_nodes(['a1', 'a2', 'b1', 'b2', 'c1'], zones=['a', 'a', 'b', 'b', 'c'])
+    keys = [f"key-{i}" for i in range(300)]
+
+    replica_sets = ch.get_replica_sets(keys, 3)
+    assert replica_sets == [ch.get_nodes_for_key(key, 3) for key in keys]
+    for key, replicas in zip(keys, replica_sets):
+        assert len(set(replicas)) == 3
+        assert replicas[0] == ch.get_node(key)
+
+    for replicas in ch.get_replica_sets(keys, 3, distinct_zones=True):
+        assert {node[0] for node in replicas} == {'a', 'b', 'c'}
+
+    # More replicas than zones: zones repeat only once every zone is used.
+    assert len(set(ch.get_nodes_for_key('key-1', 5, distinct_zones=True))) == 5
+    assert ConsistentHashing(nodes=['solo']).get_nodes_for_key('key', 3) == ['solo']
@@ -0,0 +1,86 @@
+import pytest
+
+from app.hashing.engines import ENGINES, create_engine
+
+KEYS = [f"key-{i}" for i in range(2000)]
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_batch_lookup_matches_scalar(engine):
+    hashing = create_engine(engine, nodes=['node1', 'node2', 'node3', 'node4'], maglev_table_size=251)
+
+    placements = hashing.get_nodes(KEYS)
+    assert placements == [hashing.get_node(key) for key in KEYS]
+    assert set(placements) == {'node1', 'node2', 'node3', 'node4'}
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_empty_engine_returns_none(engine):
+    hashing = create_engine(engine, maglev_table_size=251)
+    assert hashing.get_node('key') is None
+    assert hashing.get_nodes(['a', 'b']) == [None, None]
+
+
+@pytest.mark.parametrize("engine", ["ring", "jump", "rendezvous"])
+def test_adding_a_node_only_moves_keys_to_it(engine):
+    hashing = create_engine(engine, nodes=['node1', 'node2', 'node3'])
+    before = hashing.get_nodes(KEYS)
+    epoch = hashing.epoch
+
+    hashing.add_node('node4')
+    after = hashing.get_nodes(KEYS)
+
+    assert hashing.epoch == epoch + 1
+    assert all(new in (old, 'node4') for old, new in zip(before, after))
+
+
+@pytest.mark.parametrize("engine", ["ring", "rendezvous"])
+def test_removing_a_node_only_moves_its_keys(engine):
+    hashing = create_engine(engine, nodes=['node1', 'node2', 'node3'])
+    before = hashing.get_nodes(KEYS)
+
+    hashing.remove_node('node2')
+    after = hashing.get_nodes(KEYS)
+
+    assert all(old == new for old, new in zip(before, after) if old != 'node2')
+    assert 'node2' not in after
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        create_engine('modulo')
+
+
+@pytest.mark.parametrize("engine", ["ring", "rendezvous", "maglev"])
+def test_weights_scale_ownership(engine):
+    hashing = create_engine(engine, nodes=['small1', 'small2'], maglev_table_size=10007)
+    hashing.add_node('big', weight=2.0)
+
+    shares = hashing.ownership()
+    assert abs(sum(shares.values()) - 1.0) < 1e-9
+    assert 0.35 < shares['big'] < 0.65
+    assert hashing.snapshot().weight_of('big') == 2.0
+
+
+def test_jump_rejects_weights():
+    with pytest.raises(ValueError):
+        create_engine('jump', nodes=['node1']).add_node('node2', weight=2.0)
+
+
+@pytest.mark.parametrize("table_size", [1, 65536, 10007 * 3])
+def test_maglev_rejects_a_table_size_that_is_not_prime(table_size):
+    with pytest.raises(ValueError):
+        create_engine('maglev', maglev_table_size=table_size)
+
+
+def test_maglev_rejects_more_nodes_than_table_slots():
+    hashing = create_engine('maglev', nodes=['node1', 'node2'], maglev_table_size=3)
+    with pytest.raises(ValueError):
+        hashing.add_node('node3')
+    assert hashing.nodes == ['node1', 'node2']
+
+
+@pytest.mark.parametrize("engine", ["jump", "rendezvous", "maglev"])
+def test_load_epsilon_is_rejected_outside_the_ring(engine):
+    with pytest.raises(ValueError):
+        create_engine(engine, maglev_table_size=251, load_epsilon=0.25)
@@ -0,0 +1,50 @@
+import logging
+import queue
+import time
+
+from app.core.logger_config import _DeferredQueueHandler, setup_logger, should_sample
+
+
+class CountingArg:
+    """A log argument that counts how often it is turned into a string."""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "arg"
+
+
+def test_queue_handler_enqueues_records_unformatted():
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger("test-deferred-queue-handler")
+    logger.propagate = False
+    logger.addHandler(_DeferredQueueHandler(log_queue))
+    arg = CountingArg()
+
+    logger.warning("Formatted with %s", arg)
+
+    record = log_queue.get_nowait()
+    assert arg.formatted == 0
+    assert (record.msg, record.args) == ("Formatted with %s", (arg,))
+    assert record.getMessage() == "Formatted with arg"
+
+
+def test_listener_writes_queued_records_to_the_file(tmp_path):
+    log_file = tmp_path / "queued.log"
+    logger = setup_logger("test-queued-file-logger", log_file=str(log_file), use_queue=True)
+
+    logger.info("Node '%s' joined.", "cache-node-9")
+
+    # The listener thread writes the line some time after the call returns.
+    deadline = time.monotonic() + 5
+    while "Node 'cache-node-9' joined." not in (log_file.read_text() if log_file.exists() else ""):
+        assert time.monotonic() < deadline, "the listener did not write the record"
+        time.sleep(0.01)
+    assert "test-queued-file-logger - INFO - " in log_file.read_text()
+
+
+def test_should_sample_at_the_extreme_rates():
+    assert not any(should_sample(0) for _ in range(10_000))
+    assert all(should_sample(1) for _ in range(10_000))
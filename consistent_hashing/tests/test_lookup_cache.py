@@ -0,0 +1,24 @@
+from app.services.lookup_cache import LookupCache
+
+
+def test_lru_eviction_and_counters():
+    cache = LookupCache(capacity=2)
+    cache.put("a", 1, "node1")
+    cache.put("b", 1, "node2")
+    assert cache.get("a", 1) == "node1"
+
+    cache.put("c", 1, "node3")  # evicts "b", the least recently used
+
+    assert cache.get("b", 1) is None
+    assert cache.get("c", 1) == "node3"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 1, 1, 2)
+
+
+def test_epoch_change_invalidates_entries():
+    cache = LookupCache(capacity=10)
+    cache.put("a", 1, "node1")
+
+    assert cache.get("a", 2) is None
+    cache.put("a", 2, "node2")
+    assert cache.get("a", 2) == "node2"
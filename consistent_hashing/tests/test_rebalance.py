@@ -0,0 +1,40 @@
+from app.hashing.consistent_hashing import ConsistentHashing
+from app.hashing.rebalance import classify_keys, plan_rebalance
+
+KEYS = [f"key-{i}" for i in range(5000)]
+
+
+def _plan_matches_rehash(ch, change):
+    old = ch.snapshot()
+    change(ch)
+    new = ch.snapshot()
+
+    plan = plan_rebalance(old, new, ch.node_points)
+    moved = {key: (src, dst) for key, src, dst in classify_keys(KEYS, plan, ch._hash, chunk_size=700)}
+    expected = {
+        key: (before, after)
+        for key, before, after in zip(KEYS, old.get_nodes(KEYS), new.get_nodes(KEYS))
+        if before != after
+    }
+    assert moved == expected
+    assert all(r.start < r.end for r in plan)
+    assert all(a.end <= b.start for a, b in zip(plan, plan[1:]))
+    return plan
+
+
+def test_plan_for_added_node_matches_full_rehash():
+    ch = ConsistentHashing(nodes=['node1', 'node2', 'node3'])
+    plan = _plan_matches_rehash(ch, lambda c: c.add_node('node4', weight=2.0))
+    assert {r.to_node for r in plan} == {'node4'}
+
+
+def test_plan_for_removed_node_matches_full_rehash():
+    ch = ConsistentHashing(nodes=['node1', 'node2', 'node3'])
+    plan = _plan_matches_rehash(ch, lambda c: c.remove_node('node2'))
+    assert {r.from_node for r in plan} == {'node2'}
+
+
+def test_plan_from_empty_ring_covers_everything():
+    ch = ConsistentHashing(replicas=5)
+    plan = _plan_matches_rehash(ch, lambda c: c.add_node('node1'))
+    assert sum(r.end - r.start for r in plan) == 2 ** 64
@@ -0,0 +1,38 @@
+import pytest
+
+from app.hashing.consistent_hashing import ConsistentHashing
+from app.hashing.ring_store import load_ring, save_ring
+
+KEYS = [f"key-{i}" for i in range(1000)]
+
+
+def test_saved_ring_loads_with_identical_placement(tmp_path):
+    ch = ConsistentHashing(hash_function='blake2b')
+    ch.add_nodes(['node1', 'node2', 'node3'], weights=[1.0, 2.0, 1.0], zones=['a', 'b', None])
+    path = str(tmp_path / "ring.bin")
+
+    save_ring(ch.snapshot(), path, ch.replicas, ch.hash_function)
+    loaded, meta = load_ring(path)
+
+    assert (meta["replicas"], meta["hash_function"]) == (100, 'blake2b')
+    assert loaded.epoch == ch.epoch
+    assert (loaded.nodes, loaded.weights, loaded.zones) == (('node1', 'node2', 'node3'), (1.0, 2.0, 1.0), ('a', 'b', None))
+    assert list(loaded.points) == list(ch.sorted_keys)
+    assert loaded.get_nodes(KEYS) == [loaded.get_node(key) for key in KEYS] == ch.get_nodes(KEYS)
+
+    # A ring restored from the file keeps evolving from the saved epoch.
+    restored = ConsistentHashing(hash_function='blake2b')
+    restored.load_snapshot(loaded)
+    restored.add_node('node4')
+    ch.add_node('node4')
+    assert restored.epoch == ch.epoch
+    assert restored.get_nodes(KEYS) == ch.get_nodes(KEYS)
+
+
+def test_truncated_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "ring.bin"
+    save_ring(ConsistentHashing(nodes=['node1']).snapshot(), str(path), 100, 'md5')
+    path.write_bytes(path.read_bytes()[:-16])
+
+    with pytest.raises(ValueError):
+        load_ring(str(path))
@@ -0,0 +1,45 @@
+import pytest
+
+from app.hashing.consistent_hashing import ConsistentHashing
+from app.services.topology_sync import ADD, REMOVE, TopologyLog, TopologySync
+
+NODES = ['node1', 'node2', 'node3']
+KEYS = [f"key-{i}" for i in range(500)]
+
+
+def _worker(path):
+    """One worker process: its own engine and connection to the shared log."""
+    return TopologySync(TopologyLog(path), ConsistentHashing(nodes=NODES))
+
+
+def test_workers_converge_on_the_same_ring(tmp_path):
+    path = str(tmp_path / "topology.db")
+    a, b = _worker(path), _worker(path)
+
+    assert a.submit(ADD, 'node4', 2.0, 'zone-b')
+    assert b.submit(REMOVE, 'node1')  # catches up on node4 before appending
+    assert a.pull() == 1
+    assert not a.submit(ADD, 'node4')  # already added, so nothing is logged
+
+    assert a.version == b.version == 2
+    assert a.engine.epoch == b.engine.epoch
+    assert a.engine.nodes == b.engine.nodes == ['node2', 'node3', 'node4']
+    assert a.engine.get_nodes(KEYS) == b.engine.get_nodes(KEYS)
+
+    # A worker started later replays the whole log.
+    c = _worker(path)
+    assert c.pull() == 2
+    assert c.engine.epoch == a.engine.epoch
+    assert c.engine.snapshot().zones == a.engine.snapshot().zones
+
+
+def test_rejected_change_is_not_logged(tmp_path):
+    path = str(tmp_path / "topology.db")
+    a, b = _worker(path), _worker(path)
+
+    with pytest.raises(ValueError):
+        a.submit(ADD, 'node4', weight=0)
+
+    assert a.log.changes_since(0) == []
+    assert b.pull() == 0
+    assert a.engine.nodes == NODES
@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import itertools
+import logging
+import time
+import uuid
+from typing import List, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import NoScriptError
+
+from .batching import Check, CheckResult
+from .circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger("app")
+
+
+class Backend:
+    """
+    Where bucket state lives. ``check`` runs the checks of one or more
+    requests in order: a request's buckets give it ``requested`` tokens
+    together or none do (with ``partial``, as many whole tokens as the
+    tightest bucket has), and a bucket shared by several checks sees the
+    tokens taken by the earlier ones. ``now`` overrides the clock, in the
+    backend's own time base.
+    """
+
+    async def check(self, checks: List[Check], now: Optional[float] = None) -> List[CheckResult]:
+        raise NotImplementedError
+
+
+class RedisBackend(Backend):
+    """
+    Buckets in Redis, shared by every app instance, checked with a Lua script
+    so each call is atomic. Calls go through a ``CircuitBreaker`` that gives
+    each of them ``timeout`` seconds and stops calling Redis after
+    ``failure_threshold`` consecutive failures until it answers a ping again.
+
+    The script is loaded once, ideally at startup with ``load_script``, and
+    then run by its SHA; if Redis has lost it (after a restart or a SCRIPT
+    FLUSH), the call that finds out reloads it and retries.
+    """
+    # Checks the buckets of one or more requests in a single call. KEYS are the
+    # bucket keys of all requests, in order. ARGV is the current time, a token
+    # unique to the call, then per request: its number of buckets n,
+    # requested, partial, and n triples of (capacity, refill_rate, algorithm).
+    # A request's buckets are charged together: all give ``requested`` tokens
+    # or none do, unless ``partial`` is 1, in which case they give as many
+    # whole tokens as the tightest bucket has, up to ``requested`` (used to
+    # lease tokens). Returns a flat {granted, tokens left in the tightest
+    # bucket, 0-based index of that bucket, milliseconds until the request
+    # could be granted (0 if it was), ...} list. Requests are processed
+    # in order, so a bucket shared by several requests in one call sees the
+    # tokens consumed by the earlier ones.
+    #
+    # Each algorithm (see ``app.rules.ALGORITHMS``) has a ``peek``, which
+    # returns the whole tokens available now plus the state ``commit`` needs,
+    # and a ``commit``, which only writes when tokens are granted: the state
+    # is a function of the stored values and the time, so a denial has
+    # nothing to record. Keys expire once they would read as a fresh bucket.
+    # On a denial, ``wait`` gives the time until a bucket will have the
+    # tokens the request needs (one, for a partial request).
+    LUA_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local call_id = ARGV[2]
+    local results = {}
+    local arg = 3
+    local first_key = 1
+    local sequence = 0
+    -- Absorbs float error so that e.g. 2.9999999 available tokens count as 3
+    local epsilon = 1e-9
+
+    local function peek(key, capacity, refill_rate, algorithm)
+        if algorithm == 'gcra' then
+            -- Theoretical arrival time: when the bucket would be full again
+            local tat = math.max(tonumber(redis.call('GET', key)) or now, now)
+            return math.floor(capacity - (tat - now) * refill_rate + epsilon), tat
+        elseif algorithm == 'sliding_window' then
+            local period = capacity / refill_rate
+            local window = math.floor(now / period)
+            local data = redis.call('HMGET', key, 'window', 'current', 'previous')
+            local stored = tonumber(data[1])
+            local current, previous = 0, 0
+            if stored == window then
+                current, previous = tonumber(data[2]), tonumber(data[3])
+            elseif stored == window - 1 then
+                previous = tonumber(data[2])
+            end
+            -- The previous window counts for the part of it still inside the sliding window
+            local weight = 1 - (now - window * period) / period
+            return math.floor(capacity - previous * weight - current + epsilon), {window, current, previous}
+        elseif algorithm == 'sliding_log' then
+            redis.call('ZREMRANGEBYSCORE', key, '-inf', now - capacity / refill_rate)
+            return capacity - redis.call('ZCARD', key), nil
+        else
+            local data = redis.call('HMGET', key, 'tokens', 'timestamp')
+            local tokens = tonumber(data[1])
+            local timestamp = tonumber(data[2])
+            if tokens == nil then
+                tokens, timestamp = capacity, now
+            end
+            -- Fractional tokens are kept, so slow refill rates lose nothing
+            tokens = math.min(capacity, tokens + math.max(0, now - timestamp) * refill_rate)
+            return math.floor(tokens + epsilon), tokens
+        end
+    end
+
+    local function commit(key, capacity, refill_rate, algorithm, state, granted)
+        if algorithm == 'gcra' then
+            local tat = state + granted / refill_rate
+            redis.call('SET', key, tat, 'PX', math.ceil((tat - now) * 1000))
+        elseif algorithm == 'sliding_window' then
+            local period = capacity / refill_rate
+            redis.call('HSET', key, 'window', state[1], 'current', state[2] + granted, 'previous', state[3])
+            redis.call('PEXPIRE', key, math.ceil(2 * period * 1000))
+        elseif algorithm == 'sliding_log' then
+            for i = 1, granted do
+                sequence = sequence + 1
+                redis.call('ZADD', key, now, call_id .. ':' .. sequence)
+            end
+            redis.call('PEXPIRE', key, math.ceil(capacity / refill_rate * 1000))
+        else
+            local tokens = state - granted
+            redis.call('HSET', key, 'tokens', tokens, 'timestamp', now)
+            redis.call('PEXPIRE', key, math.ceil((capacity - tokens) / refill_rate * 1000) + 1)
+        end
+    end
+
+    local function wait(key, capacity, refill_rate, algorithm, state, available, need)
+        if algorithm == 'gcra' then
+            return state - (capacity - need) / refill_rate - now
+        elseif algorithm == 'sliding_window' then
+            local period = capacity / refill_rate
+            local window, current, previous = state[1], state[2], state[3]
+            local room = capacity - need - current
+            if room >= 0 then
+                -- The previous window's weight has to drop to room / previous
+                return window * period + (1 - room / previous) * period - now
+            end
+            -- Only once this window is the previous one and weighs (capacity - need) / current
+            return (window + 1) * period + (1 - (capacity - need) / current) * period - now
+        elseif algorithm == 'sliding_log' then
+            -- The log holds capacity - available entries and may keep capacity - need,
+            -- so the request waits for the (need - available)-th oldest to leave it
+            local index = need - available - 1
+            local entry = redis.call('ZRANGE', key, index, index, 'WITHSCORES')
+            return tonumber(entry[2]) + capacity / refill_rate - now
+        else
+            return (need - state) / refill_rate
+        end
+    end
+
+    while arg <= #ARGV do
+        local n = tonumber(ARGV[arg])
+        local requested = tonumber(ARGV[arg + 1])
+        local partial = tonumber(ARGV[arg + 2])
+        arg = arg + 3
+
+        local buckets = {}
+        local granted = requested
+        for j = 1, n do
+            local bucket = {
+                key = KEYS[first_key + j - 1],
+                capacity = tonumber(ARGV[arg]),
+                refill_rate = tonumber(ARGV[arg + 1]),
+                algorithm = ARGV[arg + 2],
+            }
+            arg = arg + 3
+            bucket.available, bucket.state = peek(bucket.key, bucket.capacity, bucket.refill_rate, bucket.algorithm)
+            if bucket.available < requested then
+                if partial == 1 then
+                    granted = math.min(granted, math.max(0, bucket.available))
+                else
+                    granted = 0
+                end
+            end
+            buckets[j] = bucket
+        end
+
+        local left, limiting, retry_after = nil, 0, 0
+        local need = requested
+        if partial == 1 then
+            need = 1
+        end
+        for j, bucket in ipairs(buckets) do
+            if granted > 0 then
+                commit(bucket.key, bucket.capacity, bucket.refill_rate, bucket.algorithm, bucket.state, granted)
+            elseif bucket.available < need then
+                local seconds = wait(bucket.key, bucket.capacity, bucket.refill_rate, bucket.algorithm,
+                    bucket.state, bucket.available, need)
+                retry_after = math.max(retry_after, math.ceil(seconds * 1000))
+            end
+            local bucket_left = math.max(0, bucket.available - granted)
+            if left == nil or bucket_left < left then
+                left, limiting = bucket_left, j - 1
+            end
+        end
+
+        first_key = first_key + n
+        results[#results + 1] = granted
+        results[#results + 1] = left
+        results[#results + 1] = limiting
+        results[#results + 1] = retry_after
+    end
+
+    return results
+    """
+
+    def __init__(
+            self,
+            client: redis.Redis,
+            timeout: Optional[float] = None,
+            failure_threshold: int = 5,
+            probe_interval: float = 1.0,
+    ):
+        self.client = client
+        self.breaker = CircuitBreaker(
+            client.ping, timeout=timeout, failure_threshold=failure_threshold, probe_interval=probe_interval
+        )
+        self._script_sha = hashlib.sha1(self.LUA_SCRIPT.encode()).hexdigest()
+        self._script_lock = asyncio.Lock()
+        self._script_loads = 0
+        # Unique per call, so sliding log entries from different calls never collide
+        self._call_prefix = uuid.uuid4().hex[:12]
+        self._calls = itertools.count()
+
+    @classmethod
+    def from_settings(cls, client: redis.Redis, settings) -> "RedisBackend":
+        """A backend for ``client`` with the Redis timeout and circuit breaker configured in ``settings``."""
+        return cls(
+            client,
+            timeout=settings.REDIS_TIMEOUT_MS / 1000 if settings.REDIS_TIMEOUT_MS is not None else None,
+            failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+            probe_interval=settings.BREAKER_PROBE_INTERVAL_MS / 1000,
+        )
+
+    async def load_script(self, stale: Optional[int] = None):
+        """
+        Loads the Lua script into Redis, once however many calls ask for it at
+        the same time. ``stale`` is the number of loads a call had seen when
+        Redis answered NOSCRIPT; the script is loaded again unless another
+        call has already done so since.
+        """
+        if self._script_loads and stale is None:
+            return
+        async with self._script_lock:
+            if self._script_loads == (stale or 0):
+                await self.client.script_load(self.LUA_SCRIPT)
+                self._script_loads += 1
+                logger.info(f"Loaded rate limiter Lua script into Redis (SHA: {self._script_sha})")
+
+    async def _run_script(self, keys: List[str], args: list) -> List[int]:
+        await self.load_script()
+        loads = self._script_loads
+        try:
+            return await self.client.evalsha(self._script_sha, len(keys), *keys, *args)
+        except NoScriptError:
+            logger.warning("Rate limiter Lua script is missing from Redis; reloading it.")
+            await self.load_script(stale=loads)
+            return await self.client.evalsha(self._script_sha, len(keys), *keys, *args)
+
+    async def check(self, checks: List[Check], now: Optional[float] = None) -> List[CheckResult]:
+        """Runs the checks of several requests in one EVALSHA call."""
+        now = time.time() if now is None else now
+        keys, args = [], [now, f"{self._call_prefix}:{next(self._calls)}"]
+        for bucket_keys, limits, requested, partial in checks:
+            keys += bucket_keys
+            args += [len(bucket_keys), requested, int(partial)]
+            for limit in limits:
+                args += [limit.capacity, limit.refill_rate, limit.algorithm]
+        flat = await self.breaker.call(lambda: self._run_script(keys, args))
+        return list(zip(flat[::4], flat[1::4], flat[2::4], flat[3::4]))
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from .rules import Limit
+
+logger = logging.getLogger("app")
+
+# (bucket keys, their limits, requested, partial): the buckets of one request,
+# which are all charged or none are.
+Check = Tuple[Tuple[str, ...], Tuple[Limit, ...], int, bool]
+# (tokens granted, tokens left in the tightest bucket, index of that bucket,
+# milliseconds until the request could be granted, or 0 if it was)
+CheckResult = Tuple[int, float, int, int]
+
+
+class CheckBatcher:
+    """
+    Coalesces rate limit checks from concurrent requests into one Redis call.
+
+    The first check to arrive opens a batch; the batch is sent when ``window``
+    seconds have passed or ``max_size`` checks have joined it, whichever comes
+    first. A window of 0 sends on the next event loop iteration, which still
+    groups every check that was ready at the same time. ``execute`` receives
+    the checks in arrival order and must return one result per check; each
+    waiting request gets its own result, or the call's exception.
+    """
+
+    def __init__(
+            self,
+            execute: Callable[[List[Check]], Awaitable[List[CheckResult]]],
+            window: float = 0.001,
+            max_size: int = 100,
+    ):
+        self.execute = execute
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[Tuple[Check, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+
+    async def submit(self, check: Check) -> CheckResult:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((check, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference so the task is not garbage collected mid-flight.
+            task = asyncio.ensure_future(self._send(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _send(self, batch: List[Tuple[Check, asyncio.Future]]):
+        try:
+            results: List[Any] = await self.execute([check for check, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger("app")
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the backend while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Guards calls to a backend that may be slow or down.
+
+    Every call gets at most ``timeout`` seconds. After ``failure_threshold``
+    consecutive failures (timeouts included) the circuit opens: calls fail
+    immediately with ``CircuitOpenError`` instead of each waiting out the
+    timeout, and a background task runs ``probe`` every ``probe_interval``
+    seconds, closing the circuit again once it succeeds.
+    """
+
+    def __init__(
+            self,
+            probe: Callable[[], Awaitable[Any]],
+            timeout: Optional[float] = None,
+            failure_threshold: int = 5,
+            probe_interval: float = 1.0,
+    ):
+        self.probe = probe
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.failures = 0
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._probe_task is not None
+
+    async def call(self, operation: Callable[[], Awaitable[T]]) -> T:
+        if self.is_open:
+            raise CircuitOpenError("Circuit is open")
+        try:
+            result = await asyncio.wait_for(operation(), self.timeout)
+        except Exception:
+            self.failures += 1
+            if self.failures >= self.failure_threshold and not self.is_open:
+                logger.warning(f"Opening circuit after {self.failures} consecutive failures.")
+                self._probe_task = asyncio.ensure_future(self._probe_until_closed())
+            raise
+        self.failures = 0
+        return result
+
+    async def _probe_until_closed(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await asyncio.wait_for(self.probe(), self.timeout)
+            except Exception as e:
+                logger.debug(f"Circuit probe failed: {e}")
+                continue
+            self.failures = 0
+            self._probe_task = None
+            logger.info("Probe succeeded; circuit closed.")
+            return
+
+    def close(self):
+        """Stops probing and closes the circuit, e.g. on shutdown."""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+        self.failures = 0
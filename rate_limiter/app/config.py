@@ -1,7 +1,8 @@
 import json
 import logging
+from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import Dict, Any
+from typing import Dict, Any, Literal, Optional
 
 logger = logging.getLogger("app")
 
@@ -12,7 +13,36 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    # At most REDIS_MAX_CONNECTIONS pooled connections, which requests wait
+    # for when all are busy; idle ones are checked with a PING before reuse
+    # after REDIS_HEALTH_CHECK_INTERVAL seconds. Protocol 3 (RESP3) needs Redis 6+.
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    REDIS_CONNECT_TIMEOUT_MS: float = 1000
+    REDIS_PROTOCOL: int = 3
     RATE_LIMIT_RULES_PATH: str = "rate_limits.json"
+    # "redis" shares buckets across instances; "local" keeps them in-process
+    # (at most LOCAL_MAX_ENTRIES) for single-node deployments without Redis.
+    BACKEND: Literal["redis", "local"] = "redis"
+    LOCAL_MAX_ENTRIES: int = 1_000_000
+    # Coalesce concurrent checks into one Redis call sent every BATCH_WINDOW_MS
+    # or once BATCH_MAX_SIZE checks are waiting. Disabled when unset.
+    BATCH_WINDOW_MS: Optional[float] = None
+    BATCH_MAX_SIZE: int = 100
+    # Lease this fraction of a bucket's capacity to the instance at a time and
+    # serve requests from it locally, for at most LEASE_TTL_MS. Disabled when unset.
+    LEASE_FRACTION: Optional[float] = None
+    LEASE_TTL_MS: float = 1000
+    # Give each Redis call REDIS_TIMEOUT_MS. After BREAKER_FAILURE_THRESHOLD
+    # consecutive failures, stop calling Redis and probe it every
+    # BREAKER_PROBE_INTERVAL_MS; meanwhile each instance enforces
+    # FALLBACK_SHARE of every limit in-process (e.g. 0.25 for 4 instances).
+    REDIS_TIMEOUT_MS: Optional[float] = 100
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_PROBE_INTERVAL_MS: float = 1000
+    FALLBACK_SHARE: float = Field(1.0, gt=0, le=1)
+    # Number of most throttled clients reported on /metrics.
+    METRICS_TOP_K: int = 20
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,78 @@
+import math
+import time
+from typing import Dict, Optional, Sequence
+
+from .batching import CheckResult
+from .rules import Limit
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "full_at")
+
+    def __init__(self, tokens: float, updated: float, full_at: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.full_at = full_at  # When the bucket has refilled and can be forgotten
+
+
+class LocalBuckets:
+    """
+    In-process token buckets that stand in for Redis while it is unreachable.
+
+    Each instance only sees its own traffic, so limits are approximate: every
+    instance enforces ``share`` of each limit's capacity and refill rate (for
+    example 1/N with N instances behind a balancer; at least one token per
+    bucket). Every algorithm is enforced as a token bucket, which matches GCRA
+    exactly and the sliding windows roughly. Buckets that have refilled are
+    swept once there are more than ``max_entries``. Raises ``ValueError``
+    unless ``0 < share <= 1``.
+    """
+
+    def __init__(self, share: float = 1.0, max_entries: int = 100_000):
+        if not 0 < share <= 1:
+            raise ValueError(f"The fallback share must be in (0, 1], got {share}.")
+        self.share = share
+        self.max_entries = max_entries
+        self._buckets: Dict[str, _Bucket] = {}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, keys: Sequence[str], limits: Sequence[Limit], now: Optional[float] = None) -> CheckResult:
+        """
+        Takes a token from every bucket of a request, or from none if any is
+        empty, like the Redis script. Returns (granted, tokens left in the
+        tightest bucket, index of that bucket, milliseconds until a denied
+        request could be granted).
+        """
+        now = time.monotonic() if now is None else now
+        if len(self._buckets) >= self.max_entries:
+            self._sweep(now)
+
+        buckets, tokens = [], []
+        for key, limit in zip(keys, limits):
+            capacity = max(1.0, limit.capacity * self.share)
+            refill_rate = limit.refill_rate * self.share
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(capacity, now, now)
+            buckets.append(bucket)
+            tokens.append(min(capacity, bucket.tokens + (now - bucket.updated) * refill_rate))
+
+        granted = int(all(available >= 1 for available in tokens))
+        left, limiting, retry_after = None, 0, 0
+        for i, (bucket, limit) in enumerate(zip(buckets, limits)):
+            refill_rate = limit.refill_rate * self.share
+            if tokens[i] < 1:
+                retry_after = max(retry_after, math.ceil((1 - tokens[i]) / refill_rate * 1000))
+            bucket.tokens = tokens[i] - granted
+            bucket.updated = now
+            bucket.full_at = now + (max(1.0, limit.capacity * self.share) - bucket.tokens) / refill_rate
+            if left is None or bucket.tokens < left:
+                left, limiting = bucket.tokens, i
+        return granted, int(left), limiting, retry_after
+
+    def _sweep(self, now: float):
+        full = [key for key, bucket in self._buckets.items() if bucket.full_at <= now]
+        for key in full:
+            del self._buckets[key]
@@ -0,0 +1,62 @@
+import time
+from typing import Dict, Optional, Tuple
+
+
+class Lease:
+    """Tokens this instance has taken from a shared bucket and may hand out locally."""
+    __slots__ = ("tokens", "shared", "limiting", "expires_at")
+
+    def __init__(self, tokens: int, shared: float, limiting: int, expires_at: float):
+        self.tokens = tokens
+        self.shared = shared  # Tokens left in the tightest shared bucket when the lease was taken
+        self.limiting = limiting  # Index of that bucket among the rule's limits
+        self.expires_at = expires_at
+
+
+class LeaseCache:
+    """
+    Per-key token leases held by one app instance.
+
+    Leased tokens have already been deducted from the Redis bucket, so serving
+    requests from a lease can never admit more than the bucket allows across
+    all instances. The cost is the other way round: tokens leased by an
+    instance that stops receiving traffic for the key are lost until the lease
+    expires after ``ttl`` seconds, briefly under-admitting on other instances.
+    Expired leases are swept once the cache grows past ``max_entries``.
+    """
+
+    def __init__(self, ttl: float = 1.0, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._leases: Dict[str, Lease] = {}
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
+    def take(self, key: str, now: Optional[float] = None) -> Optional[Tuple[float, int]]:
+        """
+        Consumes one token from ``key``'s lease. Returns the estimated tokens
+        left (local lease plus the tightest shared bucket as last seen) and the
+        index of that bucket, or None if there is no live lease with a token to
+        spare.
+        """
+        lease = self._leases.get(key)
+        if lease is None:
+            return None
+        if lease.tokens <= 0 or lease.expires_at <= (time.monotonic() if now is None else now):
+            del self._leases[key]
+            return None
+        lease.tokens -= 1
+        return lease.tokens + lease.shared, lease.limiting
+
+    def grant(self, key: str, tokens: int, shared: float, limiting: int, now: Optional[float] = None):
+        """Stores a freshly leased batch of ``tokens`` for ``key``, replacing any older lease."""
+        now = time.monotonic() if now is None else now
+        if len(self._leases) >= self.max_entries:
+            self._sweep(now)
+        self._leases[key] = Lease(tokens, shared, limiting, now + self.ttl)
+
+    def _sweep(self, now: float):
+        expired = [key for key, lease in self._leases.items() if lease.tokens <= 0 or lease.expires_at <= now]
+        for key in expired:
+            del self._leases[key]
@@ -0,0 +1,177 @@
+import heapq
+import math
+import time
+from array import array
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .backend import Backend
+from .batching import Check, CheckResult
+from .rules import Limit
+
+# Absorbs float error so that e.g. 2.9999999 available tokens count as 3,
+# as in the Redis script.
+EPSILON = 1e-9
+
+
+class LocalBackend(Backend):
+    """
+    Buckets held in process memory, for single-node deployments that should
+    not pay a network hop per request. Checks behave exactly like the Redis
+    script's, for every algorithm, and so produce the same headers.
+
+    Bucket state lives in parallel arrays indexed by slot, three floats per
+    bucket (what they mean depends on the algorithm, as in the Redis keys),
+    plus the time at which the bucket would read as fresh again. Refill is
+    lazy: state only changes when a request takes tokens. Every bucket has
+    one entry in a heap ordered by that time, so buckets that went idle are
+    freed as time passes, and memory tracks the clients active within their
+    limits' periods rather than every client ever seen. Beyond
+    ``max_entries`` buckets, the ones closest to fresh are freed early, which
+    at worst gives those clients a full bucket a little sooner.
+    """
+
+    def __init__(self, max_entries: int = 1_000_000):
+        self.max_entries = max_entries
+        self._slots: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._a = array("d")
+        self._b = array("d")
+        self._c = array("d")
+        self._fresh_at = array("d")
+        self._logs: Dict[int, Deque[float]] = {}  # Admission times of sliding_log buckets
+        self._free: List[int] = []
+        self._heap: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    async def check(self, checks: List[Check], now: Optional[float] = None) -> List[CheckResult]:
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        results = []
+        for bucket_keys, limits, requested, partial in checks:
+            states = [self._peek(key, limit, now) for key, limit in zip(bucket_keys, limits)]
+            granted = requested
+            for available, _ in states:
+                if available < requested:
+                    granted = min(granted, max(0, available)) if partial else 0
+
+            left, limiting, retry_after = None, 0, 0
+            need = 1 if partial else requested
+            for i, (key, limit, (available, state)) in enumerate(zip(bucket_keys, limits, states)):
+                if granted > 0:
+                    self._commit(key, limit, state, granted, now)
+                elif available < need:
+                    seconds = self._wait(key, limit, state, available, need, now)
+                    retry_after = max(retry_after, math.ceil(seconds * 1000))
+                bucket_left = max(0, available - granted)
+                if left is None or bucket_left < left:
+                    left, limiting = bucket_left, i
+            results.append((granted, left, limiting, retry_after))
+        return results
+
+    def _peek(self, key: str, limit: Limit, now: float) -> Tuple[int, tuple]:
+        """The whole tokens the bucket has now, and the state ``_commit`` needs."""
+        slot = self._slots.get(key)
+        if slot is not None and self._fresh_at[slot] <= now:
+            slot = None  # Idle long enough to read as fresh, whether or not it was freed yet
+        capacity, refill_rate = limit.capacity, limit.refill_rate
+
+        if limit.algorithm == "gcra":
+            tat = now if slot is None else max(self._a[slot], now)
+            return math.floor(capacity - (tat - now) * refill_rate + EPSILON), (tat,)
+        if limit.algorithm == "sliding_window":
+            period = capacity / refill_rate
+            window = math.floor(now / period)
+            current = previous = 0.0
+            if slot is not None and self._a[slot] == window:
+                current, previous = self._b[slot], self._c[slot]
+            elif slot is not None and self._a[slot] == window - 1:
+                previous = self._b[slot]
+            weight = 1 - (now - window * period) / period
+            return math.floor(capacity - previous * weight - current + EPSILON), (window, current, previous)
+        if limit.algorithm == "sliding_log":
+            log = self._logs.get(slot) if slot is not None else None
+            if log is None:
+                return capacity, ()
+            while log and log[0] <= now - capacity / refill_rate:
+                log.popleft()
+            return capacity - len(log), ()
+
+        if slot is None:
+            tokens = float(capacity)
+        else:
+            tokens = min(capacity, self._a[slot] + max(0.0, now - self._b[slot]) * refill_rate)
+        return math.floor(tokens + EPSILON), (tokens,)
+
+    def _wait(self, key: str, limit: Limit, state: tuple, available: int, need: int, now: float) -> float:
+        """Seconds until the bucket, which ``_peek`` found short, has ``need`` tokens."""
+        capacity, refill_rate = limit.capacity, limit.refill_rate
+        if limit.algorithm == "gcra":
+            return state[0] - (capacity - need) / refill_rate - now
+        if limit.algorithm == "sliding_window":
+            period = capacity / refill_rate
+            window, current, previous = state
+            room = capacity - need - current
+            if room >= 0:
+                return window * period + (1 - room / previous) * period - now
+            return (window + 1) * period + (1 - (capacity - need) / current) * period - now
+        if limit.algorithm == "sliding_log":
+            return self._logs[self._slots[key]][need - available - 1] + capacity / refill_rate - now
+        return (need - state[0]) / refill_rate
+
+    def _commit(self, key: str, limit: Limit, state: tuple, granted: int, now: float):
+        capacity, refill_rate = limit.capacity, limit.refill_rate
+        if limit.algorithm == "gcra":
+            tat = state[0] + granted / refill_rate
+            slot = self._slot(key, tat)
+            self._a[slot] = tat
+        elif limit.algorithm == "sliding_window":
+            window, current, previous = state
+            slot = self._slot(key, now + 2 * capacity / refill_rate)
+            self._a[slot], self._b[slot], self._c[slot] = window, current + granted, previous
+        elif limit.algorithm == "sliding_log":
+            slot = self._slot(key, now + capacity / refill_rate)
+            self._logs.setdefault(slot, deque()).extend([now] * granted)
+        else:
+            tokens = state[0] - granted
+            slot = self._slot(key, now + (capacity - tokens) / refill_rate)
+            self._a[slot], self._b[slot] = tokens, now
+
+    def _slot(self, key: str, fresh_at: float) -> int:
+        """The slot of ``key``, allocated if needed, with its fresh time moved to ``fresh_at``."""
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._keys[slot] = key
+            else:
+                slot = len(self._keys)
+                self._keys.append(key)
+                for column in (self._a, self._b, self._c, self._fresh_at):
+                    column.append(0.0)
+            self._slots[key] = slot
+            heapq.heappush(self._heap, (fresh_at, slot))
+        self._fresh_at[slot] = fresh_at
+        return slot
+
+    def _expire(self, now: float):
+        """
+        Frees buckets that read as fresh by ``now``, and the ones closest to it
+        while there are more than ``max_entries``. A bucket's heap entry may be
+        earlier than its current fresh time, which only ever moves later; such
+        an entry is pushed back when it comes up, so each bucket has exactly one.
+        """
+        heap = self._heap
+        while heap and (heap[0][0] <= now or len(self._slots) > self.max_entries):
+            scheduled, slot = heap[0]
+            fresh_at = self._fresh_at[slot]
+            if fresh_at > scheduled:
+                heapq.heapreplace(heap, (fresh_at, slot))
+                continue
+            heapq.heappop(heap)
+            del self._slots[self._keys[slot]]
+            self._keys[slot] = None
+            self._logs.pop(slot, None)
+            self._free.append(slot)
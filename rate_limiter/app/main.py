@@ -2,47 +2,91 @@ import uvicorn
 import logging
 import redis.asyncio as redis
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
+from typing import Union
 from .logging_config import setup_logging
+from .backend import RedisBackend
 from .rate_limiter import DistributedTokenBucketMiddleware
 from .config import settings, rate_limit_rules
+from .local_backend import LocalBackend
+from .metrics import Metrics
+from .rules import compile_rules
 
 
 setup_logging()
 logger = logging.getLogger("app")
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Handles application startup and shutdown events."""
-    logger.info("Application startup...")
-    app.state.redis = redis.Redis(
+def create_backend() -> Union[RedisBackend, LocalBackend]:
+    """The rate limit backend chosen in the settings, with an explicitly sized Redis connection pool."""
+    if settings.BACKEND == "local":
+        return LocalBackend(max_entries=settings.LOCAL_MAX_ENTRIES)
+    pool = redis.BlockingConnectionPool(
         host=settings.REDIS_HOST,
         port=settings.REDIS_PORT,
         db=settings.REDIS_DB,
-        decode_responses=True
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=None,  # Waiting for a connection counts against the per-call timeout
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_MS / 1000,
+        socket_keepalive=True,
+        protocol=settings.REDIS_PROTOCOL,
     )
+    # Replies stay undecoded: the script answers with integers, so nothing needs decoding.
+    return RedisBackend.from_settings(redis.Redis(connection_pool=pool), settings)
+
+
+backend = create_backend()
+metrics = Metrics(top_k=settings.METRICS_TOP_K)
+if isinstance(backend, RedisBackend):
+    metrics.gauge("ratelimit_circuit_open", "1 while Redis calls are skipped after repeated failures.",
+                  lambda: float(backend.breaker.is_open))
+else:
+    metrics.gauge("ratelimit_local_buckets", "Live buckets held by the in-process backend.",
+                  lambda: float(len(backend)))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Handles application startup and shutdown events."""
+    logger.info("Application startup...")
+    if not isinstance(backend, RedisBackend):
+        logger.info("Using the in-process rate limit backend; Redis is not used.")
+        yield
+        logger.info("Application shutdown...")
+        return
+
+    app.state.redis = backend.client
     try:
-        await app.state.redis.ping()
+        await backend.breaker.call(backend.client.ping)
         logger.info(f"Successfully connected to Redis at {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+        # Loaded before the first request, so a burst at startup does not race to load it.
+        await backend.breaker.call(backend.load_script)
     except Exception as e:
-        logger.error(f"Could not connect to Redis: {e}")
+        logger.error(f"Could not connect to Redis: {e!r}")
 
     yield
 
     logger.info("Application shutdown...")
-    await app.state.redis.close()
+    backend.breaker.close()
+    await backend.client.aclose()
+    await backend.client.connection_pool.disconnect()
     logger.info("Redis connection closed.")
 
 
 app = FastAPI(title="Distributed Rate Limiter", lifespan=lifespan)
 
-default_rule = rate_limit_rules.get("default", {"capacity": 10, "refill_rate": 1})
-
 app.add_middleware(
     DistributedTokenBucketMiddleware,
-    capacity=default_rule["capacity"],
-    refill_rate=default_rule["refill_rate"]
+    rules=compile_rules(rate_limit_rules),
+    backend=backend,
+    batch_window=settings.BATCH_WINDOW_MS / 1000 if settings.BATCH_WINDOW_MS is not None else None,
+    batch_max_size=settings.BATCH_MAX_SIZE,
+    lease_fraction=settings.LEASE_FRACTION,
+    lease_ttl=settings.LEASE_TTL_MS / 1000,
+    fallback_share=settings.FALLBACK_SHARE,
+    metrics=metrics
 )
 
 
@@ -55,10 +99,16 @@ async def get_limited_endpoint():
 @app.get("/unlimited")
 async def get_unlimited_endpoint():
     """
-    This endpoint demonstrates how different rules could be applied,
-    though currently it shares the same default rate limit.
+    This endpoint is matched by the 'unlimited' rule, which has no limits,
+    so requests to it never reach Redis.
     """
-    return {"message": "This endpoint is also checked by the default rate limit."}
+    return {"message": "This endpoint is not rate-limited."}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Rate limiter metrics in the Prometheus text format, exempted from limits by the 'metrics' rule."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
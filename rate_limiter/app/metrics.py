@@ -0,0 +1,217 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+# Quantiles reported for the check latency, next to the histogram buckets.
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    """
+    An HDR-style histogram of durations, in whole microseconds.
+
+    Values below ``2 * 2**sub_bucket_bits`` get a bucket each; above that,
+    every power of two is split into ``2**sub_bucket_bits`` equal buckets, so
+    any value is known to within 1 part in ``2**sub_bucket_bits`` (about 3% by
+    default) with a few hundred counters up to ``max_seconds``. Recording a
+    value is a couple of integer operations and a list increment.
+
+    Buckets include their upper edge and exclude their lower one, as
+    Prometheus ``le`` bounds do: a value of exactly 64 us is counted with the
+    values up to 64 us, not with those above it.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 5, max_seconds: float = 60.0):
+        self.sub_bucket_bits = sub_bucket_bits
+        self._half = 1 << sub_bucket_bits
+        self.max_micros = int(max_seconds * 1e6)
+        self.counts = [0] * (self._index(self.max_micros) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def _index(self, micros: int) -> int:
+        if micros < 2 * self._half:
+            return micros
+        shift = micros.bit_length() - self.sub_bucket_bits - 1
+        return (shift + 1) * self._half + (micros >> shift) - self._half
+
+    def _upper_bound(self, index: int) -> int:
+        """The largest value, in microseconds, that falls in bucket ``index``."""
+        if index < 2 * self._half:
+            return index + 1
+        shift = index // self._half - 1
+        return (index % self._half + self._half + 1) << shift
+
+    def record(self, seconds: float):
+        # Whole microseconds, rounded up (through whole nanoseconds, so 64e-6 s
+        # is 64 us despite float error), minus one: bucket ``_index(micros)``
+        # then holds the values in (micros, micros + 1] us.
+        micros = max(-(-round(seconds * 1e9) // 1000) - 1, 0)
+        self.counts[self._index(micros if micros < self.max_micros else self.max_micros)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """The value, in seconds, below which a ``q`` fraction of the recorded values fall."""
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return self._upper_bound(index) / 1e6
+        return self.max_micros / 1e6
+
+    def cumulative(self, bounds_micros: List[int]) -> List[int]:
+        """
+        The number of values at or below each of the ascending ``bounds_micros``.
+
+        Only buckets lying wholly at or below a bound count towards it, so a
+        bound between bucket edges undercounts by at most one bucket; powers of
+        two are always bucket edges.
+        """
+        result, seen, index = [], 0, 0
+        for bound in bounds_micros:
+            last = min(self._index(max(bound - 1, 0)), len(self.counts) - 1)
+            if self._upper_bound(last) > bound:
+                last -= 1
+            while index <= last:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+class SpaceSaving:
+    """
+    The (approximately) ``k`` most frequent keys of a stream, in O(k) memory.
+
+    This is the Space-Saving algorithm: a new key, once ``k`` are tracked,
+    replaces one with the lowest count and inherits that count plus one, so
+    counts can overestimate by at most the replaced count (kept as the
+    key's error) but never underestimate, and every key seen more than
+    ``total / k`` times is tracked. Keys are grouped by count, so adding one
+    is O(1) however skewed the stream.
+    """
+
+    def __init__(self, k: int = 20):
+        self.k = k
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._by_count: Dict[int, Dict[str, None]] = defaultdict(dict)
+        self._min = 0
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, key: str):
+        count = self._counts.get(key)
+        if count is None:
+            if len(self._counts) < self.k:
+                count, self._errors[key] = 0, 0
+                self._min = 0
+            else:
+                evicted = next(iter(self._by_count[self._min]))
+                self._remove(evicted, self._min)
+                count = self._min
+                del self._counts[evicted], self._errors[evicted]
+                self._errors[key] = count
+        else:
+            self._remove(key, count)
+        self._counts[key] = count + 1
+        self._by_count[count + 1][key] = None
+        if not self._min or not self._by_count.get(self._min):
+            self._min = count + 1
+
+    def _remove(self, key: str, count: int):
+        keys = self._by_count[count]
+        del keys[key]
+        if not keys:
+            del self._by_count[count]
+
+    def top(self, n: int = None) -> List[Tuple[str, int, int]]:
+        """(key, count, maximum overestimate) for the ``n`` highest counts, highest first."""
+        ranked = sorted(self._counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [(key, count, self._errors[key]) for key, count in ranked]
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Rate limiter counters, rendered in the Prometheus text format.
+
+    The request path only increments: a counter per rule and decision, the
+    check latency histogram, and the top throttled clients. Everything else
+    is computed when ``/metrics`` is scraped.
+    """
+
+    # Histogram bucket bounds: powers of two from 16 us to about 1 s, which
+    # are upper edges of HDR histogram buckets, so each count is exact.
+    BUCKETS_MICROS = [1 << exponent for exponent in range(4, 21)]
+
+    def __init__(self, top_k: int = 20):
+        self.decisions: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.fallback_checks = 0
+        self.check_errors = 0
+        self.check_latency = LatencyHistogram()
+        self.throttled_clients = SpaceSaving(top_k)
+        self._gauges: List[Tuple[str, str, Callable[[], float]]] = []
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        """Adds a gauge read when the metrics are rendered."""
+        self._gauges.append((name, help_text, read))
+
+    def render(self) -> str:
+        lines = [
+            "# HELP ratelimit_requests_total Requests seen by the rate limiter, by rule and decision.",
+            "# TYPE ratelimit_requests_total counter",
+        ]
+        for (rule, decision), count in sorted(self.decisions.items()):
+            lines.append(f'ratelimit_requests_total{{rule="{_label(rule)}",decision="{decision}"}} {count}')
+        lines += [
+            "# HELP ratelimit_fallback_checks_total Checks answered in-process because the backend was unavailable.",
+            "# TYPE ratelimit_fallback_checks_total counter",
+            f"ratelimit_fallback_checks_total {self.fallback_checks}",
+            "# HELP ratelimit_check_errors_total Backend checks that failed or timed out.",
+            "# TYPE ratelimit_check_errors_total counter",
+            f"ratelimit_check_errors_total {self.check_errors}",
+        ]
+
+        histogram = self.check_latency
+        lines += [
+            "# HELP ratelimit_check_duration_seconds Time to check a request's limits.",
+            "# TYPE ratelimit_check_duration_seconds histogram",
+        ]
+        for bound, count in zip(self.BUCKETS_MICROS, histogram.cumulative(self.BUCKETS_MICROS)):
+            lines.append(f'ratelimit_check_duration_seconds_bucket{{le="{bound / 1e6:g}"}} {count}')
+        lines += [
+            f'ratelimit_check_duration_seconds_bucket{{le="+Inf"}} {histogram.total}',
+            f"ratelimit_check_duration_seconds_sum {histogram.sum:.6f}",
+            f"ratelimit_check_duration_seconds_count {histogram.total}",
+            "# HELP ratelimit_check_duration_quantile_seconds Check latency quantiles, within about 3%.",
+            "# TYPE ratelimit_check_duration_quantile_seconds gauge",
+        ]
+        for q in QUANTILES:
+            lines.append(f'ratelimit_check_duration_quantile_seconds{{quantile="{q:g}"}} {histogram.quantile(q):g}')
+
+        lines += [
+            "# HELP ratelimit_throttled_client_requests Throttled requests of the most throttled clients "
+            "(an overestimate by at most the error gauge).",
+            "# TYPE ratelimit_throttled_client_requests gauge",
+        ]
+        top = self.throttled_clients.top()
+        for client, count, _ in top:
+            lines.append(f'ratelimit_throttled_client_requests{{client="{_label(client)}"}} {count}')
+        lines += [
+            "# HELP ratelimit_throttled_client_requests_error Maximum overestimate of the count above.",
+            "# TYPE ratelimit_throttled_client_requests_error gauge",
+        ]
+        for client, _, error in top:
+            lines.append(f'ratelimit_throttled_client_requests_error{{client="{_label(client)}"}} {error}')
+
+        for name, help_text, read in self._gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read():g}"]
+        return "\n".join(lines) + "\n"
@@ -1,120 +1,244 @@
-import time
+import asyncio
 import logging
+import math
+import time
 import redis.asyncio as redis
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from typing import Callable
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Dict, Optional, Tuple
+from .backend import Backend, RedisBackend
+from .batching import Check, CheckBatcher, CheckResult
+from .circuit_breaker import CircuitOpenError
+from .config import settings
+from .fallback import LocalBuckets
+from .leasing import LeaseCache
+from .metrics import Metrics
+from .rules import Limit, Rule, RuleMatcher
 
 logger = logging.getLogger("app")
 
 
-class DistributedTokenBucketMiddleware(BaseHTTPMiddleware):
+class DistributedTokenBucketMiddleware:
     """
     A distributed token bucket rate limiter middleware for FastAPI using Redis.
     This middleware uses a Lua script to ensure atomic operations on token
     buckets stored in Redis, making it safe for distributed environments.
+    Single-node deployments can keep the buckets in-process instead by
+    passing a ``LocalBackend``.
+
+    It is a plain ASGI middleware rather than a ``BaseHTTPMiddleware``: allowed
+    requests go straight to the app with the ``X-RateLimit-*`` headers added to
+    its ``http.response.start`` message, so responses (including streaming
+    ones) pass through untouched, and throttled requests get a 429 without the
+    app being called.
+
+    Redis calls go through the ``RedisBackend``'s circuit breaker. When a call
+    fails or times out, or while the circuit is open, the request is checked against
+    in-process ``LocalBuckets`` instead, so a sick Redis costs neither the
+    limits nor its timeout on every request.
+
+    Decisions are counted in ``metrics`` rather than logged, so the request
+    path does no I/O; see ``app.metrics``.
     """
-    LUA_SCRIPT = """
-    local key = KEYS[1]
-    local capacity = tonumber(ARGV[1])
-    local refill_rate = tonumber(ARGV[2])
-    local current_time = tonumber(ARGV[3])
-    local requested = tonumber(ARGV[4])
-
-    local data = redis.call('HMGET', key, 'tokens', 'timestamp')
-    local tokens = tonumber(data[1])
-    local timestamp = tonumber(data[2])
-
-    if tokens == nil then
-        tokens = capacity
-        timestamp = current_time
-    end
-
-    -- Refill tokens based on elapsed time
-    local delta = math.max(0, current_time - timestamp)
-    -- IMPORTANT: Use math.floor to only add whole tokens and avoid float issues
-    local refill = math.floor(delta * refill_rate)
-
-    tokens = math.min(capacity, tokens + refill)
-
-    local allowed = 0
-    if tokens >= requested then
-        tokens = tokens - requested
-        allowed = 1
-    end
-
-    -- Update timestamp only when a token is successfully consumed.
-    -- This prevents many small, non-refilling time deltas from causing writes.
-    if allowed == 1 then
-        redis.call('HMSET', key, 'tokens', tokens, 'timestamp', current_time)
-    else
-        -- If not allowed, only update the token count which might have refilled.
-        redis.call('HSET', key, 'tokens', tokens)
-    end
-
-    redis.call('EXPIRE', key, 3600)
-    return {allowed, tokens}
-    """
-
     def __init__(
             self,
             app: ASGIApp,
-            capacity: int,
-            refill_rate: float,
+            rules: Optional[RuleMatcher] = None,
+            backend: Optional[Backend] = None,
+            capacity: Optional[int] = None,
+            refill_rate: Optional[float] = None,
+            algorithm: str = "token_bucket",
+            batch_window: Optional[float] = None,
+            batch_max_size: int = 100,
+            lease_fraction: Optional[float] = None,
+            lease_ttl: float = 1.0,
+            fallback_share: float = 1.0,
+            metrics: Optional[Metrics] = None,
     ):
-        super().__init__(app)
-        self.capacity = capacity
-        self.refill_rate = refill_rate
-        self._script_sha = None
-
-    async def _load_script(self, redis_client: redis.Redis):
-        """Loads the Lua script into Redis and stores its SHA hash."""
-        if self._script_sha is None:
-            self._script_sha = await redis_client.script_load(self.LUA_SCRIPT)
-            logger.info(f"Loaded rate limiter Lua script into Redis (SHA: {self._script_sha})")
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Get the redis client from the application state AT REQUEST TIME.
+        """
+        ``rules`` decides which limits apply to each request (see ``app.rules``);
+        without it, a single ``capacity``/``refill_rate`` limit enforced with
+        ``algorithm`` applies to all.
+
+        ``backend`` holds the buckets; by default a ``RedisBackend`` is built
+        around ``app.state.redis`` on the first request, with the Redis timeout
+        and circuit breaker from the settings (``REDIS_TIMEOUT_MS`` and the
+        ``BREAKER_*`` options); pass a ``RedisBackend`` to configure them here.
+        Batching and leasing only matter for the Redis backend.
+
+        With ``batch_window`` set (in seconds), checks from concurrent requests
+        are coalesced by a ``CheckBatcher`` into one multi-key script call
+        instead of one EVALSHA round trip per request.
+
+        With ``lease_fraction`` set, the instance takes that fraction of a
+        rule's smallest capacity from a client's buckets at once and serves the
+        following requests from this local lease, going back to Redis only
+        when it is used up or older than ``lease_ttl`` seconds.
+
+        While the backend's circuit is open, each instance enforces
+        ``fallback_share`` of every limit in-process.
+
+        ``metrics`` receives the decision counts, check latencies and throttled
+        clients; by default the middleware keeps its own.
+        """
+        self.app = app
+        if rules is None:
+            rules = RuleMatcher([], Rule("default", limits=[Limit(capacity, refill_rate, algorithm)]))
+        self.rules = rules
+        self.backend = backend
+        self.batch_window = batch_window
+        self.batch_max_size = batch_max_size
+        self._batcher: Optional[CheckBatcher] = None
+        self.lease_fraction = lease_fraction
+        self._leases = LeaseCache(ttl=lease_ttl)
+        self._lease_requests: Dict[str, asyncio.Future] = {}
+        self._fallback = LocalBuckets(share=fallback_share)
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    def _backend_for(self, scope: Scope) -> Optional[Backend]:
+        """The configured backend, or Redis through the app's client, fetched at request time."""
+        if self.backend is None:
+            try:
+                redis_client: redis.Redis = scope["app"].state.redis
+            except (KeyError, AttributeError):
+                return None
+            self.backend = RedisBackend.from_settings(redis_client, settings)
+        return self.backend
+
+    async def _take(self, backend: Backend, check: Check) -> CheckResult:
+        """Takes tokens from a request's buckets, through the batcher when batching is on."""
+        if self.batch_window is None:
+            return (await backend.check([check]))[0]
+        if self._batcher is None:
+            self._batcher = CheckBatcher(
+                lambda checks: backend.check(checks),
+                window=self.batch_window,
+                max_size=self.batch_max_size,
+            )
+        return await self._batcher.submit(check)
+
+    async def _check_leased(self, backend: Backend, lease_key: str, bucket_keys: Tuple[str, ...],
+                            rule: Rule) -> CheckResult:
+        """
+        Serves the check from the local lease, renewing it when needed. Concurrent
+        requests for the same key share one renewal instead of each leasing tokens.
+        """
+        while True:
+            leased = self._leases.take(lease_key)
+            if leased is not None:
+                return 1, leased[0], leased[1], 0
+            renewal = self._lease_requests.get(lease_key)
+            if renewal is None:
+                break
+            result = await asyncio.shield(renewal)
+            if not result[0]:
+                return result
+
+        renewal = asyncio.get_running_loop().create_future()
+        self._lease_requests[lease_key] = renewal
+        lease_size = max(1, int(min(limit.capacity for limit in rule.limits) * self.lease_fraction))
+        try:
+            granted, tokens_left, limiting, retry_after = await self._take(
+                backend, (bucket_keys, rule.limits, lease_size, True)
+            )
+            if granted:
+                # This request uses one of the leased tokens right away.
+                self._leases.grant(lease_key, granted - 1, tokens_left, limiting)
+            renewal.set_result((granted, tokens_left, limiting, retry_after))
+        except Exception as e:
+            renewal.set_exception(e)
+            renewal.exception()  # Retrieved here; waiters, if any, still get it raised
+            raise
+        finally:
+            del self._lease_requests[lease_key]
+        return (1, granted - 1 + tokens_left, limiting, 0) if granted else (0, tokens_left, limiting, retry_after)
+
+    async def _check(self, backend: Backend, rule: Rule, subject: str) -> CheckResult:
+        """
+        Consumes one token for a request from every bucket of ``rule`` for
+        ``subject``, in the backend or, if it cannot be reached, in-process.
+        """
+        bucket_keys = tuple(f"rate-limit:{bucket}:{subject}" for bucket in rule.buckets)
         try:
-            redis_client: redis.Redis = request.app.state.redis
-        except AttributeError:
+            if self.lease_fraction:
+                return await self._check_leased(backend, f"{rule.name}:{subject}", bucket_keys, rule)
+            return await self._take(backend, (bucket_keys, rule.limits, 1, False))
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                self.metrics.check_errors += 1
+                logger.error(f"Error during rate limiting check: {e!r}. Using the in-process limiter.")
+            self.metrics.fallback_checks += 1
+            return self._fallback.take(bucket_keys, rule.limits)
+
+    @staticmethod
+    def _header(scope: Scope, header: bytes) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == header:
+                return value.decode("latin-1")
+        return None
+
+    @classmethod
+    def _client_id(cls, scope: Scope) -> str:
+        """The client's address, preferring the X-Forwarded-For header set by a proxy."""
+        forwarded_for = cls._header(scope, b"x-forwarded-for")
+        if forwarded_for is not None:
+            return forwarded_for
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        backend = self._backend_for(scope)
+        if backend is None:
             logger.error("Redis client not found in app state. Rate limiting is disabled.")
-            return await call_next(request)
-        await self._load_script(redis_client)
-
-        # Prioritize the X-Forwarded-For header to identify the client
-        client_id = request.headers.get("x-forwarded-for", request.client.host)
-        key = f"rate-limit:{client_id}"
-
+            await self.app(scope, receive, send)
+            return
+
+        client_id = self._client_id(scope)
+        api_key = self._header(scope, b"x-api-key")
+        tier = self.rules.tier_of(api_key)
+        rule = self.rules.match(scope["method"], scope["path"], tier)
+        if rule is None or not rule.limits:
+            await self.app(scope, receive, send)
+            return
+        # Known API keys get their own buckets wherever they call from.
+        subject = f"key:{api_key}" if tier is not None else client_id
+
+        metrics = self.metrics
+        start = time.perf_counter()
         try:
-            result = await redis_client.evalsha(
-                self._script_sha,
-                1,  # Number of keys
-                key,
-                self.capacity,
-                self.refill_rate,
-                time.time(),
-                1,  # Consume 1 token per request
-            )
-
-            allowed, tokens_left = result[0], result[1]
-
-            logger.info(f"Client '{client_id}': Allowed={bool(allowed)}, Tokens Left={float(tokens_left):.2f}")
-
-            if bool(allowed):
-                response = await call_next(request)
-                response.headers["X-RateLimit-Remaining"] = str(round(tokens_left))
-                response.headers["X-RateLimit-Limit"] = str(self.capacity)
-                return response
-            else:
-                logger.warning(f"Rate limit exceeded for client '{client_id}'. Request blocked.")
-                return Response(
-                    content="Too Many Requests",
-                    status_code=429,
-                    headers={"Retry-After": str(int(1 / self.refill_rate))}
-                )
+            allowed, tokens_left, limiting, retry_after = await self._check(backend, rule, subject)
         except Exception as e:
+            metrics.decisions[rule.name, "error"] += 1
             logger.error(f"Error during rate limiting check: {e}. Allowing request to proceed.")
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
+        metrics.check_latency.record(time.perf_counter() - start)
+
+        limit = rule.limits[limiting]
+        if not allowed:
+            metrics.decisions[rule.name, "throttled"] += 1
+            metrics.throttled_clients.add(subject)
+            response = Response(
+                content="Too Many Requests",
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(retry_after / 1000)))}
+            )
+            await response(scope, receive, send)
+            return
+
+        metrics.decisions[rule.name, "allowed"] += 1
+        rate_limit_headers = [
+            (b"x-ratelimit-remaining", str(round(tokens_left)).encode("latin-1")),
+            (b"x-ratelimit-limit", str(limit.capacity).encode("latin-1")),
+        ]
+
+        async def send_with_rate_limit_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *rate_limit_headers]
+            await send(message)
 
+        await self.app(scope, receive, send_with_rate_limit_headers)
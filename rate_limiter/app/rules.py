@@ -0,0 +1,252 @@
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger("app")
+
+# Seconds per unit in the "<requests>/<unit>" limit shorthand.
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Rate limiting algorithms, as implemented by the limiter's Lua script:
+#   token_bucket    a bucket of ``capacity`` tokens refilled continuously.
+#   gcra            the generic cell rate algorithm; the same admissions as a
+#                   token bucket, stored as one theoretical arrival time.
+#   sliding_window  ``capacity`` requests per ``capacity / refill_rate``
+#                   seconds, estimated from the current and previous fixed
+#                   window counts.
+#   sliding_log     the same window, exact, from a log of admission times.
+ALGORITHMS = ("token_bucket", "gcra", "sliding_window", "sliding_log")
+
+
+class Limit(NamedTuple):
+    """
+    Up to ``capacity`` requests, replenished at ``refill_rate`` per second, so
+    a full allowance is restored every ``capacity / refill_rate`` seconds.
+    """
+    capacity: int
+    refill_rate: float
+    algorithm: str = "token_bucket"
+
+    @property
+    def period(self) -> float:
+        return self.capacity / self.refill_rate
+
+
+def parse_limit(spec: Any, algorithm: str = "token_bucket") -> Limit:
+    """
+    Parses a limit given either as ``{"capacity": 20, "refill_rate": 5}`` or
+    as a ``"1000/h"`` shorthand, which means a bucket of 1000 requests that
+    refills completely over one hour. The dict form may set its own
+    ``algorithm``, overriding the given one. Raises ``ValueError`` if it is
+    invalid.
+    """
+    if isinstance(spec, str):
+        count, _, unit = spec.partition("/")
+        if unit not in PERIODS or not count.strip().isdigit():
+            raise ValueError(f"Invalid limit '{spec}'; expected '<requests>/<s|m|h|d>'.")
+        capacity = int(count)
+        limit = Limit(capacity, capacity / PERIODS[unit], algorithm)
+    else:
+        limit = Limit(int(spec["capacity"]), float(spec["refill_rate"]), spec.get("algorithm", algorithm))
+    if limit.capacity <= 0 or limit.refill_rate <= 0:
+        raise ValueError(f"Invalid limit {spec!r}; capacity and refill rate must be positive.")
+    if limit.algorithm not in ALGORITHMS:
+        raise ValueError(f"Invalid limit {spec!r}; algorithm must be one of {', '.join(ALGORITHMS)}.")
+    return limit
+
+
+class Rule:
+    """
+    A named set of limits and the requests they apply to.
+
+    ``path`` is a pattern of ``/``-separated segments where ``*`` matches one
+    segment and a trailing ``**`` matches any remainder, including none.
+    ``methods`` and ``tiers`` restrict the rule to those HTTP methods and API
+    key tiers; empty means any. Every limit in ``limits`` must admit a request
+    for it to pass; a rule without limits leaves its requests unlimited.
+    ``buckets`` names the bucket of each limit, ``"<rule name>:<index>"``, so a
+    limit keeps its bucket when it is checked together with other rules'.
+    """
+    __slots__ = ("name", "path", "segments", "methods", "tiers", "limits", "buckets", "specificity")
+
+    def __init__(self, name: str, path: str = "/**", methods: Sequence[str] = (), tiers: Sequence[str] = (),
+                 limits: Sequence[Limit] = ()):
+        self.name = name
+        self.path = path
+        self.segments = _split(path)
+        if "**" in self.segments[:-1]:
+            raise ValueError(f"Rule '{name}': '**' may only end a path pattern, got '{path}'.")
+        self.methods = frozenset(method.upper() for method in methods)
+        self.tiers = frozenset(tiers)
+        self.limits = tuple(limits)
+        self.buckets = tuple(f"{name}:{i}" for i in range(len(self.limits)))
+        # Literal segments beat '*', which beats '**'; longer patterns beat their
+        # prefixes; then tier- and method-specific rules beat generic ones.
+        weights = tuple(0 if segment == "**" else 1 if segment == "*" else 2 for segment in self.segments)
+        self.specificity = (weights, bool(self.tiers), bool(self.methods))
+
+    def applies_to(self, method: str, tier: Optional[str]) -> bool:
+        return (not self.methods or method in self.methods) and (not self.tiers or tier in self.tiers)
+
+    def overrides(self, other: "Rule") -> bool:
+        """
+        Whether this rule replaces ``other`` when both apply: it has the same
+        path, is restricted by method and by tier wherever ``other`` is, and is
+        more restricted in at least one, like a tier's own limits for a route.
+        """
+        mine = (bool(self.methods), bool(self.tiers))
+        theirs = (bool(other.methods), bool(other.tiers))
+        return self.segments == other.segments and mine != theirs and all(
+            restricted or not restricted_other for restricted, restricted_other in zip(mine, theirs)
+        )
+
+    @classmethod
+    def combined(cls, rules: Sequence["Rule"]) -> "Rule":
+        """One rule enforcing the limits of all ``rules`` together, each in its own rule's bucket."""
+        if len(rules) == 1:
+            return rules[0]
+        rule = cls("+".join(rule.name for rule in rules), rules[0].path,
+                   limits=[limit for rule in rules for limit in rule.limits])
+        rule.buckets = tuple(bucket for rule in rules for bucket in rule.buckets)
+        return rule
+
+    def __repr__(self) -> str:
+        return f"Rule({self.name!r}, path={self.path!r}, limits={list(self.limits)})"
+
+
+def _split(path: str) -> List[str]:
+    return [segment for segment in path.split("/") if segment]
+
+
+class _Node:
+    __slots__ = ("children", "star", "rules", "rest_rules")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.star: Optional["_Node"] = None
+        self.rules: List[Rule] = []       # Patterns ending at this node
+        self.rest_rules: List[Rule] = []  # Patterns ending in '**' at this node
+
+
+class RuleMatcher:
+    """
+    Rules compiled into a path segment trie.
+
+    ``match`` walks the trie once along the request path, collecting the rules
+    whose pattern matches, and resolves the ones that apply to the method and
+    tier with ``resolve_rules``. Results are memoized per
+    (method, path, tier) in a bounded dict, so steady traffic to the same
+    routes costs a single dict lookup.
+    """
+
+    def __init__(self, rules: Sequence[Rule], default: Optional[Rule] = None,
+                 api_keys: Optional[Dict[str, str]] = None, cache_size: int = 10_000):
+        self.rules = list(rules)
+        self.default = default
+        self.api_keys = dict(api_keys or {})
+        self.cache_size = cache_size
+        self._cache: Dict[Tuple[str, str, Optional[str]], Optional[Rule]] = {}
+        self._root = _Node()
+        for rule in self.rules:
+            node = self._root
+            for segment in rule.segments:
+                if segment == "**":
+                    break
+                if segment == "*":
+                    node.star = node.star or _Node()
+                    node = node.star
+                else:
+                    node = node.children.setdefault(segment, _Node())
+            (node.rest_rules if rule.segments[-1:] == ["**"] else node.rules).append(rule)
+
+    def tier_of(self, api_key: Optional[str]) -> Optional[str]:
+        """The tier of a known API key, or None for anonymous clients and unknown keys."""
+        return self.api_keys.get(api_key) if api_key else None
+
+    def match(self, method: str, path: str, tier: Optional[str] = None) -> Optional[Rule]:
+        cache_key = (method, path, tier)
+        try:
+            return self._cache[cache_key]
+        except KeyError:
+            pass
+
+        best = resolve_rules([rule for rule in self._candidates(_split(path)) if rule.applies_to(method, tier)],
+                             self.default)
+
+        if self.cache_size:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()  # Paths with ids in them must not grow the cache without bound
+            self._cache[cache_key] = best
+        return best
+
+    def _candidates(self, segments: List[str]) -> List[Rule]:
+        found: List[Rule] = []
+        stack = [(self._root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            found.extend(node.rest_rules)
+            if depth == len(segments):
+                found.extend(node.rules)
+                continue
+            child = node.children.get(segments[depth])
+            if child is not None:
+                stack.append((child, depth + 1))
+            if node.star is not None:
+                stack.append((node.star, depth + 1))
+        return found
+
+
+def resolve_rules(matching: List[Rule], default: Optional[Rule]) -> Optional[Rule]:
+    """
+    The rule governing a request, given the rules that match and apply to it.
+
+    Every matching rule's limits are enforced together, in one check, except
+    for rules overridden by a more restricted rule for the same path (see
+    ``Rule.overrides``). A matching rule without limits exempts the request
+    from all of them. ``default`` applies when no rule matches.
+    """
+    if not matching:
+        return default
+    matching = sorted(matching, key=lambda rule: rule.specificity, reverse=True)
+    for rule in matching:
+        if not rule.limits:
+            return rule
+    return Rule.combined([
+        rule for rule in matching if not any(other.overrides(rule) for other in matching)
+    ])
+
+
+def compile_rules(config: Dict[str, Any]) -> RuleMatcher:
+    """
+    Compiles the ``rate_limits.json`` contents into a ``RuleMatcher``.
+
+    Every entry except ``api_keys`` is a rule named by its key. A rule has an
+    optional ``path`` (default: every path), ``methods`` and ``tiers``, and
+    either a ``limits`` list or, as in the original format, a single
+    ``capacity``/``refill_rate`` pair. Its ``algorithm`` (default:
+    ``token_bucket``, see ``ALGORITHMS``) applies to all of its limits that do
+    not choose their own. The ``default`` rule, if its path is not
+    given, only applies when no other rule matches. ``api_keys`` maps API keys
+    (sent in the ``X-API-Key`` header) to tier names. Raises ``ValueError`` on
+    an invalid rule.
+    """
+    rules, default = [], None
+    for name, spec in config.items():
+        if name == "api_keys":
+            continue
+        try:
+            algorithm = spec.get("algorithm", "token_bucket")
+            if "limits" in spec:
+                limits = [parse_limit(limit, algorithm) for limit in spec["limits"]]
+            else:
+                limits = [parse_limit(spec, algorithm)]
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Rule '{name}' has an invalid limit: {e}") from e
+        rule = Rule(name, spec.get("path", "/**"), spec.get("methods", ()), spec.get("tiers", ()), limits)
+        if name == "default" and "path" not in spec:
+            default = rule
+        else:
+            rules.append(rule)
+
+    matcher = RuleMatcher(rules, default, config.get("api_keys"))
+    logger.info(f"Compiled {len(rules) + (default is not None)} rate limit rule(s).")
+    return matcher
@@ -0,0 +1,141 @@
+"""
+Redis cost and burst accuracy of each rate limiting algorithm.
+
+One client sends bursts of ``--burst`` requests, spread over 10 ms, at random
+intervals averaging half a period, against a limit of ``--capacity`` requests
+per ``--period`` seconds. Time is simulated, so the run is deterministic and
+does not depend on the speed of the Redis stand-in (it runs well ahead of the
+wall clock, so no key expires early). For each algorithm it reports:
+
+  * reads/req, writes/req  Redis commands the script runs per request
+  * bytes/key              a bucket key's memory with a full period's requests
+  * peak                   most requests admitted in any ``--period`` seconds,
+                           relative to ``--capacity`` (above 1.0 lets bursts
+                           exceed the nominal rate)
+  * throughput             admitted requests relative to capacity per period
+
+Memory comes from ``MEMORY USAGE`` on a real server given with
+``--redis-url``. The fakeredis stand-in has no such command, so there it is
+the stored key, field and value bytes, which leave out the server's per-key
+overhead. Run from the ``rate_limiter`` directory:
+
+    python -m benchmarks.bench_algorithms --periods 30 --burst 20
+    python -m benchmarks.bench_algorithms --redis-url redis://localhost:6379/15
+"""
+import argparse
+import asyncio
+import bisect
+import logging
+import random
+from typing import List
+
+import redis.asyncio as redis
+
+from app.backend import RedisBackend
+from app.rules import ALGORITHMS, Limit
+from benchmarks.redis_standin import RedisStandIn
+
+WRITES = {"SET", "HSET", "PEXPIRE", "ZADD", "ZREMRANGEBYSCORE"}
+
+# Counts every command the script runs in a hash, without counting itself.
+COUNTED = """
+local function counted_call(command, ...)
+    redis.pcall('HINCRBY', 'bench:ops', string.upper(command), 1)
+    return redis.call(command, ...)
+end
+"""
+
+
+class CountingBackend(RedisBackend):
+    LUA_SCRIPT = COUNTED + RedisBackend.LUA_SCRIPT.replace("redis.call(", "counted_call(")
+
+
+def _arrivals(args) -> List[float]:
+    rng = random.Random(args.seed)
+    times, t = [], 0.0
+    while t < args.periods * args.period:
+        times += sorted(t + rng.uniform(0, 0.01) for _ in range(args.burst))
+        t += rng.expovariate(2 / args.period)
+    return times
+
+
+def _peak(admitted: List[float], period: float) -> int:
+    return max((bisect.bisect_left(admitted, t + period) - i for i, t in enumerate(admitted)), default=0)
+
+
+async def _key_bytes(client: redis.Redis, key: str, exact: bool) -> int:
+    if exact:
+        return await client.memory_usage(key)
+    kind = (await client.type(key)).decode()
+    if kind == "string":
+        size = await client.strlen(key)
+    elif kind == "hash":
+        size = sum(len(field) + len(value) for field, value in (await client.hgetall(key)).items())
+    else:
+        size = sum(len(member) + 8 for member, _ in await client.zrange(key, 0, -1, withscores=True))
+    return len(key) + size
+
+
+async def measure(client: redis.Redis, backend: RedisBackend, algorithm: str, arrivals: List[float], args):
+    limit = Limit(args.capacity, args.capacity / args.period, algorithm)
+    key = f"bench:{algorithm}"
+    await client.delete(key, "bench:ops")
+
+    admitted = []
+    for now in arrivals:
+        [(granted, _, _, _)] = await backend.check([((key,), (limit,), 1, False)], now=now)
+        if granted:
+            admitted.append(now)
+    ops = {command.decode(): int(count) for command, count in (await client.hgetall("bench:ops")).items()}
+    writes = sum(count for command, count in ops.items() if command in WRITES)
+
+    # A full period's worth of requests, as a busy client's key holds.
+    memory_key = f"bench:memory:{algorithm}"
+    await client.delete(memory_key)
+    await backend.check([((memory_key,), (limit,), args.capacity, False)], now=arrivals[-1])
+
+    return {
+        "reads": (sum(ops.values()) - writes) / len(arrivals),
+        "writes": writes / len(arrivals),
+        "bytes": await _key_bytes(client, memory_key, exact=args.redis_url is not None),
+        "peak": _peak(admitted, args.period) / args.capacity,
+        "throughput": len(admitted) / (args.capacity * args.periods),
+    }
+
+
+async def run(args):
+    standin = None
+    if args.redis_url is None:
+        standin = RedisStandIn(latency_ms=0).start()
+    client = redis.Redis.from_url(args.redis_url or standin.url)
+    backend = CountingBackend(client)
+    arrivals = _arrivals(args)
+    print(
+        f"capacity={args.capacity} period={args.period:g}s burst={args.burst} "
+        f"periods={args.periods} requests={len(arrivals):,}"
+    )
+    print(f"  {'algorithm':<15} {'reads/req':>10} {'writes/req':>11} {'bytes/key':>10} {'peak':>6} {'throughput':>11}")
+    try:
+        for algorithm in ALGORITHMS:
+            result = await measure(client, backend, algorithm, arrivals, args)
+            print(
+                f"  {algorithm:<15} {result['reads']:>10.2f} {result['writes']:>11.2f} {result['bytes']:>10,} "
+                f"{result['peak']:>6.2f} {result['throughput']:>11.3f}"
+            )
+    finally:
+        await client.aclose()
+        if standin is not None:
+            standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capacity", type=int, default=10)
+    parser.add_argument("--period", type=float, default=1.0)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--periods", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--redis-url", help="Use this Redis server instead of an in-process stand-in.")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
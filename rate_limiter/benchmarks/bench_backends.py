@@ -0,0 +1,107 @@
+"""
+Check latency of the in-process backend versus Redis with many distinct clients.
+
+Both backends first get one request from each of ``--clients`` clients, so
+they hold that many live buckets, then answer ``--requests`` single checks for
+random clients, one at a time as the middleware issues them without batching.
+For each it reports the mean and p99 time per check and checks/sec; for the
+local backend also its live buckets (two per client) and the memory they
+take per client, as traced Python allocations. Redis is a local stand-in
+behind a proxy adding ``--rtt-ms`` of round-trip latency, or the server given
+with ``--redis-url``, whose data is left alone unless ``--flush`` is given. Run
+from the ``rate_limiter`` directory:
+
+    python -m benchmarks.bench_backends --clients 100000 --requests 2000
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+
+import redis.asyncio as redis
+
+from app.backend import Backend, RedisBackend
+from app.local_backend import LocalBackend
+from app.rules import parse_limit
+from benchmarks.common import fresh_buckets
+from benchmarks.redis_standin import RedisStandIn
+
+# Slow enough that no bucket refills, and is freed, during the run.
+LIMITS = (parse_limit("100/h"), parse_limit("1000/d"))
+
+
+def _check(client: int, prefix: str):
+    address = f"{prefix}10.{client >> 16}.{client >> 8 & 255}.{client & 255}"
+    return (f"rate-limit:default:0:{address}", f"rate-limit:default:1:{address}"), LIMITS, 1, False
+
+
+async def _populate(backend: Backend, clients: int, batch: int, prefix: str):
+    for start in range(0, clients, batch):
+        await backend.check([_check(client, prefix) for client in range(start, min(start + batch, clients))])
+
+
+async def measure(backend: Backend, args, batch: int, prefix: str = ""):
+    traced = None
+    if isinstance(backend, LocalBackend):
+        tracemalloc.start()
+        await _populate(backend, args.clients, batch, prefix)
+        traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    else:
+        await _populate(backend, args.clients, batch, prefix)
+
+    rng = random.Random(args.seed)
+    latencies = []
+    for _ in range(args.requests):
+        check = _check(rng.randrange(args.clients), prefix)
+        start = time.perf_counter()
+        await backend.check([check])
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "live": len(backend) if isinstance(backend, LocalBackend) else None,
+        "mean": statistics.mean(latencies),
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "bytes_per_client": traced / args.clients if traced is not None else None,
+    }
+
+
+async def run(args):
+    standin = None
+    if args.redis_url is None:
+        standin = RedisStandIn(latency_ms=args.rtt_ms).start()
+    redis_url = args.redis_url or standin.url
+    client = redis.Redis.from_url(redis_url)
+    prefix = await fresh_buckets(redis_url, flush=standin is not None or args.flush)
+    print(f"clients={args.clients:,} requests={args.requests:,} limits=100/h,1000/d")
+    print(f"  {'backend':<8} {'mean':>10} {'p99':>10} {'checks/s':>10} {'buckets':>9} {'bytes/client':>13}")
+    try:
+        # Populating Redis one client per call would take minutes, so it is batched.
+        for name, backend, batch in (("local", LocalBackend(), 1), ("redis", RedisBackend(client), 1000)):
+            result = await measure(backend, args, batch, prefix if name == "redis" else "")
+            live = f"{result['live']:,}" if result["live"] is not None else "-"
+            memory = f"{result['bytes_per_client']:,.0f}" if result["bytes_per_client"] is not None else "-"
+            print(
+                f"  {name:<8} {result['mean'] * 1e6:>8.1f}us {result['p99'] * 1e6:>8.1f}us "
+                f"{1 / result['mean']:>10,.0f} {live:>9} {memory:>13}"
+            )
+    finally:
+        await client.aclose()
+        if standin is not None:
+            standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--redis-url", help="Use this Redis server instead of an in-process stand-in.")
+    parser.add_argument("--flush", action="store_true", help="Empty the --redis-url database first.")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
@@ -0,0 +1,89 @@
+"""
+Per-request EVALSHA vs micro-batched checks in DistributedTokenBucketMiddleware.
+
+Runs ``--concurrency`` simulated clients against an in-process app (httpx
+ASGI transport), with the limiter talking to a local Redis stand-in over TCP
+through a proxy that adds ``--rtt-ms`` of round-trip latency. Reports
+throughput, p50/p99 latency and the number of Redis calls for each mode.
+Pass ``--redis-url`` to use a real Redis instead. Run from the
+``rate_limiter`` directory:
+
+    python -m benchmarks.bench_batching --concurrency 200 --requests 20 --rtt-ms 0.5
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+
+from benchmarks.common import RedisCallCounter, build_app, find_limiter
+from benchmarks.redis_standin import RedisStandIn
+
+
+async def _client(http: httpx.AsyncClient, client_id: int, requests: int, latencies: list):
+    headers = {"X-Forwarded-For": f"10.0.{client_id // 256}.{client_id % 256}"}
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await http.get("/limited", headers=headers)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code in (200, 429)
+
+
+async def measure(redis_url: str, concurrency: int, requests: int, **middleware_options):
+    app = build_app(redis_url, capacity=1_000_000, refill_rate=1_000, **middleware_options)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        await http.get("/limited")  # Loads the script and builds the middleware stack
+        counter = RedisCallCounter(find_limiter(app))
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(_client(http, i, requests, latencies) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    await app.state.redis.aclose()
+
+    latencies.sort()
+    total = len(latencies)
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(total - 1, int(total * 0.99))],
+        "calls_per_request": counter.calls / total,
+    }
+
+
+async def run(args):
+    standin = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        standin = RedisStandIn(latency_ms=args.rtt_ms).start()
+        redis_url = standin.url
+
+    modes = [("per-request", {}), (f"batched {args.window_ms:g}ms", {
+        "batch_window": args.window_ms / 1000, "batch_max_size": args.max_batch,
+    })]
+    print(f"concurrency={args.concurrency} requests/client={args.requests} rtt={args.rtt_ms}ms")
+    print(f"  {'mode':<16} {'req/s':>9} {'p50':>9} {'p99':>9} {'redis calls/req':>16}")
+    try:
+        for label, options in modes:
+            result = await measure(redis_url, args.concurrency, args.requests, **options)
+            print(
+                f"  {label:<16} {result['rps']:>9,.0f} {result['p50'] * 1e3:>7.2f}ms "
+                f"{result['p99'] * 1e3:>7.2f}ms {result['calls_per_request']:>16.3f}"
+            )
+    finally:
+        if standin is not None:
+            standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20, help="Sequential requests per client.")
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="Round-trip latency added by the stand-in proxy.")
+    parser.add_argument("--window-ms", type=float, default=1.0)
+    parser.add_argument("--max-batch", type=int, default=100)
+    parser.add_argument("--redis-url", help="Benchmark against this Redis instead of the stand-in.")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
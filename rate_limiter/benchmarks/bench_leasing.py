@@ -0,0 +1,110 @@
+"""
+Redis calls and admission accuracy with and without leased token quotas.
+
+Several app instances share one Redis stand-in. A few heavy clients send
+requests round-robin across the instances for ``--seconds``, once paced at
+``--rate`` requests/sec each (under their limit) and once as fast as they are
+answered (over it). For each mode it reports Redis script calls per request
+and admitted requests relative to the exact answer, per client
+min(sent, capacity + refill_rate x duration): 1.0 is exact, below 1.0 is
+under-admission and above is over-admission. Pass ``--redis-url`` to use a
+real Redis instead of the stand-in; its data is left alone unless ``--flush``
+is given. Run from the ``rate_limiter`` directory:
+
+    python -m benchmarks.bench_leasing --instances 4 --clients 4 --seconds 3
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+
+import httpx
+
+from benchmarks.common import RedisCallCounter, build_app, find_limiter, fresh_buckets
+from benchmarks.redis_standin import RedisStandIn
+
+
+async def _client(clients, client_id: int, rate: float, deadline: float, admitted: list, sent: list,
+                  prefix: str):
+    headers = {"X-Forwarded-For": f"{prefix}10.1.0.{client_id}"}
+    start = time.perf_counter()
+    for http in itertools.cycle(clients):
+        now = time.perf_counter()
+        if now >= deadline:
+            return
+        if rate:
+            await asyncio.sleep(max(0.0, start + sent[client_id] / rate - now))
+        response = await http.get("/limited", headers=headers)
+        sent[client_id] += 1
+        admitted[client_id] += response.status_code == 200
+
+
+async def measure(redis_url: str, args, rate: float, **middleware_options):
+    prefix = await fresh_buckets(redis_url, flush=args.redis_url is None or args.flush)
+
+    apps = [build_app(redis_url, capacity=args.capacity, refill_rate=args.refill_rate, **middleware_options)
+            for _ in range(args.instances)]
+    clients = [httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") for app in apps]
+    for http in clients:
+        await http.get("/limited", headers={"X-Forwarded-For": f"{prefix}warm-up"})
+    counters = [RedisCallCounter(find_limiter(app)) for app in apps]
+
+    admitted, sent = [0] * args.clients, [0] * args.clients
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(clients, i, rate, start + args.seconds, admitted, sent, prefix) for i in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+    for http, app in zip(clients, apps):
+        await http.aclose()
+        await app.state.redis.aclose()
+
+    allowed = args.capacity + args.refill_rate * elapsed
+    expected = sum(min(count, allowed) for count in sent)
+    return {
+        "requests": sum(sent),
+        "calls_per_request": sum(counter.calls for counter in counters) / sum(sent),
+        "accuracy": sum(admitted) / expected,
+    }
+
+
+async def run(args):
+    standin = None
+    if args.redis_url is None:
+        standin = RedisStandIn(latency_ms=args.rtt_ms).start()
+    lease_size = max(1, int(args.capacity * args.lease_fraction))
+    modes = [("per-request", {}), (f"lease {lease_size} tokens", {"lease_fraction": args.lease_fraction})]
+    print(
+        f"instances={args.instances} clients={args.clients} seconds={args.seconds} "
+        f"capacity={args.capacity} refill_rate={args.refill_rate}/s"
+    )
+    print(f"  {'load':<18} {'mode':<18} {'requests':>9} {'redis calls/req':>16} {'accuracy':>9}")
+    try:
+        for load, rate in ((f"{args.rate:g} req/s/client", args.rate), ("unpaced", 0.0)):
+            for label, options in modes:
+                result = await measure(args.redis_url or standin.url, args, rate, **options)
+                print(
+                    f"  {load:<18} {label:<18} {result['requests']:>9,} "
+                    f"{result['calls_per_request']:>16.3f} {result['accuracy']:>9.3f}"
+                )
+    finally:
+        if standin is not None:
+            standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--rate", type=float, default=40, help="Paced requests/sec per client.")
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--refill-rate", type=float, default=50)
+    parser.add_argument("--lease-fraction", type=float, default=0.1)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    parser.add_argument("--redis-url", help="Use this Redis server instead of an in-process stand-in.")
+    parser.add_argument("--flush", action="store_true", help="Empty the --redis-url database before each run.")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
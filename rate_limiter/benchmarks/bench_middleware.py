@@ -0,0 +1,102 @@
+"""
+Per-request overhead of the rate limiter as a plain ASGI middleware versus the
+previous ``BaseHTTPMiddleware`` implementation.
+
+Both variants run the same limiter checks against a local Redis stand-in, with
+a lease covering the whole run so Redis is almost never called and the numbers
+show the middleware machinery itself. The ``BaseHTTPMiddleware`` variant is a
+faithful copy of the old ``dispatch``. Run from the ``rate_limiter`` directory:
+
+    python -m benchmarks.bench_middleware --requests 5000
+"""
+import argparse
+import asyncio
+import logging
+import math
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+from app.rate_limiter import DistributedTokenBucketMiddleware
+from benchmarks.common import build_app
+from benchmarks.redis_standin import RedisStandIn
+
+
+class BaseHTTPTokenBucketMiddleware(BaseHTTPMiddleware):
+    """The limiter wrapped the old way, reusing the ASGI middleware's checks."""
+
+    def __init__(self, app, **options):
+        super().__init__(app)
+        self.limiter = DistributedTokenBucketMiddleware(app, **options)
+
+    async def dispatch(self, request, call_next):
+        limiter = self.limiter
+        backend = limiter._backend_for(request.scope)
+        client_id = request.headers.get("x-forwarded-for", request.client.host)
+        rule = limiter.rules.match(request.method, request.url.path)
+        allowed, tokens_left, limiting, retry_after = await limiter._check(backend, rule, client_id)
+        limit = rule.limits[limiting]
+        if not allowed:
+            return Response(content="Too Many Requests", status_code=429,
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after / 1000)))})
+        response = await call_next(request)
+        response.headers["X-RateLimit-Remaining"] = str(round(tokens_left))
+        response.headers["X-RateLimit-Limit"] = str(limit.capacity)
+        return response
+
+
+def _build(redis_url: str, variant: str, requests: int) -> FastAPI:
+    options = dict(capacity=requests * 2, refill_rate=1, lease_fraction=1.0, lease_ttl=3600)
+    if variant == "asgi":
+        return build_app(redis_url, **options)
+    app = build_app(redis_url, **options)
+    app.user_middleware.clear()
+    if variant == "base-http":
+        app.add_middleware(BaseHTTPTokenBucketMiddleware, **options)
+    return app
+
+
+async def measure(redis_url: str, variant: str, requests: int):
+    app = _build(redis_url, variant, requests)
+    latencies = []
+    headers = {"X-Forwarded-For": f"bench-{variant}"}  # A fresh bucket per variant
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        for _ in range(50):  # Warm-up, and takes the lease
+            await http.get("/limited", headers=headers)
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await http.get("/limited", headers=headers)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+    await app.state.redis.aclose()
+    latencies.sort()
+    return statistics.mean(latencies), statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+async def run(requests: int):
+    standin = RedisStandIn().start()
+    print(f"requests={requests} (sequential, in-process)")
+    print(f"  {'middleware':<12} {'mean':>9} {'p50':>9} {'p99':>9} {'overhead':>9}")
+    try:
+        baseline = None
+        for variant in ("none", "base-http", "asgi"):
+            mean, p50, p99 = await measure(standin.url, variant, requests)
+            baseline = mean if baseline is None else baseline
+            print(
+                f"  {variant:<12} {mean * 1e6:>7.0f}us {p50 * 1e6:>7.0f}us {p99 * 1e6:>7.0f}us "
+                f"{(mean - baseline) * 1e6:>7.0f}us"
+            )
+    finally:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args.requests))
@@ -0,0 +1,81 @@
+"""
+Rule matching cost: the compiled trie (cold and memoized) versus checking
+every rule in turn.
+
+Generates ``--rules`` path rules over ``--routes`` distinct routes and times
+matching a stream of request paths. Run from the ``rate_limiter`` directory:
+
+    python -m benchmarks.bench_rules --rules 500 --requests 100000
+"""
+import argparse
+import logging
+import random
+import time
+
+from app.rules import Limit, Rule, RuleMatcher, resolve_rules
+
+
+def _linear_match(rules, default, method, path, tier):
+    """Reference matcher: test every rule's pattern against the path."""
+    segments = [segment for segment in path.split("/") if segment]
+    matching = []
+    for rule in rules:
+        pattern = rule.segments
+        if pattern[-1:] == ["**"]:
+            prefix = pattern[:-1]
+            matches = len(segments) >= len(prefix)
+        else:
+            prefix = pattern
+            matches = len(segments) == len(prefix)
+        matches = matches and all(p in ("*", s) for p, s in zip(prefix, segments))
+        if matches and rule.applies_to(method, tier):
+            matching.append(rule)
+    return resolve_rules(matching, default)
+
+
+def run(num_rules: int, num_requests: int, num_routes: int):
+    rng = random.Random(7)
+    limit = [Limit(10, 1)]
+    rules = []
+    for i in range(num_rules):
+        kind = i % 3
+        if kind == 0:
+            rules.append(Rule(f"exact-{i}", f"/svc{i}/items", limits=limit))
+        elif kind == 1:
+            rules.append(Rule(f"star-{i}", f"/svc{i}/items/*", methods=["POST"], limits=limit))
+        else:
+            rules.append(Rule(f"prefix-{i}", f"/svc{i}/**", limits=limit))
+    default = Rule("default", limits=limit)
+    paths = [f"/svc{rng.randrange(num_rules)}/items/{rng.randrange(1000)}" for _ in range(num_routes)]
+    requests = [(rng.choice(("GET", "POST")), rng.choice(paths)) for _ in range(num_requests)]
+
+    matcher = RuleMatcher(rules, default, cache_size=0)
+    for method, path in requests[:1000]:
+        expected = _linear_match(rules, default, method, path, None)
+        assert matcher.match(method, path).buckets == expected.buckets
+
+    def timed(match) -> float:
+        start = time.perf_counter()
+        for method, path in requests:
+            match(method, path)
+        return (time.perf_counter() - start) / num_requests
+
+    memoized = RuleMatcher(rules, default)
+    results = [
+        ("linear scan", timed(lambda method, path: _linear_match(rules, default, method, path, None))),
+        ("trie", timed(matcher.match)),
+        ("trie + memo", timed(memoized.match)),
+    ]
+    print(f"rules={num_rules} routes={num_routes} requests={num_requests}")
+    for label, per_match in results:
+        print(f"  {label:<12} {per_match * 1e6:>8.2f}us/match {1 / per_match:>12,.0f} matches/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--routes", type=int, default=2_000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    run(args.rules, args.requests, args.routes)
@@ -0,0 +1,59 @@
+"""Helpers shared by the rate limiter benchmarks."""
+import uuid
+
+import redis.asyncio as redis
+from fastapi import FastAPI
+
+from app.rate_limiter import DistributedTokenBucketMiddleware
+
+
+def build_app(redis_url: str, **middleware_options) -> FastAPI:
+    """A minimal app with one ``/limited`` endpoint behind the limiter middleware."""
+    app = FastAPI()
+    app.add_middleware(DistributedTokenBucketMiddleware, **middleware_options)
+    app.state.redis = redis.Redis.from_url(redis_url, max_connections=1000)
+
+    @app.get("/limited")
+    async def limited():
+        return {"message": "ok"}
+
+    return app
+
+
+def find_limiter(app: FastAPI) -> DistributedTokenBucketMiddleware:
+    """Returns the limiter instance of a built middleware stack (after the first request)."""
+    middleware = app.middleware_stack
+    while not isinstance(middleware, DistributedTokenBucketMiddleware):
+        middleware = middleware.app
+    return middleware
+
+
+class RedisCallCounter:
+    """Counts the script calls a limiter makes to Redis (after its first request)."""
+
+    def __init__(self, limiter: DistributedTokenBucketMiddleware):
+        self.calls = 0
+        backend = limiter.backend
+        check = backend.check
+
+        async def counting(*args, **kwargs):
+            self.calls += 1
+            return await check(*args, **kwargs)
+
+        backend.check = counting
+
+
+async def fresh_buckets(redis_url: str, flush: bool) -> str:
+    """
+    Makes a run start with full buckets. With ``flush``, empties the Redis
+    database, which is only safe on the private stand-in or when the user asked
+    for it with ``--flush``; otherwise nothing is deleted. Returns a prefix for
+    the run's client ids: empty after a flush, and otherwise unique to the run,
+    so its bucket keys never meet those of earlier runs or other users.
+    """
+    if not flush:
+        return f"run-{uuid.uuid4().hex[:8]}:"
+    client = redis.Redis.from_url(redis_url)
+    await client.flushdb()
+    await client.aclose()
+    return ""
@@ -0,0 +1,159 @@
+"""
+Load generator: throughput, latency percentiles and admission accuracy of the
+limiter under many concurrent clients, per algorithm and backend.
+
+``--concurrency`` workers send requests for ``--seconds`` through the ASGI
+transport, each request from one of ``--clients`` simulated addresses in
+``X-Forwarded-For``, drawn uniformly or from a Zipf distribution with exponent
+``--zipf-s`` (a few hot clients and a long tail). Every run limits ``/limited``
+to ``--capacity`` requests refilled at ``--refill-rate``/s per client, with
+the Redis backend (a local fakeredis stand-in behind a proxy adding
+``--rtt-ms`` of round-trip latency, or the server given with ``--redis-url``,
+whose data is left alone unless ``--flush`` is given) or the in-process one.
+
+For each run it reports requests/sec, p50/p99/p99.9 request latency, and
+admitted requests relative to the exact answer: the run's own arrivals
+replayed one at a time, at their send times, through a fresh in-process
+backend, which matches the Redis script exactly. 1.0 is exact; batching,
+leasing or a Redis outage show up as a deviation. Run from the
+``rate_limiter`` directory:
+
+    python -m benchmarks.loadgen --clients 1000 --concurrency 1000 --seconds 2
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import time
+
+import httpx
+
+from app.local_backend import LocalBackend
+from app.rules import ALGORITHMS, Limit
+from benchmarks.common import build_app, fresh_buckets
+from benchmarks.redis_standin import RedisStandIn
+
+
+def _address(client: int) -> str:
+    return f"10.{client >> 16 & 255}.{client >> 8 & 255}.{client & 255}"
+
+
+def client_picker(args, distribution: str):
+    """A function drawing the next client number from ``distribution``."""
+    rng = random.Random(args.seed)
+    clients = range(args.clients)
+    if distribution == "uniform":
+        return lambda: rng.randrange(args.clients)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) ** args.zipf_s for rank in clients))
+    return lambda: rng.choices(clients, cum_weights=cum_weights)[0]
+
+
+async def _worker(http: httpx.AsyncClient, pick, deadline: float, arrivals: list, latencies: list, prefix: str):
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            return
+        client = pick()
+        response = await http.get("/limited", headers={"X-Forwarded-For": prefix + _address(client)})
+        latencies.append(time.perf_counter() - start)
+        arrivals.append((start, client, response.status_code == 200))
+
+
+async def expected_admissions(arrivals: list, limit: Limit) -> int:
+    """How many of ``arrivals`` an exact limiter checking them one at a time admits."""
+    reference = LocalBackend()
+    admitted = 0
+    for start, client, _ in sorted(arrivals):
+        [(granted, _, _, _)] = await reference.check([((_address(client),), (limit,), 1, False)], now=start)
+        admitted += granted
+    return admitted
+
+
+async def measure(redis_url: str, args, algorithm: str, backend: str, distribution: str):
+    # Every run starts with full buckets
+    prefix = await fresh_buckets(redis_url, flush=args.redis_url is None or args.flush)
+
+    options = {"backend": LocalBackend()} if backend == "local" else {
+        "batch_window": args.batch_window_ms / 1000 if args.batch_window_ms is not None else None,
+        "lease_fraction": args.lease_fraction,
+    }
+    app = build_app(redis_url, capacity=args.capacity, refill_rate=args.refill_rate, algorithm=algorithm,
+                    **options)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", limits=limits)
+    await http.get("/limited", headers={"X-Forwarded-For": f"{prefix}warm-up"})  # Loads the script
+
+    pick = client_picker(args, distribution)
+    arrivals, latencies = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(http, pick, start + args.seconds, arrivals, latencies, prefix) for _ in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    await http.aclose()
+    await app.state.redis.aclose()
+
+    latencies.sort()
+    admitted = sum(allowed for _, _, allowed in arrivals)
+    expected = await expected_admissions(arrivals, Limit(args.capacity, args.refill_rate, algorithm))
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": latencies[int(len(latencies) * 0.5)],
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "p999": latencies[int(len(latencies) * 0.999)],
+        "admitted": admitted,
+        "accuracy": admitted / expected if expected else 1.0,
+    }
+
+
+async def run(args):
+    standin = None
+    if args.redis_url is None:
+        standin = RedisStandIn(latency_ms=args.rtt_ms).start()
+    print(
+        f"clients={args.clients:,} concurrency={args.concurrency} seconds={args.seconds} "
+        f"capacity={args.capacity} refill_rate={args.refill_rate}/s"
+    )
+    try:
+        for distribution in args.distributions:
+            label = f"zipf s={args.zipf_s:g}" if distribution == "zipf" else distribution
+            print(f"{label}:")
+            print(
+                f"  {'algorithm':<15} {'backend':<8} {'requests':>9} {'req/s':>8} {'p50':>9} {'p99':>9} "
+                f"{'p99.9':>9} {'admitted':>9} {'accuracy':>9}"
+            )
+            for algorithm in args.algorithms:
+                for backend in args.backends:
+                    result = await measure(args.redis_url or standin.url, args, algorithm, backend, distribution)
+                    print(
+                        f"  {algorithm:<15} {backend:<8} {result['requests']:>9,} {result['rps']:>8,.0f} "
+                        f"{result['p50'] * 1e3:>7.2f}ms {result['p99'] * 1e3:>7.2f}ms "
+                        f"{result['p999'] * 1e3:>7.2f}ms {result['admitted']:>9,} {result['accuracy']:>9.3f}"
+                    )
+    finally:
+        if standin is not None:
+            standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--distributions", nargs="+", choices=("uniform", "zipf"), default=["uniform", "zipf"])
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=list(ALGORITHMS))
+    parser.add_argument("--backends", nargs="+", choices=("redis", "local"), default=["redis", "local"])
+    parser.add_argument("--capacity", type=int, default=20)
+    parser.add_argument("--refill-rate", type=float, default=5)
+    parser.add_argument("--batch-window-ms", type=float, help="Batch Redis checks (see bench_batching).")
+    parser.add_argument("--lease-fraction", type=float, help="Lease quotas from Redis (see bench_leasing).")
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--redis-url", help="Use this Redis server instead of an in-process stand-in.")
+    parser.add_argument("--flush", action="store_true", help="Empty the --redis-url database before each run.")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
@@ -0,0 +1,96 @@
+"""
+A local Redis stand-in for benchmarks: a fakeredis server speaking RESP over
+TCP, optionally behind a proxy that adds network latency or drops traffic.
+
+The proxy delays every chunk of bytes by half the round-trip time in each
+direction, so a pipelined or multi-key call pays one RTT while N sequential
+calls pay N, as they would against a remote Redis.
+"""
+import socket
+import threading
+import time
+from typing import List, Optional
+
+from fakeredis import TcpFakeServer
+
+
+class RedisStandIn:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.down = False  # While set, the proxy drops connections and stalls traffic
+        self._server = TcpFakeServer(("127.0.0.1", 0))
+        self._proxy: Optional[socket.socket] = None
+        self._sockets: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self.port = self._server.server_address[1]
+
+    def start(self) -> "RedisStandIn":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._proxy = socket.create_server(("127.0.0.1", 0))
+        self.port = self._proxy.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.down = True
+        if self._proxy is not None:
+            self._proxy.close()
+        self._drop_connections()
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def fail(self):
+        """Simulates an outage: open connections are cut and new traffic goes unanswered."""
+        self.down = True
+        self._drop_connections()
+
+    def recover(self):
+        self.down = False
+
+    def _drop_connections(self):
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._proxy.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self._server.server_address)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._sockets += [client, upstream]
+            threading.Thread(target=self._pump, args=(client, upstream), daemon=True).start()
+            threading.Thread(target=self._pump, args=(upstream, client), daemon=True).start()
+
+    def _pump(self, source: socket.socket, target: socket.socket):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                while self.down:  # Stall like an unreachable host until recovered or cut
+                    time.sleep(0.01)
+                if self.latency_ms:
+                    time.sleep(self.latency_ms / 2000)
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, target):
+                try:
+                    sock.close()
+                except OSError:
+                    pass
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.backend import RedisBackend
+from app.rate_limiter import DistributedTokenBucketMiddleware
+from app.rules import Limit
+
+fakeredis = pytest.importorskip("fakeredis")
+
+# Five requests per five seconds. t=1000 starts a sliding window.
+T0 = 1000.0
+
+
+def _run(algorithm: str, times):
+    """(granted, left, retry_after) for one request at each of ``times`` against the Lua script."""
+    async def scenario():
+        backend = RedisBackend(fakeredis.aioredis.FakeRedis())
+        limit = Limit(5, 1.0, algorithm)
+        results = []
+        for now in times:
+            [(granted, left, _, retry_after)] = await backend.check([(("key",), (limit,), 1, False)], now=now)
+            results.append((granted, left, retry_after))
+        return results
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("algorithm", ["token_bucket", "gcra"])
+def test_bucket_algorithms_burst_then_refill(algorithm):
+    results = _run(algorithm, [T0] * 6 + [T0 + 0.5, T0 + 1, T0 + 20])
+    assert results[:5] == [(1, left, 0) for left in (4, 3, 2, 1, 0)]
+    assert results[5] == (0, 0, 1000)  # One token refills in a second
+    assert results[6] == (0, 0, 500)
+    assert results[7] == (1, 0, 0)
+    assert results[8] == (1, 4, 0)  # Idle long enough to be full again
+
+
+def test_sliding_window_burst_and_rollover():
+    results = _run("sliding_window", [T0] * 6 + [T0 + 5.9, T0 + 6, T0 + 10])
+    assert results[:5] == [(1, left, 0) for left in (4, 3, 2, 1, 0)]
+    # The full window must become the previous one and weigh at most 4/5: at t0 + 6.
+    assert results[5] == (0, 0, 6000)
+    granted, _, retry_after = results[6]
+    assert granted == 0 and 100 <= retry_after <= 101
+    assert results[7][0] == 1
+    # Two windows on, only the one request of the previous window counts, in full.
+    assert results[8] == (1, 3, 0)
+
+
+def test_sliding_log_burst_and_expiry():
+    results = _run("sliding_log", [T0, T0 + 1, T0 + 2, T0 + 3, T0 + 4, T0 + 4.5, T0 + 5, T0 + 5.5])
+    assert results[:5] == [(1, left, 0) for left in (4, 3, 2, 1, 0)]
+    assert results[5] == (0, 0, 500)  # Until the entry from t0 is five seconds old
+    assert results[6] == (1, 0, 0)
+    assert results[7] == (0, 0, 500)  # Now the entry from t0 + 1 is next
+
+
+@pytest.mark.parametrize("algorithm, refill_rate, retry_after", [
+    ("token_bucket", 5, "1"),  # A token every 0.2 s, rounded up to a whole second
+    ("sliding_log", 1 / 30, "60"),  # The window is 60 s, whatever the nominal rate
+])
+def test_retry_after_comes_from_the_backend(algorithm, refill_rate, retry_after):
+    app = FastAPI()
+    app.add_middleware(DistributedTokenBucketMiddleware, backend=RedisBackend(fakeredis.aioredis.FakeRedis()),
+                       capacity=2, refill_rate=refill_rate, algorithm=algorithm)
+
+    @app.get("/limited")
+    async def limited():
+        return {"message": "ok"}
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return [await http.get("/limited") for _ in range(3)]
+
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[2].headers["retry-after"] == retry_after
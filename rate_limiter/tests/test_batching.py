@@ -0,0 +1,75 @@
+import asyncio
+
+from app.batching import CheckBatcher
+from app.rules import Limit
+
+LIMITS = (Limit(10, 1),)
+
+
+def _check(i: int):
+    return (f"key-{i}",), LIMITS, 1, False
+
+
+class RecordingBackend:
+    """Answers each check with its key number, and records the batches it was sent."""
+
+    def __init__(self, error: Exception = None):
+        self.batches = []
+        self.error = error
+
+    async def execute(self, checks):
+        self.batches.append([keys[0] for keys, _, _, _ in checks])
+        if self.error is not None:
+            raise self.error
+        return [(1, int(keys[0].split("-")[1]), 0) for keys, _, _, _ in checks]
+
+
+def test_batch_is_sent_once_max_size_checks_wait():
+    async def scenario():
+        backend = RecordingBackend()
+        batcher = CheckBatcher(backend.execute, window=60, max_size=3)
+        results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(_check(i)) for i in range(3))), 1)
+        return backend.batches, results
+
+    batches, results = asyncio.run(scenario())
+    assert batches == [["key-0", "key-1", "key-2"]]  # Sent without waiting out the 60 s window
+    assert results == [(1, 0, 0), (1, 1, 0), (1, 2, 0)]
+
+
+def test_batch_is_sent_when_the_window_expires():
+    async def scenario():
+        backend = RecordingBackend()
+        batcher = CheckBatcher(backend.execute, window=0.05, max_size=100)
+        first = asyncio.ensure_future(batcher.submit(_check(0)))
+        second = asyncio.ensure_future(batcher.submit(_check(1)))
+        await asyncio.sleep(0.01)
+        sent_early = list(backend.batches)
+        await asyncio.gather(first, second)
+        later = await batcher.submit(_check(2))  # Opens a new batch
+        return sent_early, backend.batches, later
+
+    sent_early, batches, later = asyncio.run(scenario())
+    assert sent_early == []
+    assert batches == [["key-0", "key-1"], ["key-2"]]
+    assert later == (1, 2, 0)
+
+
+def test_each_request_gets_its_own_result():
+    async def scenario():
+        backend = RecordingBackend()
+        batcher = CheckBatcher(backend.execute, window=0, max_size=100)
+        return backend.batches, await asyncio.gather(*(batcher.submit(_check(i)) for i in (5, 3, 8, 1)))
+
+    batches, results = asyncio.run(scenario())
+    assert len(batches) == 1
+    assert [left for _, left, _ in results] == [5, 3, 8, 1]
+
+
+def test_backend_error_reaches_every_waiting_request():
+    async def scenario():
+        batcher = CheckBatcher(RecordingBackend(ConnectionError("down")).execute, window=0, max_size=100)
+        return await asyncio.gather(*(batcher.submit(_check(i)) for i in range(4)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 4
+    assert all(isinstance(result, ConnectionError) for result in results)
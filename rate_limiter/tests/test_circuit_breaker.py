@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import redis.asyncio as redis
+from fastapi import FastAPI
+
+from app.backend import RedisBackend
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.config import settings
+from app.fallback import LocalBuckets
+from app.rate_limiter import DistributedTokenBucketMiddleware
+from app.rules import Limit
+
+fakeredis = pytest.importorskip("fakeredis")
+from benchmarks.common import find_limiter  # noqa: E402
+from benchmarks.redis_standin import RedisStandIn  # noqa: E402
+
+
+def test_breaker_opens_after_consecutive_failures_and_probe_closes_it():
+    healthy = False
+
+    async def operation():
+        if not healthy:
+            raise ConnectionError("down")
+        return "ok"
+
+    async def probe():
+        await operation()
+
+    async def scenario():
+        nonlocal healthy
+        breaker = CircuitBreaker(probe, timeout=0.1, failure_threshold=2, probe_interval=0.01)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await breaker.call(operation)
+        assert breaker.is_open
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(operation)
+
+        healthy = True
+        for _ in range(100):
+            if not breaker.is_open:
+                break
+            await asyncio.sleep(0.01)
+        assert await breaker.call(operation) == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_breaker_counts_timeouts_as_failures():
+    async def scenario():
+        breaker = CircuitBreaker(lambda: asyncio.sleep(1), timeout=0.01, failure_threshold=1, probe_interval=10)
+        with pytest.raises(asyncio.TimeoutError):
+            await breaker.call(lambda: asyncio.sleep(1))
+        assert breaker.is_open
+        breaker.close()
+        assert not breaker.is_open
+
+    asyncio.run(scenario())
+
+
+def test_local_buckets_take_from_all_or_none_and_scale_by_share():
+    buckets = LocalBuckets(share=0.5)
+    limits = (Limit(10, 1), Limit(4, 1))  # Enforced as 5 and 2 tokens
+
+    assert buckets.take(("a", "b"), limits, now=0) == (1, 1, 1, 0)
+    assert buckets.take(("a", "b"), limits, now=0) == (1, 0, 1, 0)
+    assert buckets.take(("a", "b"), limits, now=0) == (0, 0, 1, 2000)  # Refills at 0.5/s
+    assert buckets.take(("a",), limits[:1], now=0) == (1, 2, 0, 0)  # Unchanged by the denial
+    assert buckets.take(("a", "b"), limits, now=2) == (1, 0, 1, 0)
+
+
+@pytest.mark.parametrize("share", [0, -0.5, 1.5])
+def test_local_buckets_reject_a_share_outside_zero_to_one(share):
+    with pytest.raises(ValueError):
+        LocalBuckets(share=share)
+
+
+def test_redis_outage_falls_back_in_process_and_recovers():
+    standin = RedisStandIn().start()
+    redis_client = redis.Redis.from_url(standin.url)
+    backend = RedisBackend(redis_client, timeout=0.2, failure_threshold=2, probe_interval=0.05)
+    app = FastAPI()
+    app.add_middleware(DistributedTokenBucketMiddleware, backend=backend, capacity=5, refill_rate=0.001)
+
+    @app.get("/limited")
+    async def limited():
+        return {"message": "ok"}
+
+    async def get(http: httpx.AsyncClient):
+        start = time.perf_counter()
+        response = await http.get("/limited", headers={"X-Forwarded-For": "10.0.0.1"})
+        return response.status_code, response.headers.get("x-ratelimit-remaining"), time.perf_counter() - start
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            assert [(await get(http))[:2] for _ in range(2)] == [(200, "4"), (200, "3")]
+
+            standin.fail()
+            # Two calls time out, opening the circuit; the in-process buckets
+            # start full and admit five requests, after which there is no
+            # timeout to wait out.
+            results = [await get(http) for _ in range(7)]
+            assert [status for status, _, _ in results] == [200] * 5 + [429] * 2
+            assert all(elapsed < 0.1 for _, _, elapsed in results[2:])
+
+            standin.recover()
+            for _ in range(100):
+                if not backend.breaker.is_open:
+                    break
+                await asyncio.sleep(0.05)
+            # Back on Redis, where the bucket has kept its state.
+            assert (await get(http))[:2] == (200, "2")
+        await redis_client.aclose()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        standin.stop()
+
+
+def test_default_backend_uses_the_configured_timeout_and_breaker():
+    app = FastAPI()
+    app.add_middleware(DistributedTokenBucketMiddleware, capacity=5, refill_rate=1)
+
+    @app.get("/limited")
+    async def limited():
+        return {"message": "ok"}
+
+    async def scenario():
+        app.state.redis = fakeredis.aioredis.FakeRedis()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            assert (await http.get("/limited")).status_code == 200
+
+    asyncio.run(scenario())
+    breaker = find_limiter(app).backend.breaker
+    assert breaker.timeout == settings.REDIS_TIMEOUT_MS / 1000
+    assert breaker.failure_threshold == settings.BREAKER_FAILURE_THRESHOLD
+    assert breaker.probe_interval == settings.BREAKER_PROBE_INTERVAL_MS / 1000
@@ -0,0 +1,72 @@
+import asyncio
+
+from app.leasing import LeaseCache
+from app.local_backend import LocalBackend
+from app.rate_limiter import DistributedTokenBucketMiddleware
+
+
+class SlowBackend(LocalBackend):
+    """A local backend whose checks take a while, so concurrent requests overlap; counts its calls."""
+
+    def __init__(self, error: Exception = None):
+        super().__init__()
+        self.calls = 0
+        self.error = error
+
+    async def check(self, checks, now=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return await super().check(checks, now)
+
+
+def _limiter(backend) -> DistributedTokenBucketMiddleware:
+    return DistributedTokenBucketMiddleware(None, backend=backend, capacity=10, refill_rate=1, lease_fraction=0.5)
+
+
+def test_lease_hands_out_its_tokens_then_runs_out():
+    leases = LeaseCache(ttl=1.0)
+    assert leases.take("client") is None
+    leases.grant("client", 2, shared=5, limiting=1, now=0)
+    assert leases.take("client", now=0.1) == (6, 1)
+    assert leases.take("client", now=0.2) == (5, 1)
+    assert leases.take("client", now=0.3) is None
+    assert len(leases) == 0
+
+
+def test_lease_expires_after_its_ttl():
+    leases = LeaseCache(ttl=1.0)
+    leases.grant("client", 5, shared=0, limiting=0, now=0)
+    assert leases.take("client", now=0.5) == (4, 0)
+    assert leases.take("client", now=1.0) is None
+
+
+def test_concurrent_requests_share_one_renewal():
+    async def scenario():
+        backend = SlowBackend()
+        limiter = _limiter(backend)
+        rule = limiter.rules.default
+        first = await asyncio.gather(*(limiter._check(backend, rule, "client") for _ in range(5)))
+        calls_for_first = backend.calls
+        sixth = await limiter._check(backend, rule, "client")
+        return first, calls_for_first, sixth, backend.calls
+
+    first, calls_for_first, sixth, calls = asyncio.run(scenario())
+    assert calls_for_first == 1  # One lease of 5 tokens served all five requests
+    assert all(granted == 1 for granted, _, _, _ in first)
+    assert sixth[0] == 1 and calls == 2  # The lease ran out, so the next request renewed it
+
+
+def test_renewal_failure_reaches_the_waiting_requests():
+    async def scenario():
+        backend = SlowBackend(ConnectionError("down"))
+        limiter = _limiter(backend)
+        results = await asyncio.gather(*(limiter._check(backend, limiter.rules.default, "client") for _ in range(3)))
+        return results, backend.calls, limiter.metrics
+
+    results, calls, metrics = asyncio.run(scenario())
+    assert calls == 1
+    # Every request, not just the renewing one, saw the error and was checked in-process.
+    assert metrics.check_errors == 3 and metrics.fallback_checks == 3
+    assert all(granted == 1 for granted, _, _, _ in results)
@@ -0,0 +1,81 @@
+import asyncio
+import random
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.backend import RedisBackend
+from app.local_backend import LocalBackend
+from app.rate_limiter import DistributedTokenBucketMiddleware
+from app.rules import ALGORITHMS, Limit
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_matches_the_redis_script_for_every_algorithm():
+    async def scenario():
+        redis_backend, local = RedisBackend(fakeredis.aioredis.FakeRedis()), LocalBackend()
+        rng = random.Random(7)
+        now = 1000.0
+        for _ in range(1500):
+            now += rng.expovariate(20)
+            algorithm = rng.choice(ALGORITHMS)
+            client = rng.randrange(4)
+            keys = (f"{algorithm}:a:{client}", f"{algorithm}:b:{client}")
+            limits = (Limit(5, 2.0, algorithm), Limit(8, 1.5, algorithm))
+            requested = rng.choice([1, 1, 1, 3])  # Partial grants, as leases take
+            checks = [(keys, limits, requested, requested > 1)]
+            assert [tuple(result) for result in await redis_backend.check(checks, now=now)] == \
+                await local.check(checks, now=now)
+
+    asyncio.run(scenario())
+
+
+def test_idle_buckets_are_freed_and_reused():
+    async def scenario():
+        local = LocalBackend()
+        limit = (Limit(10, 1),)
+        for i in range(1000):
+            await local.check([((f"client-{i}",), limit, 1, False)], now=0)
+        assert len(local) == 1000
+
+        # One token takes a second to refill, after which the bucket reads as fresh.
+        await local.check([(("late",), limit, 1, False)], now=1.5)
+        assert len(local) == 1
+        assert len(local._keys) == 1000  # Slots are reused rather than grown
+
+    asyncio.run(scenario())
+
+
+def test_max_entries_frees_the_buckets_closest_to_fresh():
+    async def scenario():
+        local = LocalBackend(max_entries=2)
+        limit = (Limit(10, 1),)
+        await local.check([(("a",), limit, 5, False)], now=0)  # Fresh again at t=5
+        await local.check([(("b",), limit, 1, False)], now=0)  # ...at t=1
+        await local.check([(("c",), limit, 1, False)], now=0)
+        await local.check([(("a",), limit, 1, False)], now=0.5)
+        assert "b" not in local._slots and len(local) == 2
+        assert (await local.check([(("a",), limit, 1, False)], now=0.5)) == [(1, 3, 0, 0)]
+
+    asyncio.run(scenario())
+
+
+def test_middleware_sends_the_same_headers_without_redis():
+    app = FastAPI()
+    app.add_middleware(DistributedTokenBucketMiddleware, backend=LocalBackend(), capacity=2, refill_rate=0.5)
+
+    @app.get("/limited")
+    async def limited():
+        return {"message": "ok"}
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return [await http.get("/limited") for _ in range(3)]
+
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert [response.headers["x-ratelimit-remaining"] for response in responses[:2]] == ["1", "0"]
+    assert responses[0].headers["x-ratelimit-limit"] == "2"
+    assert responses[2].headers["retry-after"] == "2"
@@ -0,0 +1,77 @@
+import asyncio
+import random
+
+import httpx
+from fastapi import FastAPI
+
+from app.local_backend import LocalBackend
+from app.metrics import LatencyHistogram, Metrics, SpaceSaving
+from app.rate_limiter import DistributedTokenBucketMiddleware
+
+
+def test_histogram_quantiles_are_within_the_bucket_precision():
+    histogram = LatencyHistogram()
+    rng = random.Random(3)
+    values = sorted(rng.lognormvariate(-7, 1.5) for _ in range(20_000))
+    for value in values:
+        histogram.record(value)
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = values[int(q * len(values)) - 1]
+        assert exact - 1e-6 <= histogram.quantile(q) <= exact * (1 + 1 / 32) + 1e-6
+    assert histogram.cumulative([16, 1 << 20])[1] == sum(value * 1e6 <= (1 << 20) for value in values)
+
+
+def test_cumulative_counts_include_values_equal_to_each_bound():
+    histogram = LatencyHistogram()
+    # Up to 64 us each microsecond has a bucket; 1024 us ends one bucket and 1056 us the next.
+    for micros in (32, 33, 64, 64.5, 1023.5, 1024, 1024.5, 1056):
+        histogram.record(micros / 1e6)
+    assert histogram.cumulative([32, 64, 1024, 1056]) == [1, 3, 6, 8]
+
+
+def test_exported_le_bucket_counts_a_value_equal_to_its_bound():
+    metrics = Metrics()
+    metrics.check_latency.record(64e-6)
+    metrics.check_latency.record(64.5e-6)
+    lines = metrics.render().splitlines()
+    assert 'ratelimit_check_duration_seconds_bucket{le="3.2e-05"} 0' in lines
+    assert 'ratelimit_check_duration_seconds_bucket{le="6.4e-05"} 1' in lines
+    assert 'ratelimit_check_duration_seconds_bucket{le="0.000128"} 2' in lines
+
+
+def test_space_saving_keeps_the_heavy_hitters():
+    top = SpaceSaving(k=5)
+    rng = random.Random(5)
+    stream = ["hot-1"] * 500 + ["hot-2"] * 300 + [f"cold-{rng.randrange(1000)}" for _ in range(1000)]
+    rng.shuffle(stream)
+    for key in stream:
+        top.add(key)
+    assert len(top) == 5
+    (first, count_1, error_1), (second, count_2, error_2) = top.top(2)
+    assert (first, second) == ("hot-1", "hot-2")
+    # Counts never underestimate, and overestimate by at most the error.
+    assert count_1 - error_1 <= 500 <= count_1 and count_2 - error_2 <= 300 <= count_2
+
+
+def test_middleware_counts_decisions_and_renders_them():
+    metrics = Metrics()
+    app = FastAPI()
+    app.add_middleware(DistributedTokenBucketMiddleware, backend=LocalBackend(), capacity=2, refill_rate=0.5,
+                       metrics=metrics)
+
+    @app.get("/limited")
+    async def limited():
+        return {"message": "ok"}
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            for client in ("10.0.0.1", "10.0.0.1", "10.0.0.1", "10.0.0.1", "10.0.0.2"):
+                await http.get("/limited", headers={"X-Forwarded-For": client})
+
+    asyncio.run(scenario())
+    assert metrics.decisions == {("default", "allowed"): 3, ("default", "throttled"): 2}
+    assert metrics.check_latency.total == 5
+    text = metrics.render()
+    assert 'ratelimit_requests_total{rule="default",decision="throttled"} 2' in text
+    assert 'ratelimit_throttled_client_requests{client="10.0.0.1"} 2' in text
+    assert 'ratelimit_check_duration_seconds_bucket{le="+Inf"} 5' in text
@@ -0,0 +1,86 @@
+import asyncio
+
+from app.local_backend import LocalBackend
+from app.rate_limiter import DistributedTokenBucketMiddleware
+
+CHUNKS = [b"first ", b"second ", b"last"]
+
+
+class Downstream:
+    """An ASGI app that streams ``CHUNKS`` and records the scopes it is called with."""
+
+    def __init__(self):
+        self.scopes = []
+
+    async def __call__(self, scope, receive, send):
+        self.scopes.append(scope)
+        if scope["type"] != "http":
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        for i, chunk in enumerate(CHUNKS):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(CHUNKS) - 1})
+
+
+class UnusableBackend(LocalBackend):
+    async def check(self, checks, now=None):
+        raise AssertionError("The limiter should not have been consulted")
+
+
+def _http_scope():
+    return {"type": "http", "method": "GET", "path": "/limited", "headers": [], "client": ("10.0.0.1", 1234)}
+
+
+async def _call(app, scope):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
+
+
+def test_throttled_request_never_reaches_the_app():
+    downstream = Downstream()
+    limiter = DistributedTokenBucketMiddleware(downstream, backend=LocalBackend(), capacity=1, refill_rate=0.5)
+
+    async def scenario():
+        return await _call(limiter, _http_scope()), await _call(limiter, _http_scope())
+
+    _, throttled = asyncio.run(scenario())
+    assert len(downstream.scopes) == 1
+    assert throttled[0]["status"] == 429
+    assert (b"retry-after", b"2") in throttled[0]["headers"]
+
+
+def test_headers_are_added_to_the_response_start_and_the_body_streams_through():
+    downstream = Downstream()
+    limiter = DistributedTokenBucketMiddleware(downstream, backend=LocalBackend(), capacity=5, refill_rate=1)
+
+    messages = asyncio.run(_call(limiter, _http_scope()))
+    start, *body = messages
+    assert start["type"] == "http.response.start" and start["status"] == 200
+    assert start["headers"] == [
+        (b"content-type", b"text/plain"), (b"x-ratelimit-remaining", b"4"), (b"x-ratelimit-limit", b"5")
+    ]
+    # Each chunk is passed on as sent, not buffered into one body.
+    assert body == [
+        {"type": "http.response.body", "body": chunk, "more_body": i < len(CHUNKS) - 1}
+        for i, chunk in enumerate(CHUNKS)
+    ]
+
+
+def test_lifespan_and_websocket_scopes_bypass_the_limiter():
+    downstream = Downstream()
+    limiter = DistributedTokenBucketMiddleware(downstream, backend=UnusableBackend(), capacity=1, refill_rate=1)
+    scopes = [{"type": "lifespan"}, {"type": "websocket", "path": "/ws", "headers": [], "client": ("10.0.0.1", 1)}]
+
+    async def scenario():
+        for scope in scopes:
+            await _call(limiter, scope)
+
+    asyncio.run(scenario())
+    assert downstream.scopes == scopes
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app.backend import RedisBackend
+from app.rules import Limit
+
+fakeredis = pytest.importorskip("fakeredis")
+
+CHECK = (("rate-limit:default:0:10.0.0.1",), (Limit(100, 1),), 1, False)
+
+
+def _counting_backend():
+    backend = RedisBackend(fakeredis.aioredis.FakeRedis())
+    script_load = backend.client.script_load
+    loads = []
+
+    async def counting(script):
+        loads.append(script)
+        await asyncio.sleep(0.01)  # Long enough for every concurrent check to arrive
+        return await script_load(script)
+
+    backend.client.script_load = counting
+    return backend, loads
+
+
+def test_first_burst_loads_the_script_once():
+    async def scenario():
+        backend, loads = _counting_backend()
+        results = await asyncio.gather(*(backend.check([CHECK]) for _ in range(20)))
+        assert len(loads) == 1
+        assert sorted(result[0][1] for result in results) == list(range(80, 100))
+
+    asyncio.run(scenario())
+
+
+def test_noscript_after_a_flush_reloads_once_and_retries():
+    async def scenario():
+        backend, loads = _counting_backend()
+        await backend.load_script()
+        await backend.client.script_flush()
+
+        results = await asyncio.gather(*(backend.check([CHECK]) for _ in range(10)))
+        assert len(loads) == 2
+        assert all(granted == 1 for [(granted, _, _, _)] in results)
+        assert backend.breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_replies_are_integers():
+    async def scenario():
+        backend = RedisBackend(fakeredis.aioredis.FakeRedis())
+        [result] = await backend.check([CHECK])
+        assert result == (1, 99, 0, 0) and all(type(value) is int for value in result)
+
+    asyncio.run(scenario())
@@ -0,0 +1,121 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.backend import RedisBackend
+from app.rate_limiter import DistributedTokenBucketMiddleware
+from app.rules import Limit, Rule, RuleMatcher, compile_rules, parse_limit
+
+fakeredis = pytest.importorskip("fakeredis")
+
+CONFIG = {
+    "default": {"capacity": 20, "refill_rate": 5},
+    "users": {"path": "/users/**", "limits": ["100/m"]},
+    "user": {"path": "/users/*", "limits": ["50/m"]},
+    "me": {"path": "/users/me", "limits": ["10/m"]},
+    "writes": {"path": "/users/*", "methods": ["post"], "limits": ["5/m"]},
+    "pro": {"path": "/users/*", "tiers": ["pro"], "limits": ["500/m"]},
+    "health": {"path": "/health", "limits": []},
+    "api_keys": {"pro-key": "pro"},
+}
+
+
+def _name(matcher: RuleMatcher, method: str, path: str, tier=None) -> str:
+    return matcher.match(method, path, tier).name
+
+
+def test_every_matching_rule_applies_most_specific_first():
+    matcher = compile_rules(CONFIG)
+    assert _name(matcher, "GET", "/users/me") == "me+user+users"
+    assert _name(matcher, "GET", "/users/42") == "user+users"
+    assert _name(matcher, "GET", "/users/42/posts") == "users"
+    assert _name(matcher, "GET", "/users") == "users"  # '**' also matches nothing
+
+
+def test_method_and_tier_rules_replace_the_generic_rule_on_their_path():
+    matcher = compile_rules(CONFIG)
+    pro = matcher.tier_of("pro-key")
+    assert _name(matcher, "POST", "/users/42") == "writes+users"
+    assert _name(matcher, "GET", "/users/42", pro) == "pro+users"
+    # A tier does not lift a method's limit: a pro key still pays for writes.
+    assert _name(matcher, "POST", "/users/42", pro) == "pro+writes+users"
+    assert matcher.tier_of("unknown-key") is None and matcher.tier_of(None) is None
+    assert _name(matcher, "GET", "/users/42", matcher.tier_of("unknown-key")) == "user+users"
+
+
+def test_combined_rule_keeps_each_limit_in_its_own_rules_bucket():
+    matcher = compile_rules(CONFIG)
+    rule = matcher.match("POST", "/users/42", "pro")
+    assert rule.buckets == ("pro:0", "writes:0", "users:0")
+    assert rule.limits == (parse_limit("500/m"), parse_limit("5/m"), parse_limit("100/m"))
+    assert matcher.match("GET", "/users/42", "pro").buckets == ("pro:0", "users:0")
+
+
+def test_default_rule_is_the_fallback_and_empty_limits_exempt():
+    matcher = compile_rules(CONFIG)
+    assert _name(matcher, "GET", "/orders/1") == "default"
+    assert matcher.match("GET", "/orders/1").limits == (Limit(20, 5.0),)
+    assert matcher.match("GET", "/health").limits == ()
+
+
+def test_limit_shorthand():
+    assert parse_limit("1000/h") == Limit(1000, 1000 / 3600)
+    assert parse_limit("10/s", "gcra") == Limit(10, 10.0, "gcra")
+    assert parse_limit({"capacity": 5, "refill_rate": 1, "algorithm": "sliding_log"}).algorithm == "sliding_log"
+
+
+@pytest.mark.parametrize("spec", ["10", "10/w", "ten/s", "0/s", {"capacity": 5}, {"capacity": 5, "refill_rate": 0},
+                                  {"capacity": 5, "refill_rate": 1, "algorithm": "leaky"}])
+def test_invalid_limits_are_rejected(spec):
+    with pytest.raises(ValueError):
+        compile_rules({"bad": {"limits": [spec]}})
+
+
+@pytest.mark.parametrize("path", ["/**/users", "/a/**/b"])
+def test_double_star_must_end_the_pattern(path):
+    with pytest.raises(ValueError):
+        compile_rules({"bad": {"path": path, "limits": ["1/s"]}})
+
+
+def test_middleware_charges_both_limits_together():
+    redis_client = fakeredis.aioredis.FakeRedis()
+    rules = RuleMatcher([], Rule("default", limits=[parse_limit("10/s"), parse_limit("1000/h")]))
+    app = FastAPI()
+    app.add_middleware(DistributedTokenBucketMiddleware, rules=rules, backend=RedisBackend(redis_client))
+
+    @app.get("/limited")
+    async def limited():
+        return {"message": "ok"}
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            responses = [await http.get("/limited") for _ in range(12)]
+        hourly = await redis_client.hget("rate-limit:default:1:127.0.0.1", "tokens")
+        return responses, hourly
+
+    responses, hourly = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200] * 10 + [429] * 2
+    assert responses[0].headers["x-ratelimit-limit"] == "10"  # The per-second limit is the tight one
+    # Denied requests took nothing from the hourly bucket either.
+    assert 990 <= float(hourly) < 990.1
+
+
+def test_middleware_enforces_the_write_limit_for_a_pro_key():
+    redis_client = fakeredis.aioredis.FakeRedis()
+    app = FastAPI()
+    app.add_middleware(DistributedTokenBucketMiddleware, rules=compile_rules(CONFIG),
+                       backend=RedisBackend(redis_client))
+
+    @app.post("/users/{user_id}")
+    async def update_user(user_id: str):
+        return {"message": "ok"}
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            return [await http.post("/users/42", headers={"X-API-Key": "pro-key"}) for _ in range(6)]
+
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200] * 5 + [429]
+    assert responses[0].headers["x-ratelimit-limit"] == "5"